@@ -0,0 +1,70 @@
+"""Distributed renderer master engine, usable with or without Blender.
+
+The Blender add-on in master.py drives it from the UI; on a server run
+
+    python -m ar_master --blend scene.blend --frames 1-250 --out renders/
+"""
+
+from .core import (
+    FARM_METRICS,
+    FRAME_ORDER_INTERLEAVED,
+    FRAME_ORDER_LINEAR,
+    JOB_ANIMATION,
+    JOB_TILED_STILL,
+    MASTER_STATE,
+    AsyncMessageProtocol,
+    FarmMetrics,
+    HoldFramePreview,
+    Job,
+    JobJournal,
+    LocalWorkerPool,
+    MasterLoop,
+    MasterState,
+    MessageProtocol,
+    TileStitcher,
+    blend_fingerprint,
+    build_job_init_header,
+    cancel_job,
+    ensure_local_pool,
+    format_duration,
+    interleave_frames,
+    journal_dir,
+    prepare_blend,
+    resume_jobs,
+    split_tiles,
+    start,
+    stop,
+    submit_job,
+)
+
+__all__ = [
+    "FARM_METRICS",
+    "FRAME_ORDER_INTERLEAVED",
+    "FRAME_ORDER_LINEAR",
+    "JOB_ANIMATION",
+    "JOB_TILED_STILL",
+    "MASTER_STATE",
+    "AsyncMessageProtocol",
+    "FarmMetrics",
+    "HoldFramePreview",
+    "Job",
+    "JobJournal",
+    "LocalWorkerPool",
+    "MasterLoop",
+    "MasterState",
+    "MessageProtocol",
+    "TileStitcher",
+    "blend_fingerprint",
+    "build_job_init_header",
+    "cancel_job",
+    "ensure_local_pool",
+    "format_duration",
+    "interleave_frames",
+    "journal_dir",
+    "prepare_blend",
+    "resume_jobs",
+    "split_tiles",
+    "start",
+    "stop",
+    "submit_job",
+]
@@ -0,0 +1,168 @@
+"""Run the master headless: queue a blend, serve slaves until every job is done.
+
+    python -m ar_master --blend scene.blend --frames 1-250 --out renders/
+    python -m ar_master --resume
+
+The blend is copied as-is unless --pack is given, which packs external
+data into the copy with a background Blender (--blender). Either way the
+copy is reused by later runs while the file is unchanged. Ctrl-C stops
+the master; the journal keeps the job for ``--resume``.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+import uuid
+
+from . import core
+
+
+def parse_frames(spec: str, step: int = 1) -> list[int]:
+    """Frames from a list like ``1-250`` or ``1,5,10-20``; ranges honour ``step``."""
+    frames: list[int] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, sep, end = part.partition("-")
+        if sep:
+            frames.extend(range(int(start), int(end) + 1, max(1, step)))
+        else:
+            frames.append(int(start))
+    return sorted(set(frames))
+
+
+def _default_journal_dir() -> str:
+    return os.path.join(os.path.expanduser("~"), ".config", core.JOURNAL_DIR_NAME)
+
+
+def _parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="ar_master", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blend", help="blend file to render")
+    parser.add_argument("--frames", help="frames to render, e.g. 1-250 or 1,5,10-20")
+    parser.add_argument("--step", type=int, default=1, help="frame step for ranges")
+    parser.add_argument("--out", help="directory for rendered frames")
+    parser.add_argument("--format", default="PNG", help="Blender file format slaves render to (default PNG)")
+    parser.add_argument(
+        "--order",
+        choices=(core.FRAME_ORDER_LINEAR, core.FRAME_ORDER_INTERLEAVED),
+        default=core.FRAME_ORDER_LINEAR,
+        help="interleaved renders every 16th frame first and keeps a hold-frame preview in OUT/preview",
+    )
+    parser.add_argument("--encode", choices=sorted(core.ENCODE_PRESETS), help="pipe frames to ffmpeg as they arrive")
+    parser.add_argument("--fps", type=float, default=24.0, help="frame rate of the encoded video")
+    parser.add_argument("--delete-frames", action="store_true", help="remove the image sequence after a successful encode")
+    parser.add_argument("--ffmpeg", default=core.FFMPEG_BIN, help="ffmpeg binary used for --encode")
+    parser.add_argument("--name", default="", help="job name shown in logs and telemetry")
+    parser.add_argument("--priority", type=int, default=core.JOB_PRIORITY)
+    parser.add_argument("--chunk-seconds", type=float, default=core.CHUNK_TARGET_SECONDS)
+    parser.add_argument("--prefetch", type=int, default=core.PREFETCH_DEPTH)
+    parser.add_argument("--max-speculative", type=int, default=core.MAX_SPECULATIVE_COPIES)
+    parser.add_argument(
+        "--shared-root",
+        action="append",
+        default=[],
+        help="network storage slaves mount at the same path; jobs writing under it are served by path (repeatable)",
+    )
+    parser.add_argument("--pack", action="store_true", help="pack external data into the job's copy with --blender")
+    parser.add_argument("--resume", action="store_true", help="resume interrupted jobs from the journal")
+    parser.add_argument("--journal-dir", default=_default_journal_dir())
+    parser.add_argument("--local-workers", type=int, default=0, help="Blender processes rendering on this machine")
+    parser.add_argument("--blender", default=shutil.which("blender") or "", help="Blender binary for local workers")
+    parser.add_argument("--threads", type=int, default=0, help="render threads per local worker (0 splits the cores)")
+    parser.add_argument("--affinity", action="store_true", help="pin each local worker to its own cores")
+    parser.add_argument("--port", type=int, default=core.TCP_CONTROL_PORT, help="TCP control port")
+    parser.add_argument("--telemetry-port", type=int, default=core.TELEMETRY_PORT)
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+    if args.pack and not args.blender:
+        parser.error("--pack needs a Blender binary (--blender)")
+    if not args.resume and not (args.blend and args.frames and args.out):
+        parser.error("--blend, --frames and --out are required unless --resume is given")
+    return args
+
+
+def _submit(args: argparse.Namespace) -> core.Job:
+    frames = parse_frames(args.frames, args.step)
+    if not frames:
+        raise SystemExit("No frames to render")
+    output_dir = os.path.abspath(args.out)
+    os.makedirs(output_dir, exist_ok=True)
+    blend_name = os.path.splitext(os.path.basename(args.blend))[0]
+    job = core.Job(
+        core.MASTER_STATE,
+        uuid.uuid4().hex,
+        args.name or f"{blend_name}: Frames {frames[0]}-{frames[-1]}",
+        args.priority,
+        core.JOB_ANIMATION,
+        frames,
+        max(1, args.step),
+        output_dir,
+        args.format,
+        frame_order=args.order,
+    )
+    job.chunk_target_seconds = args.chunk_seconds
+    job.prefetch_depth = args.prefetch
+    job.max_speculative = args.max_speculative
+    job.encode_preset = args.encode or ""
+    job.encode_fps = args.fps
+    job.encode_delete_frames = args.delete_frames
+    job.temp_blend_path, job.blend_hash = core.prepare_blend(args.blend, blender_bin=args.blender if args.pack else "")
+    scene = {"frame_start": frames[0], "frame_end": frames[-1], "frame_step": max(1, args.step)}
+    return core.submit_job(job, frames, scene)
+
+
+def _report() -> None:
+    done, total = core.MASTER_STATE.totals()
+    with core.MASTER_STATE.lock:
+        connected = sum(1 for s in core.MASTER_STATE.slaves.values() if s.connected)
+    line = f"{done}/{total} frames, {connected} slaves"
+    rate = core.FARM_METRICS.throughput()
+    eta = core.FARM_METRICS.eta_seconds()
+    if rate:
+        line += f", {rate * 60:0.1f} frames/min"
+    if eta is not None:
+        line += f", ETA {core.format_duration(eta)}"
+    print(f"[AR-MASTER] {line}", flush=True)
+
+
+def main(argv: list[str]) -> int:
+    args = _parse_args(argv)
+    core.TCP_CONTROL_PORT = args.port
+    core.TELEMETRY_PORT = args.telemetry_port
+    core.FFMPEG_BIN = args.ffmpeg
+    core.SHARED_ROOTS = [os.path.abspath(root) for root in args.shared_root]
+    core.start(args.journal_dir)
+    try:
+        if args.resume:
+            core.resume_jobs()
+        if args.blend:
+            _submit(args)
+        if args.local_workers > 0:
+            if not args.blender:
+                print("[AR-MASTER] No Blender binary found; local workers disabled", flush=True)
+            core.ensure_local_pool(args.blender, args.local_workers, args.threads, args.affinity)
+        last_report = 0.0
+        while core.MASTER_STATE.job_active:
+            if time.time() - last_report >= args.progress_interval:
+                _report()
+                last_report = time.time()
+            time.sleep(0.5)
+        _report()
+        for job in list(core.MASTER_STATE.history):
+            if job.encoder is not None:
+                # Usually only the last few frames are left to encode
+                job.encoder.join()
+    except KeyboardInterrupt:
+        print("[AR-MASTER] Interrupted; unfinished jobs stay in the journal for --resume", flush=True)
+        return 130
+    finally:
+        core.stop(wait=10.0)
+    failed = [job for job in core.MASTER_STATE.history if job.status != "done"]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,3244 @@
+"""Networking, scheduling and job state for the distributed renderer master.
+
+Nothing in here imports bpy. The Blender add-on (master.py) and the command
+line (``python -m ar_master``) are both thin front ends over this engine.
+"""
+
+import asyncio
+import functools
+import socket
+import sqlite3
+import struct
+import json
+import threading
+import queue
+import time
+import os
+import shutil
+import tempfile
+import subprocess
+import uuid
+import hashlib
+import bisect
+import math
+import zlib
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Only tiled stills need it
+    np = None
+
+
+# Networking configuration
+UDP_DISCOVERY_PORT = 55333
+TCP_CONTROL_PORT = 55334
+DISCOVERY_BROADCAST_ADDR = "255.255.255.255"
+DISCOVERY_MAGIC = "AR_DISCOVERY_V1"
+RECV_CHUNK_SIZE = 1024 * 1024
+IO_POOL_WORKERS = 4
+
+# Received frames are spooled to local disk and moved into the output
+# directory by a bounded writer pool, so slow shares never stall the network
+FRAME_WRITER_WORKERS = 4
+FRAME_WRITER_MAX_PENDING = 32
+
+# Local render workers on the master machine
+WORKER_MARKER = "@@AR_WORKER "
+WORKER_MAX_FRAMES = 50
+WORKER_START_TIMEOUT = 600.0
+LOCAL_WORKERS = 1
+
+# Wire protocol. Version 1 frames are a 4-byte length and a JSON header.
+# Version 2 frames start with a fixed struct header (magic, version, type
+# code, meta length, payload length) followed by compact JSON meta fields
+# and go out in one vectored write. The version is negotiated in hello.
+SUPPORTED_PROTOCOLS = (1, 2)
+PROTOCOL_TRACE = False
+_V2_MAGIC = b"AR"
+_V2_HEADER = struct.Struct("!2sBBIQ")
+_MESSAGE_CODES = {
+    "hello": 1,
+    "hello_ack": 2,
+    "job_init": 3,
+    "job_blend": 4,
+    "need_blend": 5,
+    "have_blend": 6,
+    "ready": 7,
+    "assign": 8,
+    "frame_result": 9,
+    "frame_failed": 10,
+    "heartbeat": 11,
+    "cancel": 12,
+    "log": 13,
+    "bye": 14,
+    "frame_done": 15,
+    "blend_peer": 16,
+    "blend_request": 17,
+    "progress": 18,
+    "frame_aborted": 19,
+}
+_MESSAGE_NAMES = {code: name for name, code in _MESSAGE_CODES.items()}
+
+# Adaptive chunking: frames per assignment are sized from each slave's
+# measured seconds per frame to hit roughly this much wall time.
+CHUNK_TARGET_SECONDS = 60.0
+CHUNK_MAX_FRAMES = 50
+FRAME_TIME_SMOOTHING = 0.3
+# Chunks a slave may hold at once, so it renders the next while uploading
+PREFETCH_DEPTH = 2
+
+# Fault tolerance: every assigned frame is leased to its slave and returned
+# to the queue if the slave disconnects or stops heartbeating.
+LEASE_TIMEOUT = 60.0
+MAX_FRAME_FAILURES_PER_SLAVE = 2
+MAX_FRAME_ATTEMPTS = 5
+
+# Speculative execution: once the queue is empty, idle slaves re-render the
+# oldest in-flight frames; the first result wins and the rest are cancelled.
+MAX_SPECULATIVE_COPIES = 2
+# Slaves report render progress while a frame renders. A frame whose progress
+# has not moved for this long is treated as hung and copied first.
+PROGRESS_STALL_SECONDS = 600.0
+
+# Job types. Tiled stills split one frame into border-render regions that
+# go through the scheduler as work units and are stitched on the master.
+JOB_ANIMATION = "animation"
+JOB_TILED_STILL = "tiled_still"
+# Stitched stills are PNG; scene-linear float output cannot go through them
+TILED_FLOAT_FORMATS = frozenset({"OPEN_EXR", "OPEN_EXR_MULTILAYER", "HDR"})
+# Finished and cancelled jobs kept for the panel
+JOB_HISTORY = 10
+JOB_PRIORITY = 50
+# Frame order. Interleaved jobs hand out every 16th frame first, then fill in
+# coarse to fine, and keep a hold-frame preview of the whole shot up to date.
+FRAME_ORDER_LINEAR = "linear"
+FRAME_ORDER_INTERLEAVED = "interleaved"
+INTERLEAVE_STRIDE = 16
+PREVIEW_DIR_NAME = "preview"
+
+# Optional encoding on the master: frames are piped to ffmpeg in order as
+# soon as the contiguous prefix is in, so the video is done with the last frame.
+FFMPEG_BIN = "ffmpeg"
+ENCODE_PRESETS = {
+    "h264": ("mp4", ["-c:v", "libx264", "-preset", "medium", "-crf", "18", "-pix_fmt", "yuv420p",
+                     "-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2", "-movflags", "+faststart"]),
+    "prores": ("mov", ["-c:v", "prores_ks", "-profile:v", "3", "-pix_fmt", "yuv422p10le"]),
+}
+# image2pipe decoder for each frame file extension
+_PIPE_CODECS = {"png": "png", "jpg": "mjpeg", "jpeg": "mjpeg", "exr": "exr", "tif": "tiff", "tiff": "tiff", "bmp": "bmp"}
+# Journal database and packed job blends live here so a crashed session can resume
+JOURNAL_DIR_NAME = "animation_renderer"
+# Packed blends are cached by scene fingerprint and reused while nothing
+# changed; this many unused ones are kept around
+PACKED_BLEND_KEEP = 4
+
+# Shared storage: animation jobs whose output directory lies under one of
+# these roots are served by path. The blend is staged once next to the
+# output and slaves that report the root in hello read it from there and
+# write frames straight into the output directory, sending only frame_done
+# with a checksum. Paths must be the same on the master and the slaves.
+SHARED_ROOTS: list[str] = []
+SHARED_BLEND_DIR_NAME = ".ar_blends"
+
+# Blend fan-out: slaves holding a job's blend serve it to other slaves over
+# a peer connection. Each source, the master included, feeds at most this
+# many slaves at once, so the holders double every round and the farm has
+# the blend after about log2(N) transfer times instead of N.
+BLEND_FANOUT = 2
+
+# Telemetry: per-slave counters and latency histograms served on localhost as
+# Prometheus text (/metrics) and a JSON snapshot (/metrics.json).
+TELEMETRY_HOST = "127.0.0.1"
+TELEMETRY_PORT = 55335
+# Throughput for the ETA is averaged over this many recent seconds
+TELEMETRY_WINDOW = 300.0
+RENDER_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, float("inf"))
+UPLOAD_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+QUEUE_WAIT_BUCKETS = (0.1, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, float("inf"))
+
+
+# Executed inside the background Blender worker via --python-expr. The blend is
+# loaded once on startup; frames are rendered on request from JSON lines on
+# stdin and acknowledged on stdout with WORKER_MARKER-prefixed JSON lines.
+_WORKER_SCRIPT = r'''
+import bpy
+import json
+import sys
+
+MARKER = "@@MARKER@@"
+
+
+def _reply(**msg):
+    sys.stdout.write(MARKER + json.dumps(msg) + "\n")
+    sys.stdout.flush()
+
+
+def _render(cmd):
+    frame = int(cmd["frame"])
+    scene.render.image_settings.file_format = cmd["format"]
+    scene.render.filepath = cmd["output"]
+    scene.frame_set(frame)
+    bpy.ops.render.render(write_still=True)
+    return scene.render.frame_path(frame=frame)
+
+
+OPS = {"render": _render}
+
+scene = bpy.context.scene
+_reply(event="loaded")
+for line in sys.stdin:
+    line = line.strip()
+    if not line:
+        continue
+    try:
+        cmd = json.loads(line)
+    except ValueError:
+        continue
+    op = cmd.get("op")
+    if op == "quit":
+        break
+    if op not in OPS:
+        continue
+    try:
+        _reply(event="done", frame=cmd.get("frame"), path=OPS[op](cmd))
+    except Exception as exc:
+        _reply(event="error", frame=cmd.get("frame"), error=str(exc))
+'''.replace("@@MARKER@@", WORKER_MARKER)
+
+
+# Packs a copy of a blend in a background Blender; the source file is never
+# modified. The destination path follows "--" on the command line.
+_PACK_SCRIPT = r'''
+import sys
+import bpy
+
+dest = sys.argv[sys.argv.index("--") + 1]
+try:
+    bpy.ops.file.pack_all()
+except RuntimeError as exc:
+    # Missing files are reported; everything else still gets packed
+    print(f"pack_all: {exc}")
+bpy.ops.wm.save_as_mainfile(filepath=dest, copy=True)
+'''
+
+
+def _safe_log(message: str) -> None:
+    print(f"[AR-MASTER] {message}")
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_hash_cache: dict[tuple[str, int, int], str] = {}
+
+
+def _cached_sha256(path: str) -> str:
+    """sha256 of a file, remembered while its size and mtime stay the same."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    digest = _hash_cache.get(key)
+    if digest is None:
+        digest = _hash_cache[key] = _file_sha256(path)
+    return digest
+
+
+class MessageProtocol:
+    @staticmethod
+    def _sendmsg_all(sock: socket.socket, buffers: list) -> None:
+        views = [memoryview(b) for b in buffers if len(b)]
+        if not hasattr(sock, "sendmsg"):
+            # No vectored I/O (Windows); fall back to a single joined write
+            sock.sendall(b"".join(views))
+            return
+        while views:
+            sent = sock.sendmsg(views)
+            while sent and views:
+                if sent >= len(views[0]):
+                    sent -= len(views[0])
+                    views.pop(0)
+                else:
+                    views[0] = views[0][sent:]
+                    sent = 0
+
+    @staticmethod
+    def encode(header: dict, payload_size: int, version: int = 1) -> list[bytes]:
+        """Frame prefix (length or struct header plus meta) for one message."""
+        if version >= 2:
+            mtype = str(header.get("type", ""))
+            code = _MESSAGE_CODES.get(mtype, 0)
+            fields = {k: v for k, v in header.items() if k not in ("type", "bin_size")}
+            if not code:
+                fields["type"] = mtype
+            meta = json.dumps(fields, separators=(",", ":")).encode("utf-8") if fields else b""
+            return [_V2_HEADER.pack(_V2_MAGIC, 2, code, len(meta), payload_size), meta]
+        header = dict(header)
+        header["bin_size"] = payload_size
+        header_bytes = json.dumps(header).encode("utf-8")
+        return [struct.pack("!I", len(header_bytes)), header_bytes]
+
+    @staticmethod
+    def is_v2(prefix: bytes) -> bool:
+        # A version 1 length this large (over 1 GB of JSON) cannot occur
+        return prefix[:2] == _V2_MAGIC and prefix[2] == 2
+
+    @staticmethod
+    def decode_v2(fixed: bytes, meta: Optional[bytes]) -> dict:
+        _, _, code, _, bin_size = _V2_HEADER.unpack(fixed)
+        header = json.loads(meta) if meta else {}
+        if code:
+            header["type"] = _MESSAGE_NAMES.get(code, header.get("type"))
+        header["bin_size"] = bin_size
+        return header
+
+    @staticmethod
+    def send(
+        sock: socket.socket,
+        header: dict,
+        binary: Optional[bytes] = None,
+        file_path: Optional[str] = None,
+        version: int = 1,
+    ) -> None:
+        """Send one message; ``file_path`` streams the payload from disk via sendfile."""
+        try:
+            payload_size = os.path.getsize(file_path) if file_path else (len(binary) if binary else 0)
+            if PROTOCOL_TRACE:
+                _safe_log(f"TX {header.get('type')} bin={payload_size} v{version}")
+            buffers = MessageProtocol.encode(header, payload_size, version)
+            if binary is not None and payload_size and not file_path:
+                buffers.append(binary)
+            MessageProtocol._sendmsg_all(sock, buffers)
+            if file_path and payload_size:
+                with open(file_path, "rb") as f:
+                    sock.sendfile(f)
+        except Exception as exc:
+            raise RuntimeError(f"Failed to send message: {exc}") from exc
+
+    @staticmethod
+    def recv(
+        sock: socket.socket,
+        sink: Optional[Callable[[dict], Optional[str]]] = None,
+    ) -> Optional[Tuple[dict, Optional[bytearray]]]:
+        """Receive one message.
+
+        If ``sink`` returns a file path for the decoded header, the payload is
+        streamed to that file instead of being returned, and the path is
+        reported back as ``header["bin_path"]``.
+        """
+        def recvn(n: int) -> Optional[bytearray]:
+            data = bytearray(n)
+            view = memoryview(data)
+            got = 0
+            while got < n:
+                count = sock.recv_into(view[got:], n - got)
+                if not count:
+                    return None
+                got += count
+            return data
+
+        def recv_to_file(n: int, path: str) -> bool:
+            buf = bytearray(min(n, RECV_CHUNK_SIZE))
+            view = memoryview(buf)
+            remaining = n
+            with open(path, "wb") as f:
+                while remaining:
+                    count = sock.recv_into(view, min(remaining, len(buf)))
+                    if not count:
+                        return False
+                    f.write(view[:count])
+                    remaining -= count
+            return True
+
+        prefix = recvn(4)
+        if not prefix:
+            return None
+        if MessageProtocol.is_v2(prefix):
+            rest = recvn(_V2_HEADER.size - 4)
+            if rest is None:
+                return None
+            fixed = bytes(prefix + rest)
+            meta_len = _V2_HEADER.unpack(fixed)[3]
+            meta = recvn(meta_len) if meta_len else None
+            if meta_len and meta is None:
+                return None
+            header = MessageProtocol.decode_v2(fixed, meta)
+        else:
+            (header_len,) = struct.unpack("!I", prefix)
+            header_bytes = recvn(header_len)
+            if not header_bytes:
+                return None
+            header = json.loads(header_bytes.decode("utf-8"))
+        bin_size = int(header.get("bin_size", 0))
+        if PROTOCOL_TRACE:
+            _safe_log(f"RX {header.get('type')} bin={bin_size}")
+        binary = None
+        if bin_size:
+            path = sink(header) if sink else None
+            if path:
+                if not recv_to_file(bin_size, path):
+                    return None
+                header["bin_path"] = path
+            else:
+                binary = recvn(bin_size)
+                if binary is None:
+                    return None
+        return header, binary
+
+
+class AsyncMessageProtocol:
+    """asyncio stream counterpart of MessageProtocol, used on the master's event loop."""
+
+    @staticmethod
+    async def send(
+        writer: asyncio.StreamWriter,
+        header: dict,
+        binary: Optional[bytes] = None,
+        file_path: Optional[str] = None,
+        version: int = 1,
+    ) -> None:
+        payload_size = os.path.getsize(file_path) if file_path else (len(binary) if binary else 0)
+        if PROTOCOL_TRACE:
+            _safe_log(f"TX {header.get('type')} bin={payload_size} v{version}")
+        buffers = MessageProtocol.encode(header, payload_size, version)
+        if binary is not None and payload_size and not file_path:
+            buffers.append(binary)
+        writer.writelines(buffers)
+        await writer.drain()
+        if file_path and payload_size:
+            with open(file_path, "rb") as f:
+                await asyncio.get_running_loop().sendfile(writer.transport, f)
+
+    @staticmethod
+    async def recv(
+        reader: asyncio.StreamReader,
+        sink: Optional[Callable[[dict], Optional[str]]] = None,
+        io_pool: Optional[ThreadPoolExecutor] = None,
+    ) -> Optional[Tuple[dict, Optional[bytes]]]:
+        """Receive one message; sink payloads are written to disk on ``io_pool``."""
+        loop = asyncio.get_running_loop()
+        try:
+            prefix = await reader.readexactly(4)
+            if MessageProtocol.is_v2(prefix):
+                fixed = prefix + await reader.readexactly(_V2_HEADER.size - 4)
+                meta_len = _V2_HEADER.unpack(fixed)[3]
+                meta = await reader.readexactly(meta_len) if meta_len else None
+                header = MessageProtocol.decode_v2(fixed, meta)
+            else:
+                (header_len,) = struct.unpack("!I", prefix)
+                header = json.loads(await reader.readexactly(header_len))
+            bin_size = int(header.get("bin_size", 0))
+            if PROTOCOL_TRACE:
+                _safe_log(f"RX {header.get('type')} bin={bin_size}")
+            binary = None
+            if bin_size:
+                path = sink(header) if sink else None
+                if path:
+                    f = await loop.run_in_executor(io_pool, open, path, "wb")
+                    try:
+                        remaining = bin_size
+                        while remaining:
+                            chunk = await reader.readexactly(min(remaining, RECV_CHUNK_SIZE))
+                            await loop.run_in_executor(io_pool, f.write, chunk)
+                            remaining -= len(chunk)
+                    finally:
+                        await loop.run_in_executor(io_pool, f.close)
+                    header["bin_path"] = path
+                else:
+                    binary = await reader.readexactly(bin_size)
+            return header, binary
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return None
+
+
+class FrameQueue:
+    """Thread-safe FIFO of frame numbers that can hand out contiguous runs."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._frames: deque[int] = deque()
+
+    def put(self, frame: int) -> None:
+        with self._lock:
+            self._frames.append(frame)
+
+    def requeue(self, frames: list[int]) -> None:
+        """Return frames to the front so they are handed out next."""
+        with self._lock:
+            self._frames.extendleft(reversed(frames))
+
+    def remove(self, frame: int) -> bool:
+        with self._lock:
+            try:
+                self._frames.remove(frame)
+                return True
+            except ValueError:
+                return False
+
+    def get_nowait(self) -> int:
+        with self._lock:
+            if not self._frames:
+                raise queue.Empty
+            return self._frames.popleft()
+
+    def take_run(self, max_count: int, step: Optional[int]) -> list[int]:
+        """Pop up to max_count frames from the head while they stay step apart (any spacing if None)."""
+        with self._lock:
+            run: list[int] = []
+            while self._frames and len(run) < max_count:
+                if run and step is not None and self._frames[0] != run[-1] + step:
+                    break
+                run.append(self._frames.popleft())
+            return run
+
+    def qsize(self) -> int:
+        with self._lock:
+            return len(self._frames)
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear()
+
+
+def interleave_frames(frames: list[int], stride: int = INTERLEAVE_STRIDE) -> list[int]:
+    """Coarse-to-fine order: every stride-th frame and the last, then halve the stride down to every frame."""
+    order: list[int] = []
+    seen: set[int] = set()
+    if frames:
+        first_pass = list(range(0, len(frames), max(1, stride))) + [len(frames) - 1]
+        for i in first_pass:
+            if i not in seen:
+                seen.add(i)
+                order.append(frames[i])
+    stride //= 2
+    while stride >= 1:
+        for i in range(0, len(frames), stride):
+            if i not in seen:
+                seen.add(i)
+                order.append(frames[i])
+        stride //= 2
+    return order
+
+
+class HoldFramePreview:
+    """Full-length image sequence where every unrendered frame holds the nearest earlier rendered one.
+
+    Entries are hard links (copies where links are unsupported) in the job's
+    preview folder, so it plays as a normal image sequence that sharpens as
+    the interleaved job fills in.
+    """
+
+    def __init__(self, frames: list[int], out_dir: str, completed: Optional[set[int]] = None) -> None:
+        self.lock = threading.Lock()
+        self.frames = sorted(frames)
+        self.out_dir = out_dir
+        self.completed: set[int] = set(completed or ())
+
+    def add(self, frame: int, path: str) -> None:
+        ext = os.path.splitext(path)[1]
+        with self.lock:
+            self.completed.add(frame)
+            start = bisect.bisect_left(self.frames, frame)
+            targets = [frame]
+            for other in self.frames[start + 1:]:
+                if other in self.completed:
+                    break
+                targets.append(other)
+            if min(self.completed) == frame:
+                # Nothing earlier is rendered; lead in with this frame too
+                targets.extend(self.frames[:start])
+            os.makedirs(self.out_dir, exist_ok=True)
+            for target in targets:
+                self._place(path, os.path.join(self.out_dir, f"frame_{target:04d}{ext}"))
+
+    @staticmethod
+    def _place(src_path: str, dest_path: str) -> None:
+        tmp_path = f"{dest_path}.{uuid.uuid4().hex}.part"
+        try:
+            os.link(src_path, tmp_path)
+        except OSError:
+            shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+
+
+class FrameEncoder(threading.Thread):
+    """Feeds a job's frames to an ffmpeg pipe in frame order through a reorder buffer.
+
+    Frames can arrive in any order; each is written to ffmpeg once every
+    earlier frame has been. finish() encodes what is left, skipping frames
+    that never rendered, and abort() kills ffmpeg and drops the partial file.
+    """
+
+    def __init__(
+        self,
+        frames: list[int],
+        out_dir: str,
+        fps: float,
+        preset: str,
+        delete_frames: bool = False,
+        ffmpeg_bin: str = FFMPEG_BIN,
+    ) -> None:
+        super().__init__(daemon=True)
+        self.frames = sorted(frames)
+        self.index = {frame: i for i, frame in enumerate(self.frames)}
+        ext, self.codec_args = ENCODE_PRESETS[preset]
+        self.out_path = os.path.join(out_dir, f"{self.frames[0]:04d}-{self.frames[-1]:04d}.{ext}")
+        self.fps = fps
+        self.delete_frames = delete_frames
+        self.ffmpeg_bin = ffmpeg_bin
+        self.inbox: queue.Queue[Optional[tuple[int, str]]] = queue.Queue()
+        self.stop_event = threading.Event()
+        # Reorder buffer: frames that arrived ahead of the next one ffmpeg needs
+        self.pending: dict[int, str] = {}
+        self.next_index = 0
+        self.fed: list[str] = []
+        self.proc: Optional[subprocess.Popen] = None
+        self.tmp_path = os.path.join(out_dir, f".{os.path.basename(self.out_path)}.{uuid.uuid4().hex}.part")
+
+    def add(self, frame: int, path: str) -> None:
+        self.inbox.put((frame, path))
+
+    def finish(self) -> None:
+        self.inbox.put(None)
+
+    def abort(self) -> None:
+        self.stop_event.set()
+        self.inbox.put(None)
+
+    def run(self) -> None:
+        try:
+            while not self.stop_event.is_set():
+                item = self.inbox.get()
+                if item is None:
+                    break
+                frame, path = item
+                index = self.index.get(frame)
+                if index is None or index < self.next_index:
+                    # Duplicate of a frame already encoded
+                    continue
+                self.pending[frame] = path
+                self._feed(skip_missing=False)
+            if self.stop_event.is_set():
+                self._kill()
+                return
+            self._feed(skip_missing=True)
+            self._close()
+        except Exception as exc:
+            _safe_log(f"Encoding {os.path.basename(self.out_path)} failed: {exc}")
+            self._kill()
+
+    def _feed(self, skip_missing: bool) -> None:
+        while self.next_index < len(self.frames):
+            frame = self.frames[self.next_index]
+            path = self.pending.pop(frame, None)
+            if path is None:
+                if not skip_missing:
+                    return
+                _safe_log(f"Frame {frame} never rendered; leaving it out of {os.path.basename(self.out_path)}")
+            else:
+                if self.proc is None:
+                    self._start(path)
+                with open(path, "rb") as f:
+                    shutil.copyfileobj(f, self.proc.stdin, 1024 * 1024)  # type: ignore[union-attr, arg-type]
+                self.fed.append(path)
+            self.next_index += 1
+
+    def _start(self, first_path: str) -> None:
+        ext = os.path.splitext(first_path)[1].lstrip(".").lower()
+        codec = _PIPE_CODECS.get(ext)
+        if codec is None:
+            raise RuntimeError(f"cannot pipe .{ext} frames to ffmpeg")
+        fmt = os.path.splitext(self.out_path)[1].lstrip(".")
+        cmd = [
+            self.ffmpeg_bin, "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "image2pipe", "-c:v", codec, "-framerate", f"{self.fps:g}", "-i", "-",
+            *self.codec_args, "-f", fmt, self.tmp_path,
+        ]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        _safe_log(f"Encoding to {self.out_path} as frames arrive")
+
+    def _close(self) -> None:
+        if self.proc is None:
+            _safe_log(f"No frames to encode for {os.path.basename(self.out_path)}")
+            return
+        t0 = time.time()
+        self.proc.stdin.close()  # type: ignore[union-attr]
+        error = self.proc.stderr.read().decode("utf-8", "replace").strip()  # type: ignore[union-attr]
+        if self.proc.wait() != 0:
+            self._kill()
+            raise RuntimeError(error or f"ffmpeg exited with {self.proc.returncode}")
+        os.replace(self.tmp_path, self.out_path)
+        _safe_log(f"Encoded {len(self.fed)} frames to {self.out_path} ({time.time() - t0:0.1f}s after the last frame)")
+        if self.delete_frames:
+            for path in self.fed:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _kill(self) -> None:
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+        if os.path.exists(self.tmp_path):
+            try:
+                os.remove(self.tmp_path)
+            except OSError:
+                pass
+
+
+def _write_png(path: str, rgba: "np.ndarray") -> None:
+    """Write a top-down HxWx4 uint8 or uint16 array as an 8- or 16-bit RGBA PNG."""
+    height, width, _ = rgba.shape
+    bit_depth = 16 if rgba.dtype == np.uint16 else 8
+    # PNG samples are big-endian
+    samples = rgba.astype(">u2").view(np.uint8) if bit_depth == 16 else rgba
+    row_bytes = width * 4 * bit_depth // 8
+    raw = np.zeros((height, row_bytes + 1), dtype=np.uint8)
+    raw[:, 1:] = samples.reshape(height, row_bytes)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack("!I", len(data)) + tag + data + struct.pack("!I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    png = b"".join((
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", struct.pack("!IIBBBBB", width, height, bit_depth, 6, 0, 0, 0)),
+        chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)),
+        chunk(b"IEND", b""),
+    ))
+    tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(png)
+    os.replace(tmp_path, path)
+
+
+def split_tiles(res_x: int, res_y: int, tiles_x: int, tiles_y: int) -> list[dict]:
+    """Pixel rects (bottom-up, like Blender's border) and matching border fractions."""
+    xs = [round(i * res_x / tiles_x) for i in range(tiles_x + 1)]
+    ys = [round(j * res_y / tiles_y) for j in range(tiles_y + 1)]
+    tiles = []
+    for j in range(tiles_y):
+        for i in range(tiles_x):
+            x0, x1, y0, y1 = xs[i], xs[i + 1], ys[j], ys[j + 1]
+            if x1 <= x0 or y1 <= y0:
+                continue
+            # Blender truncates border * resolution; the half-pixel nudge
+            # keeps the truncated edge on the intended pixel.
+            tiles.append({
+                "rect": [x0, y0, x1, y1],
+                "border": [
+                    (x0 + 0.5) / res_x,
+                    (y0 + 0.5) / res_y,
+                    min(1.0, (x1 + 0.5) / res_x),
+                    min(1.0, (y1 + 0.5) / res_y),
+                ],
+            })
+    return tiles
+
+
+class TileStitcher:
+    """Assembles rendered tiles of a tiled still into one 8- or 16-bit PNG.
+
+    Tiles arrive as float32 arrays in 0..1 (uint8 from older slaves).
+    """
+
+    def __init__(self, res_x: int, res_y: int, tiles: list[dict], out_path: str, bit_depth: int = 8) -> None:
+        self.lock = threading.Lock()
+        self.tiles = tiles
+        self.out_path = out_path
+        if np is None:
+            raise RuntimeError("Tiled stills need numpy")
+        if bit_depth not in (8, 16):
+            raise RuntimeError(f"Tiled stills are written as 8- or 16-bit PNG, not {bit_depth}-bit")
+        self.bit_depth = bit_depth
+        self.canvas = np.zeros((res_y, res_x, 4), dtype=np.uint16 if bit_depth == 16 else np.uint8)
+        self.received: set[int] = set()
+
+    def _quantize(self, tile: "np.ndarray") -> "np.ndarray":
+        if tile.dtype == np.uint8:
+            return tile.astype(np.uint16) * 257 if self.bit_depth == 16 else tile
+        top = 65535.0 if self.bit_depth == 16 else 255.0
+        return np.round(np.clip(tile, 0.0, 1.0) * top).astype(self.canvas.dtype)
+
+    def add_tile(self, index: int, npy_path: str) -> bool:
+        """Place one tile; returns True once every tile is in and the image was written."""
+        tile = self._quantize(np.load(npy_path))
+        x0, y0, x1, y1 = self.tiles[index]["rect"]
+        h = min(tile.shape[0], y1 - y0, self.canvas.shape[0] - y0)
+        w = min(tile.shape[1], x1 - x0, self.canvas.shape[1] - x0)
+        with self.lock:
+            self.canvas[y0:y0 + h, x0:x0 + w] = tile[:h, :w]
+            self.received.add(index)
+            if len(self.received) < len(self.tiles):
+                return False
+            # Canvas rows are bottom-up like Blender pixels; PNG is top-down
+            _write_png(self.out_path, self.canvas[::-1])
+        _safe_log(f"Stitched {len(self.tiles)} tiles into {self.out_path}")
+        return True
+
+
+class SlaveInfo:
+    def __init__(self, slave_id: str, name: str, address: tuple[str, int]):
+        self.slave_id = slave_id
+        self.name = name
+        self.address = address
+        self.connected = False
+        self.last_seen = time.time()
+        # Reported in hello; score is a relative throughput from a quick calibration run
+        self.cores = 0
+        self.ram = 0
+        self.blender_version = ""
+        self.score = 0.0
+        # Shared storage roots the slave can read and write, as it reported them
+        self.shared_read: list[str] = []
+        self.shared_write: list[str] = []
+        # Port of the slave's blend server for peers (0 when it has none)
+        self.peer_port = 0
+
+
+class BlendFanout:
+    """Decides who sends a job's blend to whom, so it spreads through the farm as a tree.
+
+    Only used on the event loop thread.
+    """
+
+    MASTER = ""
+
+    def __init__(self, fanout: int) -> None:
+        self.fanout = fanout
+        # Slaves with the blend in their cache and a peer server to share it from
+        self.holders: set[str] = set()
+        # Receiver -> the slave (or MASTER) sending to it
+        self.sources: dict[str, str] = {}
+        self.waiting: deque[str] = deque()
+        # Peers a receiver could not fetch from; it is not sent to them again
+        self.failed: dict[str, set[str]] = {}
+
+    def _load(self, source: str) -> int:
+        return sum(1 for s in self.sources.values() if s == source)
+
+    def request(self, receiver: str, can_serve: Callable[[str], bool], from_peers: bool = True) -> Optional[str]:
+        """Source for a receiver, or None when every source is busy and it has to wait.
+
+        Receivers that cannot fetch from peers always get the master, as before fan-out.
+        """
+        self.cancel(receiver)
+        if not from_peers:
+            self.sources[receiver] = self.MASTER
+            return self.MASTER
+        excluded = self.failed.get(receiver, set())
+        loads = {h: self._load(h) for h in self.holders if h != receiver and h not in excluded and can_serve(h)}
+        free = [h for h, load in loads.items() if load < self.fanout]
+        if free:
+            # Peers first; the master's link is the one everybody shares
+            source = min(free, key=loads.__getitem__)
+        elif self._load(self.MASTER) < self.fanout:
+            source = self.MASTER
+        else:
+            self.waiting.append(receiver)
+            return None
+        self.sources[receiver] = source
+        return source
+
+    def peer_failed(self, receiver: str) -> None:
+        source = self.sources.pop(receiver, None)
+        if source:
+            self.failed.setdefault(receiver, set()).add(source)
+
+    def finished(self, receiver: str, can_serve: bool) -> bool:
+        """Record that a receiver has the blend; True when that freed a source."""
+        self.failed.pop(receiver, None)
+        if can_serve:
+            self.holders.add(receiver)
+        return self.sources.pop(receiver, None) is not None or can_serve
+
+    def cancel(self, receiver: str) -> None:
+        self.sources.pop(receiver, None)
+        try:
+            self.waiting.remove(receiver)
+        except ValueError:
+            pass
+
+    def forget(self, slave_id: str) -> None:
+        """Drop a disconnected slave; receivers it was feeding ask again when their fetch fails."""
+        self.cancel(slave_id)
+        self.holders.discard(slave_id)
+        self.failed.pop(slave_id, None)
+
+    def take_waiting(self) -> list[str]:
+        waiting = list(self.waiting)
+        self.waiting.clear()
+        return waiting
+
+
+class Job:
+    """One submitted render: its blend, work queue and per-frame lease bookkeeping."""
+
+    def __init__(
+        self,
+        state: "MasterState",
+        job_id: str,
+        name: str,
+        priority: int,
+        job_type: str,
+        frames: list[int],
+        frame_step: int,
+        output_dir: str,
+        render_format: str,
+        stitcher: Optional[TileStitcher] = None,
+        frame_order: str = FRAME_ORDER_LINEAR,
+    ) -> None:
+        self.state = state
+        self.lock = state.lock
+        self.job_id = job_id
+        self.name = name
+        self.priority = priority
+        self.submitted = time.time()
+        self.status = "queued"
+        self.job_type = job_type
+        self.output_dir = output_dir
+        self.render_format = render_format
+        self.stitcher = stitcher
+        self.temp_blend_path: Optional[str] = None
+        self.blend_hash: Optional[str] = None
+        # Copy of the blend on shared storage, for slaves that can read it there
+        self.shared_blend_path: Optional[str] = None
+        self.blend_fanout = BlendFanout(BLEND_FANOUT)
+        self.init_header: Optional[dict] = None
+        self.frame_step = frame_step
+        self.frame_order = frame_order
+        self.preview: Optional[HoldFramePreview] = None
+        # Encoder settings are journaled with the job; the encoder itself is not
+        self.encode_preset = ""
+        self.encode_fps = 24.0
+        self.encode_delete_frames = False
+        self.encoder: Optional[FrameEncoder] = None
+        self.frame_queue = FrameQueue()
+        if frame_order == FRAME_ORDER_INTERLEAVED:
+            frames = interleave_frames(sorted(frames))
+        for frame in frames:
+            self.frame_queue.put(int(frame))
+        self.total_frames = len(frames)
+        self.frames_completed: set[int] = set()
+        self.frames_failed: set[int] = set()
+        self.frames_in_progress: dict[str, set[int]] = {}
+        self.leases: dict[tuple[str, int], float] = {}
+        self.lease_started: dict[tuple[str, int], float] = {}
+        self.speculative: set[tuple[str, int]] = set()
+        # (percent, seconds left, reported at, last advanced at) per leased frame
+        self.frame_progress: dict[tuple[str, int], tuple[float, Optional[float], float, float]] = {}
+        self.frame_failures: dict[tuple[str, int], int] = {}
+        self.frame_attempts: dict[int, int] = {}
+        self.blacklist: set[str] = set()
+        # Slaves and local workers currently bound to this job
+        self.workers: set[str] = set()
+        self.chunk_target_seconds = CHUNK_TARGET_SECONDS
+        self.prefetch_depth = PREFETCH_DEPTH
+        self.max_speculative = MAX_SPECULATIVE_COPIES
+        self.frame_times: dict[str, float] = {}
+        self.last_completion: dict[str, float] = {}
+
+    @property
+    def frames_done(self) -> int:
+        return len(self.frames_completed)
+
+    def finished(self) -> bool:
+        with self.lock:
+            return len(self.frames_completed) + len(self.frames_failed) >= self.total_frames
+
+    def has_work(self) -> bool:
+        return not self.frame_queue.empty()
+
+    def record_frame_time(self, slave_id: str, seconds: float) -> None:
+        with self.lock:
+            prev = self.frame_times.get(slave_id)
+            if prev is None:
+                self.frame_times[slave_id] = seconds
+            else:
+                self.frame_times[slave_id] = prev + FRAME_TIME_SMOOTHING * (seconds - prev)
+
+    def predicted_frame_time(self, slave_id: Optional[str]) -> Optional[float]:
+        """Seconds per frame for a slave: measured this job, else scaled from measured slaves by score."""
+        slaves = self.state.slaves
+        with self.lock:
+            measured = self.frame_times.get(slave_id or "")
+            if measured:
+                return measured
+            info = slaves.get(slave_id or "")
+            if not info or info.score <= 0:
+                return None
+            # Seconds per frame times calibration score is roughly constant across machines
+            refs = sorted(
+                seconds * slaves[sid].score
+                for sid, seconds in self.frame_times.items()
+                if sid in slaves and slaves[sid].score > 0
+            )
+            if not refs:
+                return None
+            return refs[len(refs) // 2] / info.score
+
+    def _active_workers(self) -> list[str]:
+        return [sid for sid in self.workers if sid not in self.blacklist]
+
+    def _reported_remaining(self, slave_id: str, frames: list[int]) -> Optional[tuple[int, float]]:
+        """Position in ``frames`` of the frame the slave last reported on, and its seconds left."""
+        now = time.time()
+        latest: Optional[tuple[float, int, float]] = None
+        for position, frame in enumerate(frames):
+            progress = self.frame_progress.get((slave_id, frame))
+            if progress is None or progress[1] is None:
+                continue
+            if latest is None or progress[2] > latest[0]:
+                latest = (progress[2], position, max(0.0, progress[1] - (now - progress[2])))
+        return (latest[1], latest[2]) if latest else None
+
+    def _finish_estimate(self, slave_id: str) -> Optional[float]:
+        """Seconds until a slave could finish one more frame after its current backlog."""
+        per_frame = self.predicted_frame_time(slave_id)
+        if not per_frame:
+            return None
+        backlog = self.frames_in_progress.get(slave_id, ())
+        if not backlog:
+            return per_frame
+        ordered = sorted(backlog)
+        reported = self._reported_remaining(slave_id, ordered)
+        if reported is not None:
+            # The slave's own estimate for the frame it is on beats extrapolating
+            position, left = reported
+            return left + (len(ordered) - position) * per_frame
+        busy = len(backlog) * per_frame
+        started = min(self.lease_started.get((slave_id, f), time.time()) for f in backlog)
+        elapsed = time.time() - max(started, self.last_completion.get(slave_id, 0.0))
+        if elapsed > 2 * busy:
+            # Far behind its own prediction; do not trust it
+            return None
+        return max(0.0, busy - elapsed) + per_frame
+
+    def should_defer(self, slave_id: str) -> bool:
+        """At the tail of a job, leave the last frames to workers predicted to finish them sooner."""
+        with self.lock:
+            remaining = self.frame_queue.qsize()
+            workers = self._active_workers()
+            if remaining == 0 or remaining >= len(workers):
+                return False
+            mine = self._finish_estimate(slave_id)
+            if mine is None:
+                return False
+            others = sorted(
+                est for sid in workers
+                if sid != slave_id and (est := self._finish_estimate(sid)) is not None
+            )
+            return len(others) >= remaining and mine > others[remaining - 1]
+
+    def chunk_size_for(self, slave_id: Optional[str]) -> int:
+        """Frames to hand a slave next: sized to the target wall time, shrinking near the end."""
+        with self.lock:
+            per_frame = self.predicted_frame_time(slave_id)
+            target = self.chunk_target_seconds
+            speeds = {}
+            for sid in self._active_workers():
+                t = self.predicted_frame_time(sid)
+                speeds[sid] = 1.0 / t if t else None
+        if not per_frame:
+            # Unmeasured slave: one frame to calibrate
+            return 1
+        size = max(1, min(CHUNK_MAX_FRAMES, int(target / max(per_frame, 1e-3))))
+        # Never take more than half of this slave's speed-weighted share of
+        # what is left, so the tail of the job spreads over every worker.
+        known = sorted(v for v in speeds.values() if v)
+        typical = known[len(known) // 2] if known else 1.0
+        total = sum(v or typical for v in speeds.values()) or 1.0
+        share = (1.0 / per_frame) / max(total, 1.0 / per_frame)
+        fair_share = math.ceil(self.frame_queue.qsize() * share / 2)
+        return max(1, min(size, fair_share))
+
+    def take_frames(self, count: int) -> list[int]:
+        """Next frames to assign; contiguous runs unless the job is interleaved."""
+        step = self.frame_step if self.frame_order == FRAME_ORDER_LINEAR else None
+        return self.frame_queue.take_run(count, step)
+
+    def lease_frames(self, slave_id: str, frames: list[int], speculative: bool = False) -> None:
+        now = time.time()
+        with self.lock:
+            self.status = "rendering"
+            self.frames_in_progress.setdefault(slave_id, set()).update(frames)
+            for frame in frames:
+                self.leases[(slave_id, frame)] = now + LEASE_TIMEOUT
+                self.lease_started[(slave_id, frame)] = now
+                if speculative:
+                    self.speculative.add((slave_id, frame))
+                else:
+                    self.frame_attempts[frame] = self.frame_attempts.get(frame, 0) + 1
+
+    def pick_speculative(self, slave_id: str) -> Optional[int]:
+        """In-flight frame an idle slave would finish soonest relative to its holder, if any."""
+        with self.lock:
+            if not self.frame_queue.empty() or len(self.speculative) >= self.max_speculative:
+                return None
+            holders: dict[int, int] = {}
+            for _, frame in self.leases:
+                holders[frame] = holders.get(frame, 0) + 1
+            mine = self.predicted_frame_time(slave_id)
+            now = time.time()
+            best: Optional[tuple[float, int]] = None
+            for sid, frames in self.frames_in_progress.items():
+                if sid == slave_id:
+                    continue
+                theirs = self.predicted_frame_time(sid)
+                ordered = sorted(frames)
+                reported = self._reported_remaining(sid, ordered)
+                for position, frame in enumerate(ordered):
+                    if holders.get(frame) != 1 or frame in self.frames_in_progress.get(slave_id, ()):
+                        continue
+                    started = self.lease_started.get((sid, frame), now)
+                    progress = self.frame_progress.get((sid, frame))
+                    if progress is not None and now - progress[3] >= PROGRESS_STALL_SECONDS:
+                        # Heartbeats still arrive but the render stopped moving; likely hung
+                        gain = PROGRESS_STALL_SECONDS + now - progress[3]
+                    elif mine and reported is not None and position >= reported[0] and (theirs or position == reported[0]):
+                        # Count from the holder's own estimate for the frame it is on
+                        gain = reported[1] + (position - reported[0]) * (theirs or 0.0) - mine
+                        if gain <= 0:
+                            continue
+                    elif mine and theirs:
+                        # Frames in a chunk render in order, one after another
+                        since = max(started, self.last_completion.get(sid, 0.0))
+                        gain = (position + 1) * theirs - (now - since) - mine
+                        if gain <= 0:
+                            continue
+                    else:
+                        # Without timings fall back to the oldest lease
+                        gain = now - started
+                    if best is None or gain > best[0]:
+                        best = (gain, frame)
+            return best[1] if best else None
+
+    def record_progress(self, slave_id: str, frame: int, percent: float, eta: Optional[float]) -> bool:
+        """Note a slave's progress on a leased frame and renew its leases; False if it holds no lease on it."""
+        now = time.time()
+        with self.lock:
+            if (slave_id, frame) not in self.leases:
+                return False
+            prev = self.frame_progress.get((slave_id, frame))
+            advanced = now if prev is None or percent > prev[0] else prev[3]
+            self.frame_progress[(slave_id, frame)] = (percent, eta, now, advanced)
+        self.renew_leases(slave_id, [frame])
+        return True
+
+    def progress_for(self, slave_id: str) -> Optional[tuple[int, float, Optional[float]]]:
+        """Frame, percent done and seconds left the slave last reported, if it is still on it."""
+        now = time.time()
+        with self.lock:
+            latest = None
+            for (sid, frame), (percent, eta, reported, _) in self.frame_progress.items():
+                if sid == slave_id and (latest is None or reported > latest[0]):
+                    left = max(0.0, eta - (now - reported)) if eta is not None else None
+                    latest = (reported, frame, percent, left)
+        return latest[1:] if latest else None
+
+    def duplicate_holders(self, frame: int) -> list[str]:
+        """Drop and return the slaves still holding leases on a finished frame."""
+        with self.lock:
+            holders = [sid for sid, f in self.leases if f == frame]
+            for sid in holders:
+                self._drop_lease(sid, frame)
+        return holders
+
+    def unlease_frames(self, slave_id: str, frames: list[int]) -> None:
+        """Undo lease_frames for an assignment that never reached the slave."""
+        with self.lock:
+            for frame in reversed(frames):
+                speculative = (slave_id, frame) in self.speculative
+                self._drop_lease(slave_id, frame)
+                if not speculative:
+                    self.frame_attempts[frame] = max(0, self.frame_attempts.get(frame, 1) - 1)
+                self._return_frame(frame)
+
+    def holds_lease(self, slave_id: str, frame: int) -> bool:
+        with self.lock:
+            return (slave_id, frame) in self.leases
+
+    def renew_leases(self, slave_id: str, frames: Optional[Iterable[int]] = None) -> None:
+        """Extend the slave's leases; only on ``frames`` when given, so frames it lost run out."""
+        expires = time.time() + LEASE_TIMEOUT
+        with self.lock:
+            held = self.frames_in_progress.get(slave_id, set())
+            for frame in held if frames is None else held.intersection(frames):
+                self.leases[(slave_id, frame)] = expires
+
+    def _drop_lease(self, slave_id: str, frame: int) -> None:
+        self.leases.pop((slave_id, frame), None)
+        self.lease_started.pop((slave_id, frame), None)
+        self.frame_progress.pop((slave_id, frame), None)
+        self.speculative.discard((slave_id, frame))
+        in_progress = self.frames_in_progress.get(slave_id)
+        if in_progress is not None:
+            in_progress.discard(frame)
+        conn = self.state.connections.get(slave_id)
+        if conn is not None and conn.job is self:
+            conn.forget_frame(frame)
+
+    def _return_frame(self, frame: int) -> None:
+        if frame in self.frames_completed or frame in self.frames_failed:
+            return
+        if any(f == frame for _, f in self.leases):
+            # Another copy is still running
+            return
+        if self.frame_attempts.get(frame, 0) >= MAX_FRAME_ATTEMPTS:
+            _safe_log(f"Giving up on frame {frame} of {self.name} after {self.frame_attempts[frame]} attempts")
+            self.frames_failed.add(frame)
+            return
+        self.frame_queue.requeue([frame])
+
+    def complete_frame(self, slave_id: Optional[str], frame: int) -> bool:
+        """Record a finished frame; False if it was already completed elsewhere."""
+        with self.lock:
+            if slave_id:
+                self._drop_lease(slave_id, frame)
+                self.last_completion[slave_id] = time.time()
+            if frame in self.frames_completed:
+                return False
+            # The lease may have expired and put the frame back in the queue
+            self.frame_queue.remove(frame)
+            self.frames_failed.discard(frame)
+            self.frames_completed.add(frame)
+        FARM_METRICS.record_completion(slave_id)
+        return True
+
+    def fail_frame(self, slave_id: str, frame: int) -> None:
+        FARM_METRICS.record_failure(slave_id)
+        with self.lock:
+            self._drop_lease(slave_id, frame)
+            key = (slave_id, frame)
+            self.frame_failures[key] = self.frame_failures.get(key, 0) + 1
+            if slave_id not in self.blacklist and self.frame_failures[key] >= MAX_FRAME_FAILURES_PER_SLAVE:
+                self.blacklist.add(slave_id)
+                info = self.state.slaves.get(slave_id)
+                name = info.name if info else slave_id
+                _safe_log(f"Blacklisting slave {name} for {self.name} after failing frame {frame} {self.frame_failures[key]} times")
+            self._return_frame(frame)
+
+    def release_slave(self, slave_id: str) -> list[int]:
+        """Return every frame leased to a slave to the queue."""
+        with self.lock:
+            self.workers.discard(slave_id)
+            frames = sorted(self.frames_in_progress.pop(slave_id, set()))
+            for frame in frames:
+                self._drop_lease(slave_id, frame)
+            for frame in reversed(frames):
+                self._return_frame(frame)
+        return frames
+
+    def expire_leases(self) -> list[tuple[str, int]]:
+        now = time.time()
+        with self.lock:
+            expired = [key for key, expires in self.leases.items() if expires < now]
+            for slave_id, frame in expired:
+                self._drop_lease(slave_id, frame)
+                self._return_frame(frame)
+        for slave_id, _ in expired:
+            FARM_METRICS.record_lease_expiry(slave_id)
+        return expired
+
+    def discard(self) -> None:
+        """Let go of the job's packed blend; cached blends stay for reuse until pruned."""
+        self._discard_shared_blend()
+        path = self.temp_blend_path
+        self.temp_blend_path = None
+        if path and _journal is not None and _journal.is_packed_blend(path):
+            _prune_packed_blends()
+            return
+        if path and os.path.exists(path):
+            try:
+                os.remove(path)
+            except Exception:
+                pass
+
+    def _discard_shared_blend(self) -> None:
+        path = self.shared_blend_path
+        self.shared_blend_path = None
+        if not path:
+            return
+        with self.lock:
+            # Another job rendering the same scene into the same directory still needs it
+            if any(job is not self and job.shared_blend_path == path for job in self.state.jobs.values()):
+                return
+        try:
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass
+
+
+class MasterState:
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        self.slaves: dict[str, SlaveInfo] = {}
+        self.connections: dict[str, "SlaveConnection"] = {}
+        # Submitted jobs that still have work, in submission order
+        self.jobs: dict[str, Job] = {}
+        # Finished and cancelled jobs, most recent last
+        self.history: deque[Job] = deque(maxlen=JOB_HISTORY)
+        self.local_pool: Optional["LocalWorkerPool"] = None
+
+    @property
+    def job_active(self) -> bool:
+        return bool(self.jobs)
+
+    def submit(self, job: Job) -> None:
+        with self.lock:
+            self.jobs[job.job_id] = job
+
+    def job_for(self, job_id: Optional[str]) -> Optional[Job]:
+        with self.lock:
+            return self.jobs.get(job_id or "")
+
+    def pick_job(self, slave_id: str, current: Optional[Job], job_types: Optional[tuple[str, ...]] = None) -> Optional[Job]:
+        """Job a worker should serve next: highest priority first, then fair share.
+
+        A worker stays on its current job while that job has work and no
+        other job of the same priority is clearly short of workers, so blends
+        are not reloaded needlessly.
+        """
+        with self.lock:
+            candidates = [
+                job for job in self.jobs.values()
+                if job.has_work()
+                and slave_id not in job.blacklist
+                and (job_types is None or job.job_type in job_types)
+            ]
+            if not candidates:
+                return current if current is not None and current.job_id in self.jobs else None
+            top = max(job.priority for job in candidates)
+            candidates = [job for job in candidates if job.priority == top]
+
+            def load(job: Job) -> int:
+                return len(job.workers - {slave_id})
+
+            fewest = min(load(job) for job in candidates)
+            if current in candidates and load(current) <= fewest + 1:
+                return current
+            return min(candidates, key=lambda job: (load(job), job.submitted))
+
+    def bind(self, slave_id: str, job: Optional[Job], previous: Optional[Job]) -> None:
+        with self.lock:
+            if previous is not None:
+                previous.workers.discard(slave_id)
+            if job is not None:
+                job.workers.add(slave_id)
+
+    def release_slave(self, slave_id: str) -> list[int]:
+        """Return every frame any job leased to a slave."""
+        with self.lock:
+            frames: list[int] = []
+            for job in self.jobs.values():
+                frames.extend(job.release_slave(slave_id))
+        return frames
+
+    def expire_leases(self) -> list[tuple[Job, str, int]]:
+        with self.lock:
+            return [(job, sid, frame) for job in self.jobs.values() for sid, frame in job.expire_leases()]
+
+    def retire_finished(self) -> list[Job]:
+        """Move finished jobs to the history and free their blends."""
+        with self.lock:
+            done = [job for job in self.jobs.values() if job.finished()]
+            for job in done:
+                del self.jobs[job.job_id]
+                job.status = "failed" if job.frames_failed else "done"
+                job.workers.clear()
+                self.history.append(job)
+        for job in done:
+            job.discard()
+        return done
+
+    def cancel_job(self, job_id: str) -> Optional[Job]:
+        with self.lock:
+            job = self.jobs.pop(job_id, None)
+            if job is None:
+                return None
+            job.status = "cancelled"
+            job.frame_queue.clear()
+            job.leases.clear()
+            job.workers.clear()
+            self.history.append(job)
+        job.discard()
+        return job
+
+    def totals(self) -> tuple[int, int]:
+        """Frames done and total over the jobs still queued."""
+        with self.lock:
+            return (
+                sum(job.frames_done for job in self.jobs.values()),
+                sum(job.total_frames for job in self.jobs.values()),
+            )
+
+
+MASTER_STATE = MasterState()
+
+
+class JobJournal:
+    """SQLite record of submitted jobs and their finished frames, so a crashed master can resume."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                job_type TEXT NOT NULL,
+                status TEXT NOT NULL,
+                submitted REAL NOT NULL,
+                frames TEXT NOT NULL,
+                frame_step INTEGER NOT NULL,
+                output_dir TEXT NOT NULL,
+                render_format TEXT NOT NULL,
+                blend_path TEXT,
+                blend_hash TEXT,
+                init_header TEXT,
+                settings TEXT,
+                stitch TEXT
+            );
+            CREATE TABLE IF NOT EXISTS frames (
+                job_id TEXT NOT NULL,
+                frame INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                completed REAL NOT NULL,
+                mtime REAL,
+                PRIMARY KEY (job_id, frame)
+            );
+            CREATE TABLE IF NOT EXISTS packed_blends (
+                fingerprint TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                blend_hash TEXT NOT NULL,
+                used REAL NOT NULL
+            );
+            """
+        )
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(frames)")}
+        if "mtime" not in columns:
+            # Journals from before frames recorded their mtime; those get hashed on resume
+            self.db.execute("ALTER TABLE frames ADD COLUMN mtime REAL")
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+    def record_job(self, job: Job, frames: list[int]) -> None:
+        stitch = None
+        if job.stitcher:
+            height, width = job.stitcher.canvas.shape[:2]
+            stitch = {
+                "res_x": width,
+                "res_y": height,
+                "tiles": job.stitcher.tiles,
+                "out_path": job.stitcher.out_path,
+                "bit_depth": job.stitcher.bit_depth,
+            }
+        settings = {
+            "chunk_target_seconds": job.chunk_target_seconds,
+            "prefetch_depth": job.prefetch_depth,
+            "max_speculative": job.max_speculative,
+            "frame_order": job.frame_order,
+            "encode_preset": job.encode_preset,
+            "encode_fps": job.encode_fps,
+            "encode_delete_frames": job.encode_delete_frames,
+        }
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.job_id, job.name, job.priority, job.job_type, job.status, job.submitted,
+                    json.dumps(frames), job.frame_step, job.output_dir, job.render_format,
+                    job.temp_blend_path, job.blend_hash, json.dumps(job.init_header),
+                    json.dumps(settings), json.dumps(stitch) if stitch else None,
+                ),
+            )
+
+    def record_frame(self, job_id: str, frame: int, path: str, sha256: str) -> None:
+        st = os.stat(path)
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO frames (job_id, frame, path, size, sha256, completed, mtime)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, frame, path, st.st_size, sha256, time.time(), st.st_mtime),
+            )
+
+    def set_status(self, job_id: str, status: str) -> None:
+        with self.lock:
+            self.db.execute("UPDATE jobs SET status = ? WHERE job_id = ?", (status, job_id))
+
+    def unfinished_jobs(self) -> list[sqlite3.Row]:
+        with self.lock:
+            self.db.row_factory = sqlite3.Row
+            try:
+                return self.db.execute(
+                    "SELECT * FROM jobs WHERE status IN ('queued', 'rendering') ORDER BY submitted"
+                ).fetchall()
+            finally:
+                self.db.row_factory = None
+
+    def packed_blend(self, fingerprint: str) -> Optional[tuple[str, str]]:
+        """Path and sha256 of the packed blend cached for a fingerprint, marking it used."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT path, blend_hash FROM packed_blends WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+            if row:
+                self.db.execute("UPDATE packed_blends SET used = ? WHERE fingerprint = ?", (time.time(), fingerprint))
+            return row
+
+    def record_packed_blend(self, fingerprint: str, path: str, blend_hash: str) -> None:
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO packed_blends VALUES (?, ?, ?, ?)",
+                (fingerprint, path, blend_hash, time.time()),
+            )
+
+    def is_packed_blend(self, path: str) -> bool:
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM packed_blends WHERE path = ?", (path,)).fetchone() is not None
+
+    def prune_packed_blends(self, keep: int, in_use: set[str]) -> list[str]:
+        """Forget all but the ``keep`` most recently used blends not in use; returns their paths."""
+        with self.lock:
+            rows = self.db.execute("SELECT fingerprint, path FROM packed_blends ORDER BY used DESC").fetchall()
+            stale = [(fp, path) for fp, path in rows if path not in in_use][keep:]
+            for fp, _ in stale:
+                self.db.execute("DELETE FROM packed_blends WHERE fingerprint = ?", (fp,))
+            return [path for _, path in stale]
+
+    def completed_frames(self, job_id: str) -> list[tuple[int, str, int, str, Optional[float]]]:
+        with self.lock:
+            return self.db.execute(
+                "SELECT frame, path, size, sha256, mtime FROM frames WHERE job_id = ?", (job_id,)
+            ).fetchall()
+
+
+class Histogram:
+    """Cumulative bucket counts in the Prometheus histogram layout."""
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "buckets": {str(b): c for b, c in zip(self.buckets, self.counts)},
+            "sum": self.total,
+            "count": self.count,
+        }
+
+
+class SlaveMetrics:
+    def __init__(self) -> None:
+        self.frames_rendered = 0
+        self.failures = 0
+        self.lease_expiries = 0
+        self.upload_bytes = 0
+        self.upload_seconds = 0.0
+        self.idle_seconds = 0.0
+        self.idle_since: Optional[float] = None
+        self.render_seconds = Histogram(RENDER_BUCKETS)
+        self.upload_latency = Histogram(UPLOAD_BUCKETS)
+        self.queue_wait = Histogram(QUEUE_WAIT_BUCKETS)
+
+    def idle_total(self) -> float:
+        if self.idle_since is None:
+            return self.idle_seconds
+        return self.idle_seconds + time.time() - self.idle_since
+
+
+class FarmMetrics:
+    """Per-slave counters and latency histograms plus the farm's rolling throughput."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.slaves: dict[str, SlaveMetrics] = {}
+        self.completions: deque[float] = deque()
+
+    def _slave(self, slave_id: str) -> SlaveMetrics:
+        metrics = self.slaves.get(slave_id)
+        if metrics is None:
+            metrics = self.slaves[slave_id] = SlaveMetrics()
+        return metrics
+
+    def record_render(self, slave_id: str, seconds: float) -> None:
+        with self.lock:
+            self._slave(slave_id).render_seconds.observe(seconds)
+
+    def record_upload(self, slave_id: str, size: int, seconds: float) -> None:
+        with self.lock:
+            metrics = self._slave(slave_id)
+            metrics.upload_bytes += size
+            metrics.upload_seconds += seconds
+            metrics.upload_latency.observe(seconds)
+
+    def record_queue_wait(self, slave_id: str, seconds: float) -> None:
+        with self.lock:
+            self._slave(slave_id).queue_wait.observe(max(0.0, seconds))
+
+    def record_completion(self, slave_id: Optional[str]) -> None:
+        now = time.time()
+        with self.lock:
+            if slave_id:
+                self._slave(slave_id).frames_rendered += 1
+            self.completions.append(now)
+            self._prune(now)
+
+    def record_failure(self, slave_id: str) -> None:
+        with self.lock:
+            self._slave(slave_id).failures += 1
+
+    def record_lease_expiry(self, slave_id: str) -> None:
+        with self.lock:
+            self._slave(slave_id).lease_expiries += 1
+
+    def set_idle(self, slave_id: str, idle: bool) -> None:
+        now = time.time()
+        with self.lock:
+            metrics = self._slave(slave_id)
+            if idle and metrics.idle_since is None:
+                metrics.idle_since = now
+            elif not idle and metrics.idle_since is not None:
+                metrics.idle_seconds += now - metrics.idle_since
+                metrics.idle_since = None
+
+    def _prune(self, now: float) -> None:
+        while self.completions and self.completions[0] < now - TELEMETRY_WINDOW:
+            self.completions.popleft()
+
+    def throughput(self) -> Optional[float]:
+        """Frames per second over the rolling window; decays if the farm stalls."""
+        now = time.time()
+        with self.lock:
+            self._prune(now)
+            if len(self.completions) < 2:
+                return None
+            return (len(self.completions) - 1) / max(now - self.completions[0], 1e-3)
+
+    def eta_seconds(self) -> Optional[float]:
+        done, total = MASTER_STATE.totals()
+        rate = self.throughput()
+        if total <= done:
+            return 0.0 if total else None
+        if not rate:
+            return None
+        return (total - done) / rate
+
+    def snapshot(self) -> dict:
+        with MASTER_STATE.lock:
+            names = {sid: info.name for sid, info in MASTER_STATE.slaves.items()}
+            connected = {sid for sid, info in MASTER_STATE.slaves.items() if info.connected}
+            jobs = [
+                {
+                    "id": job.job_id,
+                    "name": job.name,
+                    "priority": job.priority,
+                    "status": job.status,
+                    "frames_done": job.frames_done,
+                    "frames_total": job.total_frames,
+                    "frames_failed": len(job.frames_failed),
+                    "workers": len(job.workers),
+                }
+                for job in MASTER_STATE.jobs.values()
+            ]
+        done, total = MASTER_STATE.totals()
+        rate = self.throughput()
+        eta = self.eta_seconds()
+        with self.lock:
+            slaves = {}
+            for sid, m in self.slaves.items():
+                render_count = m.render_seconds.count
+                slaves[sid] = {
+                    "name": names.get(sid, sid),
+                    "connected": sid in connected,
+                    "frames_rendered": m.frames_rendered,
+                    "seconds_per_frame": m.render_seconds.total / render_count if render_count else None,
+                    "failures": m.failures,
+                    "lease_expiries": m.lease_expiries,
+                    "upload_bytes": m.upload_bytes,
+                    "upload_seconds": m.upload_seconds,
+                    "upload_mbps": m.upload_bytes * 8 / 1e6 / m.upload_seconds if m.upload_seconds else None,
+                    "idle_seconds": m.idle_total(),
+                    "render_seconds": m.render_seconds.snapshot(),
+                    "upload_latency_seconds": m.upload_latency.snapshot(),
+                    "queue_wait_seconds": m.queue_wait.snapshot(),
+                }
+        return {
+            "farm": {
+                "frames_done": done,
+                "frames_total": total,
+                "throughput_fps": rate,
+                "eta_seconds": eta,
+                "jobs_queued": len(jobs),
+            },
+            "jobs": jobs,
+            "slaves": slaves,
+        }
+
+    def prometheus(self) -> str:
+        snap = self.snapshot()
+        lines: list[str] = []
+
+        def metric(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def labels(sid: str, data: dict) -> str:
+            name = str(data["name"]).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            return f'slave="{name}",id="{sid}"'
+
+        farm = snap["farm"]
+        metric("ar_frames_done", "gauge", "Frames finished over queued jobs.")
+        lines.append(f"ar_frames_done {farm['frames_done']}")
+        metric("ar_frames_total", "gauge", "Frames in queued jobs.")
+        lines.append(f"ar_frames_total {farm['frames_total']}")
+        metric("ar_jobs_queued", "gauge", "Jobs still rendering or waiting.")
+        lines.append(f"ar_jobs_queued {farm['jobs_queued']}")
+        if farm["throughput_fps"] is not None:
+            metric("ar_throughput_frames_per_second", "gauge", "Farm throughput over the rolling window.")
+            lines.append(f"ar_throughput_frames_per_second {farm['throughput_fps']:.6f}")
+        if farm["eta_seconds"] is not None:
+            metric("ar_eta_seconds", "gauge", "Estimated seconds until all queued jobs finish.")
+            lines.append(f"ar_eta_seconds {farm['eta_seconds']:.1f}")
+
+        counters = (
+            ("ar_slave_connected", "gauge", "connected", "Whether the slave is connected."),
+            ("ar_slave_frames_rendered_total", "counter", "frames_rendered", "Frames rendered and stored."),
+            ("ar_slave_failures_total", "counter", "failures", "Frames the slave reported as failed or sent corrupt."),
+            ("ar_slave_lease_expiries_total", "counter", "lease_expiries", "Leases that timed out on the slave."),
+            ("ar_slave_upload_bytes_total", "counter", "upload_bytes", "Frame payload bytes received."),
+            ("ar_slave_upload_seconds_total", "counter", "upload_seconds", "Seconds spent receiving frame payloads."),
+            ("ar_slave_idle_seconds_total", "counter", "idle_seconds", "Seconds connected with no work while jobs were queued."),
+        )
+        for name, kind, key, help_text in counters:
+            metric(name, kind, help_text)
+            for sid, data in snap["slaves"].items():
+                lines.append(f"{name}{{{labels(sid, data)}}} {float(data[key]):g}")
+
+        histograms = (
+            ("ar_slave_render_seconds", "render_seconds", "Render time per frame as reported by the slave."),
+            ("ar_slave_upload_latency_seconds", "upload_latency_seconds", "Time to receive one frame payload."),
+            ("ar_slave_queue_wait_seconds", "queue_wait_seconds", "Time a frame waited on the slave before rendering."),
+        )
+        for name, key, help_text in histograms:
+            metric(name, "histogram", help_text)
+            for sid, data in snap["slaves"].items():
+                hist = data[key]
+                base = labels(sid, data)
+                for bound, count in hist["buckets"].items():
+                    le = "+Inf" if bound == "inf" else bound
+                    lines.append(f'{name}_bucket{{{base},le="{le}"}} {count}')
+                lines.append(f"{name}_sum{{{base}}} {hist['sum']:g}")
+                lines.append(f"{name}_count{{{base}}} {hist['count']}")
+        return "\n".join(lines) + "\n"
+
+
+FARM_METRICS = FarmMetrics()
+
+
+def _spool_dir() -> str:
+    path = os.path.join(tempfile.gettempdir(), "ar_spool")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _write_frame_file(src_path: str, dest_path: str, expected_sha256: Optional[str]) -> str:
+    """Verify a spooled frame and atomically move it to ``dest_path``; returns its sha256.
+
+    Raises ValueError when the file does not match ``expected_sha256``.
+    """
+    dest_dir = os.path.dirname(dest_path)
+    tmp_path = os.path.join(dest_dir, f".{os.path.basename(dest_path)}.{uuid.uuid4().hex}.part")
+    try:
+        if os.stat(src_path).st_dev == os.stat(dest_dir).st_dev:
+            digest_hex = _file_sha256(src_path)
+            if expected_sha256 and digest_hex != expected_sha256:
+                raise ValueError("checksum mismatch")
+            os.replace(src_path, dest_path)
+            return digest_hex
+        digest = hashlib.sha256()
+        with open(src_path, "rb") as src, open(tmp_path, "wb") as dst:
+            while True:
+                chunk = src.read(RECV_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                dst.write(chunk)
+            dst.flush()
+            os.fsync(dst.fileno())
+        if expected_sha256 and digest.hexdigest() != expected_sha256:
+            raise ValueError("checksum mismatch")
+        os.replace(tmp_path, dest_path)
+        return digest.hexdigest()
+    finally:
+        for path in (tmp_path, src_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _commit_frame(job: "Job", frame: int, src_path: str, dest_path: str, expected_sha256: Optional[str]) -> None:
+    """Move a received frame into place, journal it and pass it on to the preview and encoder.
+
+    Runs on a writer thread.
+    """
+    digest_hex = _write_frame_file(src_path, dest_path, expected_sha256)
+    _publish_frame(job, frame, dest_path, digest_hex)
+
+
+def _commit_shared_frame(job: "Job", frame: int, part_path: str, dest_path: str, sha256: str, size: int) -> None:
+    """Rename a frame a slave wrote to shared storage into place. Runs on a writer thread.
+
+    Only the size is checked; reading the frame back to hash it would pull it
+    over the network the slave just saved. Resume verifies the checksum.
+    """
+    try:
+        if os.path.getsize(part_path) != size:
+            raise ValueError("size mismatch")
+        os.replace(part_path, dest_path)
+    except BaseException:
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        raise
+    _publish_frame(job, frame, dest_path, sha256)
+
+
+def _publish_frame(job: "Job", frame: int, dest_path: str, digest_hex: str) -> None:
+    if _journal is not None:
+        _journal.record_frame(job.job_id, frame, dest_path, digest_hex)
+    if job.preview is not None:
+        try:
+            job.preview.add(frame, dest_path)
+        except OSError as exc:
+            _safe_log(f"Preview update failed for frame {frame}: {exc}")
+    if job.encoder is not None:
+        job.encoder.add(frame, dest_path)
+
+
+def _write_tile(stitcher: TileStitcher, index: int, src_path: str, expected_sha256: Optional[str]) -> None:
+    """Verify a spooled tile and place it on the stitcher canvas."""
+    try:
+        if expected_sha256 and _file_sha256(src_path) != expected_sha256:
+            raise ValueError("checksum mismatch")
+        if index not in stitcher.received:
+            stitcher.add_tile(index, src_path)
+    finally:
+        try:
+            os.remove(src_path)
+        except OSError:
+            pass
+
+
+class FrameWriter:
+    """Bounded thread pool that moves received frames into place off the event loop."""
+
+    def __init__(self, workers: int = FRAME_WRITER_WORKERS, max_pending: int = FRAME_WRITER_MAX_PENDING) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ar_writer")
+        self.slots = asyncio.Semaphore(max_pending)
+
+    async def submit(self, on_done: Callable[[Optional[BaseException]], None], fn: Callable, *args) -> None:
+        """Wait for a free slot and start ``fn``; ``on_done`` later gets its exception on the loop thread."""
+        await self.slots.acquire()
+        future = asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+        def finished(fut: asyncio.Future) -> None:
+            self.slots.release()
+            on_done(None if fut.cancelled() else fut.exception())
+
+        future.add_done_callback(finished)
+
+    def shutdown(self) -> None:
+        # Let queued frames reach the output directory
+        self.executor.shutdown(wait=True)
+
+
+class DiscoveryProtocol(asyncio.DatagramProtocol):
+    """Records slaves announcing themselves on the discovery port."""
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        try:
+            msg = json.loads(data.decode("utf-8"))
+            if msg.get("magic") != DISCOVERY_MAGIC:
+                return
+            if msg.get("role") != "slave":
+                return
+            slave_name = str(msg.get("name", "unknown"))
+            slave_id = str(msg.get("id", slave_name))
+            with MASTER_STATE.lock:
+                info = MASTER_STATE.slaves.get(slave_id)
+                if not info:
+                    info = SlaveInfo(slave_id, slave_name, (addr[0], 0))
+                    MASTER_STATE.slaves[slave_id] = info
+                info.last_seen = time.time()
+        except Exception:
+            return
+
+
+class SlaveConnection:
+    """One connected slave, served by a reader coroutine and a writer task on the event loop."""
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        io_pool: ThreadPoolExecutor,
+        frame_writer: FrameWriter,
+    ) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.io_pool = io_pool
+        self.frame_writer = frame_writer
+        self.address = writer.get_extra_info("peername")
+        self.slave_id: Optional[str] = None
+        self.slave_name: Optional[str] = None
+        self.protocol = 1
+        # Messages waiting for the writer task; a slow slave only backs up its own queue
+        self.outbox: asyncio.Queue = asyncio.Queue()
+        self.closed = False
+        # Job this slave serves; it only moves to another one between chunks
+        self.job: Optional[Job] = None
+        self.job_ready = False
+        # Outstanding assignments, oldest first; each holds its unfinished frames
+        self.chunks: list[set[int]] = []
+        # When the current payload started arriving, for upload telemetry
+        self.upload_started = 0.0
+
+    def send(self, header: dict, binary: Optional[bytes] = None, file_path: Optional[str] = None) -> None:
+        """Queue a message for the writer task. Must be called on the event loop thread."""
+        if not self.closed:
+            self.outbox.put_nowait((header, binary, file_path, self.protocol))
+
+    def identify(self, slave_id: str, slave_name: str) -> None:
+        self.slave_id = slave_id
+        self.slave_name = slave_name
+        with MASTER_STATE.lock:
+            info = MASTER_STATE.slaves.get(slave_id)
+            if not info:
+                info = SlaveInfo(slave_id, slave_name, self.address)
+                MASTER_STATE.slaves[slave_id] = info
+            info.connected = True
+            info.name = slave_name
+            info.address = self.address
+            info.last_seen = time.time()
+            MASTER_STATE.connections[slave_id] = self
+
+    async def _write_loop(self) -> None:
+        try:
+            while True:
+                item = await self.outbox.get()
+                if item is None:
+                    break
+                header, binary, file_path, version = item
+                await AsyncMessageProtocol.send(self.writer, header, binary, file_path, version)
+                if header.get("type") == "job_blend":
+                    _safe_log(f"Sent blend to {self.slave_name or self.address} ({os.path.getsize(file_path)} bytes)")
+        except Exception as exc:
+            _safe_log(f"Failed to send to {self.slave_name or self.address}: {exc}")
+            # Closing the transport ends the reader too, which releases our frames
+            self.writer.close()
+
+    async def run(self) -> None:
+        writer_task = asyncio.ensure_future(self._write_loop())
+        try:
+            _safe_log(f"Accepted connection from {self.address}")
+            while True:
+                msg = await AsyncMessageProtocol.recv(self.reader, self._payload_sink, self.io_pool)
+                if msg is None:
+                    break
+                header, binary = msg
+                if not await self._handle(header, binary):
+                    break
+        except Exception as exc:
+            _safe_log(f"Slave connection error: {exc}")
+        finally:
+            self.closed = True
+            writer_task.cancel()
+            self.writer.close()
+            if self.slave_id:
+                FARM_METRICS.set_idle(self.slave_id, False)
+            with MASTER_STATE.lock:
+                if self.slave_id and MASTER_STATE.connections.get(self.slave_id) is self:
+                    del MASTER_STATE.connections[self.slave_id]
+                    if self.slave_id in MASTER_STATE.slaves:
+                        MASTER_STATE.slaves[self.slave_id].connected = False
+                    requeued = MASTER_STATE.release_slave(self.slave_id)
+                else:
+                    requeued = []
+                self.job = None
+            if self.slave_id and MASTER_STATE.connections.get(self.slave_id) is None:
+                for job in list(MASTER_STATE.jobs.values()):
+                    job.blend_fanout.forget(self.slave_id)
+                    _serve_waiting_blends(job)
+            if requeued:
+                _safe_log(f"Requeued {len(requeued)} frames from {self.slave_name or self.address}")
+                for conn in list(MASTER_STATE.connections.values()):
+                    conn.fill_assignments()
+
+    async def _handle(self, header: dict, binary: Optional[bytes]) -> bool:
+        """Dispatch one message; returns False when the slave says goodbye."""
+        mtype = header.get("type")
+        if mtype == "hello":
+            sid = str(header.get("id", "")) or str(uuid.uuid4())
+            sname = str(header.get("name", sid))
+            self.identify(sid, sname)
+            self._record_capabilities(header)
+            offered = {int(v) for v in header.get("protocols") or [1]}
+            common = offered.intersection(SUPPORTED_PROTOCOLS)
+            version = max(common) if common else 1
+            # Acknowledge in version 1 framing, then switch
+            self.send({"type": "hello_ack", "protocol": version})
+            self.protocol = version
+            _safe_log(f"Handshake complete with {sname} ({sid}) @ {self.address}")
+            self.fill_assignments()
+        elif mtype == "have_blend":
+            _safe_log(f"Slave {self.slave_name or self.address} has blend cached; skipping transfer")
+            # Slaves reading it from shared storage have nothing to pass on
+            if self.job is not None and self.slave_id and not header.get("shared"):
+                if self.job.blend_fanout.finished(self.slave_id, self._serves_peers()):
+                    _serve_waiting_blends(self.job)
+        elif mtype == "need_blend":
+            self.request_blend(str(header.get("blend_hash", "")), bool(header.get("peer_failed")))
+        elif mtype == "ready":
+            # Older slaves omit the job; a stale ready from the previous job must not count
+            if self.job is not None and header.get("job_id") in (None, self.job.job_id):
+                self.job_ready = True
+                if self.slave_id in self.job.blend_fanout.sources:
+                    # The blend arrived; this slave can pass it on now
+                    self.job.blend_fanout.finished(self.slave_id, self._serves_peers())
+                    _serve_waiting_blends(self.job)
+            self.fill_assignments()
+        elif mtype == "frame_result":
+            frame = int(header.get("frame"))
+            ext = str(header.get("ext", "png"))
+            size = int(header.get("bin_size", 0))
+            _safe_log(f"Received frame {frame} ({size} bytes, .{ext}) from {self.slave_name or self.address}")
+            spool_path = header.get("bin_path")
+            job = MASTER_STATE.job_for(header.get("job_id")) if header.get("job_id") else self.job
+            if spool_path and self.slave_id:
+                self._record_frame_metrics(job, frame, size, header.get("render_time"))
+            if not spool_path:
+                _safe_log(f"Frame {frame} arrived without a payload")
+            elif job is None:
+                _safe_log(f"Discarding frame {frame} from a finished or cancelled job")
+                os.remove(spool_path)
+            elif job.stitcher:
+                await self.frame_writer.submit(
+                    functools.partial(self._frame_written, job, frame, header.get("render_time")),
+                    _write_tile, job.stitcher, frame, spool_path, header.get("sha256"),
+                )
+            elif job.output_dir:
+                dest_path = os.path.join(job.output_dir, f"frame_{frame:04d}.{ext}")
+                await self.frame_writer.submit(
+                    functools.partial(self._frame_written, job, frame, header.get("render_time")),
+                    _commit_frame, job, frame, spool_path, dest_path, header.get("sha256"),
+                )
+            else:
+                _safe_log(f"No output directory for frame {frame}; discarding")
+                os.remove(spool_path)
+        elif mtype == "frame_done":
+            # Written to shared storage by the slave; only the rename is left
+            frame = int(header.get("frame"))
+            ext = str(header.get("ext", "png"))
+            name = os.path.basename(str(header.get("name", "")))
+            job = MASTER_STATE.job_for(header.get("job_id")) if header.get("job_id") else self.job
+            _safe_log(f"Frame {frame} (.{ext}) saved to shared storage by {self.slave_name or self.address}")
+            if not (name.startswith(".") and name.endswith(".part")):
+                _safe_log(f"Ignoring frame {frame} with unexpected file name {name!r}")
+            elif job is None or not job.output_dir:
+                _safe_log(f"Discarding frame {frame} from a finished or cancelled job")
+                _remove_shared_part(header.get("job_id"), name)
+            else:
+                if self.slave_id:
+                    self._record_frame_metrics(job, frame, 0, header.get("render_time"), uploaded=False)
+                await self.frame_writer.submit(
+                    functools.partial(self._frame_written, job, frame, header.get("render_time")),
+                    _commit_shared_frame, job, frame, os.path.join(job.output_dir, name),
+                    os.path.join(job.output_dir, f"frame_{frame:04d}.{ext}"),
+                    str(header.get("sha256", "")), int(header.get("size", -1)),
+                )
+        elif mtype == "frame_failed":
+            frame = int(header.get("frame"))
+            _safe_log(f"Slave {self.slave_name or self.address} failed frame {frame}: {header.get('error')}")
+            job = MASTER_STATE.job_for(header.get("job_id")) if header.get("job_id") else self.job
+            if self.slave_id and job is not None:
+                job.fail_frame(self.slave_id, frame)
+                self.fill_assignments()
+        elif mtype == "frame_aborted":
+            # The slave killed the render for a reason of its own; requeue without counting it against it
+            job = MASTER_STATE.job_for(header.get("job_id")) if header.get("job_id") else self.job
+            frame = int(header.get("frame"))
+            if self.slave_id and job is not None and job.holds_lease(self.slave_id, frame):
+                _safe_log(f"Slave {self.slave_name or self.address} dropped frame {frame}; requeueing it")
+                job.unlease_frames(self.slave_id, [frame])
+                self.fill_assignments()
+        elif mtype == "heartbeat":
+            if self.slave_id:
+                job = MASTER_STATE.job_for(header.get("job_id")) or self.job
+                if job is not None:
+                    # Slaves list what they still hold; older ones send only the frame they are on
+                    frames = header.get("frames")
+                    job.renew_leases(self.slave_id, None if frames is None else [int(f) for f in frames])
+                with MASTER_STATE.lock:
+                    info = MASTER_STATE.slaves.get(self.slave_id)
+                    if info:
+                        info.last_seen = time.time()
+        elif mtype == "progress":
+            if self.slave_id and header.get("frame") is not None:
+                job = MASTER_STATE.job_for(header.get("job_id")) or self.job
+                eta = header.get("eta")
+                if job is not None:
+                    job.record_progress(
+                        self.slave_id,
+                        int(header["frame"]),
+                        float(header.get("percent", 0.0)),
+                        float(eta) if eta is not None else None,
+                    )
+                with MASTER_STATE.lock:
+                    info = MASTER_STATE.slaves.get(self.slave_id)
+                    if info:
+                        info.last_seen = time.time()
+        elif mtype == "log":
+            text = str(header.get("text", ""))
+            _safe_log(f"Slave {self.slave_name or self.address} log: {text}")
+        elif mtype == "bye":
+            _safe_log(f"Slave {self.slave_name or self.address} disconnected")
+            return False
+        return True
+
+    def _record_capabilities(self, header: dict) -> None:
+        with MASTER_STATE.lock:
+            info = MASTER_STATE.slaves.get(self.slave_id or "")
+            if not info:
+                return
+            info.cores = int(header.get("cores") or 0)
+            info.ram = int(header.get("ram") or 0)
+            info.blender_version = str(header.get("blender") or "")
+            info.score = float(header.get("score") or 0.0)
+            info.peer_port = int(header.get("peer_port") or 0)
+            roots = [r for r in header.get("shared_roots") or [] if isinstance(r, dict) and r.get("path")]
+            info.shared_read = [str(r["path"]) for r in roots if r.get("read")]
+            info.shared_write = [str(r["path"]) for r in roots if r.get("write")]
+        if info.shared_write:
+            _safe_log(f"{info.name} writes shared storage at {', '.join(info.shared_write)}")
+        if info.cores:
+            _safe_log(
+                f"{info.name}: {info.cores} cores, {info.ram / 2**30:0.1f} GB RAM, "
+                f"Blender {info.blender_version or '?'}, score {info.score:0.0f}"
+            )
+
+    def _record_frame_metrics(self, job: Optional[Job], frame: int, size: int, render_time, uploaded: bool = True) -> None:
+        sid = self.slave_id or ""
+        upload = 0.0
+        if uploaded:
+            now = time.perf_counter()
+            upload = max(0.0, now - self.upload_started) if self.upload_started else 0.0
+            self.upload_started = 0.0
+            FARM_METRICS.record_upload(sid, size, upload)
+        if render_time is None:
+            return
+        FARM_METRICS.record_render(sid, float(render_time))
+        if job is not None:
+            with job.lock:
+                started = job.lease_started.get((sid, frame))
+            if started is not None:
+                # Whatever the lease spent neither rendering nor uploading sat in the slave's queue
+                FARM_METRICS.record_queue_wait(sid, time.time() - started - float(render_time) - upload)
+
+    def _serves_peers(self) -> bool:
+        with MASTER_STATE.lock:
+            info = MASTER_STATE.slaves.get(self.slave_id or "")
+            return info is not None and info.peer_port > 0
+
+    def request_blend(self, blend_hash: str, peer_failed: bool = False) -> None:
+        """Send the blend from the master or point the slave at a peer that has it."""
+        job = self.job
+        if not job or not job.temp_blend_path or not self.slave_id or blend_hash != job.blend_hash:
+            _safe_log(f"Ignoring blend request for stale hash {blend_hash[:12]}")
+            return
+        if peer_failed:
+            job.blend_fanout.peer_failed(self.slave_id)
+        was_waiting = self.slave_id in job.blend_fanout.waiting
+        source = job.blend_fanout.request(self.slave_id, _can_serve_blend, self._serves_peers())
+        if source is None and not was_waiting:
+            _safe_log(f"{self.slave_name or self.address} waits for a free blend source")
+        elif source == BlendFanout.MASTER:
+            self._send_blend(job)
+        else:
+            peer = MASTER_STATE.connections[source]
+            with MASTER_STATE.lock:
+                port = MASTER_STATE.slaves[source].peer_port
+            _safe_log(f"{self.slave_name or self.address} fetches the blend from {peer.slave_name or peer.address}")
+            self.send({
+                "type": "blend_peer",
+                "job_id": job.job_id,
+                "blend_hash": blend_hash,
+                "host": peer.address[0],
+                "port": port,
+            })
+
+    def _send_blend(self, job: Job) -> None:
+        self.send(
+            {"type": "job_blend", "job_id": job.job_id, "blend_hash": job.blend_hash},
+            file_path=job.temp_blend_path,
+        )
+
+    def forget_frame(self, frame: int) -> None:
+        with MASTER_STATE.lock:
+            for chunk in self.chunks:
+                chunk.discard(frame)
+            self.chunks = [chunk for chunk in self.chunks if chunk]
+
+    def fill_assignments(self) -> None:
+        """Keep up to prefetch_depth chunks outstanding, moving to another job between chunks."""
+        if not self.slave_id or self.closed:
+            return
+        job = MASTER_STATE.pick_job(self.slave_id, self.job)
+        if job is not self.job:
+            if not self.chunks:
+                self.bind(job)
+            FARM_METRICS.set_idle(self.slave_id, job is not None and not self.chunks)
+            return
+        if job is None:
+            FARM_METRICS.set_idle(self.slave_id, False)
+            return
+        if not self.job_ready:
+            return
+        while len(self.chunks) < max(1, job.prefetch_depth):
+            if not self._assign_next_chunk(job):
+                break
+        if not self.chunks:
+            self._assign_speculative(job)
+        FARM_METRICS.set_idle(self.slave_id, not self.chunks)
+
+    def bind(self, job: Optional[Job]) -> None:
+        """Point the slave at a job; it answers job_init with ready once the blend is in place."""
+        previous = self.job
+        if previous is not None and self.slave_id:
+            # A transfer to a slave that moved on no longer occupies its source
+            previous.blend_fanout.cancel(self.slave_id)
+            _serve_waiting_blends(previous)
+        MASTER_STATE.bind(self.slave_id, job, self.job)  # type: ignore[arg-type]
+        self.job = job
+        self.job_ready = False
+        self.chunks = []
+        if job is not None and job.init_header:
+            _safe_log(f"Moving {self.slave_name or self.address} to job {job.name}")
+            self.send(self._job_init(job))
+
+    def _job_init(self, job: Job) -> dict:
+        """job_init for this slave, pointing at shared storage when it can reach the job there."""
+        header = job.init_header or {}
+        if not job.shared_blend_path:
+            return header
+        with MASTER_STATE.lock:
+            info = MASTER_STATE.slaves.get(self.slave_id or "")
+            readable = info is not None and _under_roots(job.shared_blend_path, info.shared_read)
+            writable = info is not None and _under_roots(job.output_dir, info.shared_write)
+        if not (readable and writable):
+            return header
+        return {**header, "shared": {"blend_path": job.shared_blend_path, "output_dir": job.output_dir}}
+
+    def _assign_speculative(self, job: Job) -> None:
+        if not self.slave_id or self.slave_id in job.blacklist:
+            return
+        with MASTER_STATE.lock:
+            frame = job.pick_speculative(self.slave_id)
+            if frame is None:
+                return
+            self.chunks.append({frame})
+            job.lease_frames(self.slave_id, [frame], speculative=True)
+        _safe_log(f"Speculatively assigning straggler frame {frame} to {self.slave_name or self.address}")
+        self.send({"type": "assign", "job_id": job.job_id, "frame": frame, "frames": [frame], "speculative": True})
+
+    def _assign_next_chunk(self, job: Job) -> bool:
+        if not self.slave_id or self.slave_id in job.blacklist:
+            return False
+        if job.should_defer(self.slave_id):
+            return False
+        size = job.chunk_size_for(self.slave_id)
+        frames = job.take_frames(size)
+        if not frames:
+            return False
+        with MASTER_STATE.lock:
+            self.chunks.append(set(frames))
+            job.lease_frames(self.slave_id, frames)
+        span = f"{frames[0]}..{frames[-1]}" if job.frame_order == FRAME_ORDER_LINEAR else ", ".join(map(str, frames))
+        _safe_log(f"Assigning frames {span} ({len(frames)}) of {job.name} to {self.slave_name or self.address}")
+        self.send({"type": "assign", "job_id": job.job_id, "frame": frames[0], "frames": frames})
+        return True
+
+    def _frame_written(
+        self,
+        job: Job,
+        frame: int,
+        render_time: Optional[float],
+        error: Optional[BaseException],
+    ) -> None:
+        if MASTER_STATE.job_for(job.job_id) is not job or not self.slave_id:
+            return
+        if error is None:
+            if render_time is not None:
+                job.record_frame_time(self.slave_id, float(render_time))
+            if job.complete_frame(self.slave_id, frame):
+                _cancel_duplicates(job, frame)
+            _retire_finished_jobs()
+        elif self.closed:
+            # release_slave already returned the frame to the queue
+            _safe_log(f"Failed to write frame {frame}: {error}")
+        elif isinstance(error, ValueError):
+            _safe_log(f"Frame {frame} from {self.slave_name or self.address} is corrupt: {error}")
+            job.fail_frame(self.slave_id, frame)
+        else:
+            _safe_log(f"Failed to write frame {frame}: {error}")
+            job.unlease_frames(self.slave_id, [frame])
+        self.fill_assignments()
+
+    def _payload_sink(self, header: dict) -> Optional[str]:
+        """Spool frame payloads to local disk; the frame writer moves them into the output directory."""
+        if header.get("type") != "frame_result":
+            return None
+        self.upload_started = time.perf_counter()
+        frame = int(header.get("frame", 0))
+        return os.path.join(_spool_dir(), f"frame_{frame:04d}.{uuid.uuid4().hex}.part")
+
+
+def _under_roots(path: str, roots: list[str]) -> bool:
+    path = os.path.abspath(path)
+    for root in roots:
+        root = os.path.abspath(root)
+        try:
+            if os.path.commonpath([path, root]) == root:
+                return True
+        except ValueError:
+            # Different drives on Windows
+            continue
+    return False
+
+
+def _can_serve_blend(slave_id: str) -> bool:
+    conn = MASTER_STATE.connections.get(slave_id)
+    return conn is not None and not conn.closed
+
+
+def _serve_waiting_blends(job: Job) -> None:
+    """Hand sources to slaves that were waiting for one. Runs on the event loop thread."""
+    for slave_id in job.blend_fanout.take_waiting():
+        conn = MASTER_STATE.connections.get(slave_id)
+        if conn is not None and conn.job is job:
+            conn.request_blend(job.blend_hash or "")
+
+
+def _remove_shared_part(job_id: Optional[str], name: str) -> None:
+    """Delete a frame a slave left on shared storage for a job that is gone."""
+    with MASTER_STATE.lock:
+        output_dirs = [job.output_dir for job in MASTER_STATE.history if job.job_id == job_id and job.output_dir]
+    for output_dir in output_dirs:
+        try:
+            os.remove(os.path.join(output_dir, name))
+        except OSError:
+            pass
+
+
+def _cancel_duplicates(job: Job, frame: int) -> None:
+    """Withdraw speculative copies of a finished frame. Runs on the event loop thread."""
+    for sid in job.duplicate_holders(frame):
+        conn = MASTER_STATE.connections.get(sid)
+        if conn is None:
+            continue
+        _safe_log(f"Cancelling duplicate of frame {frame} on {conn.slave_name or conn.address}")
+        conn.send({"type": "cancel", "job_id": job.job_id, "frames": [frame]})
+
+
+def _fill_all() -> None:
+    for conn in list(MASTER_STATE.connections.values()):
+        conn.fill_assignments()
+
+
+def _release_job(job: Job) -> None:
+    """Stop slaves still bound to a retired or cancelled job and move them on."""
+    for conn in list(MASTER_STATE.connections.values()):
+        if conn.job is job:
+            conn.send({"type": "cancel", "job_id": job.job_id})
+            conn.bind(None)
+
+
+def _retire_finished_jobs() -> None:
+    for job in MASTER_STATE.retire_finished():
+        _safe_log(f"Job {job.name} {job.status}: {job.frames_done}/{job.total_frames} frames")
+        if job.encoder is not None:
+            job.encoder.finish()
+        if _journal is not None:
+            _journal.set_status(job.job_id, job.status)
+        _release_job(job)
+    _fill_all()
+
+
+class MasterLoop(threading.Thread):
+    """Runs the asyncio event loop serving slaves, discovery and lease checks."""
+
+    def __init__(self) -> None:
+        super().__init__(daemon=True)
+        self.loop = asyncio.new_event_loop()
+        self.io_pool = ThreadPoolExecutor(max_workers=IO_POOL_WORKERS, thread_name_prefix="ar_io")
+        self.frame_writer = FrameWriter()
+        self.stop_event = threading.Event()
+
+    def run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._main())
+        except Exception as exc:
+            _safe_log(f"Master event loop error: {exc}")
+        finally:
+            self.loop.close()
+            self.io_pool.shutdown(wait=False)
+            self.frame_writer.shutdown()
+
+    def call(self, fn: Callable, *args) -> None:
+        """Run ``fn`` on the event loop thread."""
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    async def _main(self) -> None:
+        server = None
+        try:
+            server = await asyncio.start_server(
+                self._accept,
+                host="",
+                port=TCP_CONTROL_PORT,
+                reuse_address=True,
+                backlog=256,
+                limit=2 * RECV_CHUNK_SIZE,
+            )
+        except Exception as exc:
+            _safe_log(f"Failed to bind control port: {exc}")
+        telemetry = None
+        try:
+            telemetry = await asyncio.start_server(self._serve_telemetry, host=TELEMETRY_HOST, port=TELEMETRY_PORT, reuse_address=True)
+        except Exception as exc:
+            _safe_log(f"Failed to bind telemetry port: {exc}")
+        listener = await self._open_discovery_listener()
+        broadcaster = await self._open_broadcaster()
+        hostname = socket.gethostname()
+        ticks = 0
+        try:
+            while not self.stop_event.is_set():
+                if broadcaster and ticks % 4 == 0:
+                    self._broadcast_presence(broadcaster, hostname)
+                if ticks % 4 == 2:
+                    self._check_leases()
+                ticks += 1
+                await asyncio.sleep(0.5)
+        finally:
+            for srv in (server, telemetry):
+                if srv:
+                    srv.close()
+            for transport in (listener, broadcaster):
+                if transport:
+                    transport.close()
+            for conn in list(MASTER_STATE.connections.values()):
+                conn.writer.close()
+            # Let connection handlers run their cleanup before the loop closes
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            await SlaveConnection(reader, writer, self.io_pool, self.frame_writer).run()
+        except asyncio.CancelledError:
+            # Shutdown; the handler already released the slave's frames
+            pass
+
+    async def _serve_telemetry(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answer one HTTP GET with Prometheus text or a JSON snapshot of the farm."""
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5.0)
+            parts = request.split(b"\r\n", 1)[0].split()
+            path = parts[1].decode("ascii", "replace").split("?", 1)[0] if len(parts) > 1 else "/"
+            if path == "/metrics":
+                status, ctype, body = "200 OK", "text/plain; version=0.0.4", FARM_METRICS.prometheus()
+            elif path == "/metrics.json":
+                status, ctype, body = "200 OK", "application/json", json.dumps(FARM_METRICS.snapshot())
+            else:
+                status, ctype, body = "404 Not Found", "text/plain", "try /metrics or /metrics.json\n"
+            data = body.encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\n"
+                f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("ascii") + data
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        except Exception as exc:
+            _safe_log(f"Telemetry request failed: {exc}")
+        finally:
+            writer.close()
+
+    async def _open_discovery_listener(self) -> Optional[asyncio.DatagramTransport]:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(("", UDP_DISCOVERY_PORT))
+        except Exception as exc:
+            _safe_log(f"Failed to bind discovery port: {exc}")
+            sock.close()
+            return None
+        transport, _ = await self.loop.create_datagram_endpoint(DiscoveryProtocol, sock=sock)
+        return transport
+
+    async def _open_broadcaster(self) -> Optional[asyncio.DatagramTransport]:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        try:
+            transport, _ = await self.loop.create_datagram_endpoint(asyncio.DatagramProtocol, sock=sock)
+        except Exception as exc:
+            _safe_log(f"Failed to open discovery broadcast socket: {exc}")
+            sock.close()
+            return None
+        return transport
+
+    def _broadcast_presence(self, transport: asyncio.DatagramTransport, hostname: str) -> None:
+        try:
+            payload = json.dumps({
+                "magic": DISCOVERY_MAGIC,
+                "role": "master",
+                "name": hostname,
+                "port": TCP_CONTROL_PORT,
+            }).encode("utf-8")
+            transport.sendto(payload, (DISCOVERY_BROADCAST_ADDR, UDP_DISCOVERY_PORT))
+        except Exception:
+            pass
+
+    def _check_leases(self) -> None:
+        try:
+            expired = MASTER_STATE.expire_leases()
+            for job, slave_id, frame in expired:
+                _safe_log(f"Lease on frame {frame} of {job.name} held by {slave_id} expired; requeued")
+            # Also lets idle slaves pick up stragglers or move to other jobs
+            _retire_finished_jobs()
+        except Exception as exc:
+            _safe_log(f"Lease check error: {exc}")
+
+
+def _on_loop(fn: Callable, *args) -> None:
+    """Hand work that touches slave connections to the event loop thread."""
+    if _master_loop is not None and _master_loop.is_alive():
+        _master_loop.call(fn, *args)
+    else:
+        fn(*args)
+
+
+def build_job_init_header(job: Job, scene: dict) -> dict:
+    """job_init for a job; ``scene`` carries the frame range, resolution and render settings."""
+    header = {
+        "type": "job_init",
+        "job_id": job.job_id,
+        "job_type": job.job_type,
+        "frame_start": int(scene["frame_start"]),
+        "frame_end": int(scene["frame_end"]),
+        "frame_step": max(1, int(scene.get("frame_step", 1))),
+        "res_x": int(scene.get("res_x", 0)),
+        "res_y": int(scene.get("res_y", 0)),
+        "format": job.render_format,
+        "engine": scene.get("engine", ""),
+        "blend_hash": job.blend_hash,
+        "blend_size": os.path.getsize(job.temp_blend_path) if job.temp_blend_path else 0,
+        "blend_name": os.path.basename(job.temp_blend_path or "scene.blend"),
+    }
+    if job.stitcher:
+        header["still_frame"] = int(scene["still_frame"])
+        header["tiles"] = job.stitcher.tiles
+    return header
+
+
+class RenderAborted(RuntimeError):
+    """A local render was killed because its job was cancelled or the frame arrived from elsewhere."""
+
+
+class RenderWorker:
+    """Background Blender process that keeps the job's blend loaded between frames."""
+
+    def __init__(self, blender_bin: str, blend_path: str, threads: int, cpus: Optional[list[int]] = None) -> None:
+        self.blender_bin = blender_bin
+        self.blend_path = blend_path
+        self.threads = threads
+        self.cpus = cpus
+        self.frames_rendered = 0
+        self.proc: Optional[subprocess.Popen] = None
+        self.replies: queue.Queue[Optional[dict]] = queue.Queue()
+        self.reader_thread: Optional[threading.Thread] = None
+
+    def is_alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self) -> None:
+        cmd = [
+            self.blender_bin,
+            "-b",
+            self.blend_path,
+            "-t",
+            str(self.threads),
+            "--python-expr",
+            _WORKER_SCRIPT,
+        ]
+        # Set before exec so every render thread inherits the mask
+        preexec_fn = (
+            functools.partial(os.sched_setaffinity, 0, set(self.cpus))
+            if self.cpus and hasattr(os, "sched_setaffinity")
+            else None
+        )
+        t0 = time.time()
+        self.proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+            bufsize=1,
+            preexec_fn=preexec_fn,
+        )
+        self.reader_thread = threading.Thread(target=self._read_stdout, daemon=True)
+        self.reader_thread.start()
+        reply = self._wait_reply(WORKER_START_TIMEOUT)
+        if not reply or reply.get("event") != "loaded":
+            self.stop()
+            raise RuntimeError("Render worker failed to load blend")
+        _safe_log(f"Local render worker loaded {os.path.basename(self.blend_path)} in {time.time() - t0:0.1f}s")
+
+    def _read_stdout(self) -> None:
+        proc = self.proc
+        try:
+            for line in proc.stdout:  # type: ignore[union-attr]
+                if line.startswith(WORKER_MARKER):
+                    try:
+                        self.replies.put(json.loads(line[len(WORKER_MARKER):]))
+                    except ValueError:
+                        pass
+        except Exception:
+            pass
+        finally:
+            # Wake up anyone waiting on a reply from a dead worker
+            self.replies.put(None)
+
+    def _wait_reply(self, timeout: Optional[float] = None) -> Optional[dict]:
+        try:
+            return self.replies.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def render(
+        self,
+        frame: int,
+        out_pattern: str,
+        fmt: str,
+        keepalive: Optional[Callable[[], None]] = None,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ) -> str:
+        """Render one frame; ``keepalive`` is called periodically while waiting.
+
+        ``cancelled`` is polled every second; once it returns True the worker
+        is killed and RenderAborted raised.
+        """
+        if not self.is_alive():
+            raise RuntimeError("Render worker is not running")
+        cmd = {"op": "render", "frame": frame, "output": out_pattern, "format": fmt}
+        self.proc.stdin.write(json.dumps(cmd) + "\n")  # type: ignore[union-attr]
+        self.proc.stdin.flush()  # type: ignore[union-attr]
+        last_keepalive = time.time()
+        while True:
+            try:
+                reply = self.replies.get(timeout=1.0)
+                break
+            except queue.Empty:
+                if cancelled is not None and cancelled():
+                    self.abort()
+                    raise RenderAborted(f"Render of frame {frame} aborted")
+                if keepalive and time.time() - last_keepalive >= LEASE_TIMEOUT / 4:
+                    keepalive()
+                    last_keepalive = time.time()
+        if reply is None:
+            raise RuntimeError("Render worker exited during render")
+        if reply.get("event") != "done":
+            raise RuntimeError(str(reply.get("error", "unknown worker error")))
+        self.frames_rendered += 1
+        return str(reply.get("path"))
+
+    def stop(self) -> None:
+        proc = self.proc
+        if proc is None:
+            return
+        try:
+            if proc.poll() is None:
+                proc.stdin.write(json.dumps({"op": "quit"}) + "\n")  # type: ignore[union-attr]
+                proc.stdin.flush()  # type: ignore[union-attr]
+                proc.wait(timeout=5.0)
+        except Exception:
+            pass
+        if proc.poll() is None:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        self.proc = None
+
+    def abort(self) -> None:
+        """Kill the process now, even mid-frame."""
+        proc = self.proc
+        self.proc = None
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            proc.terminate()
+            proc.wait(timeout=1.0)
+        except Exception:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+
+
+def _render_cancelled(job: Job, frame: int) -> bool:
+    """Whether a local render is wasted: its job is gone or another slave delivered the frame."""
+    return MASTER_STATE.job_for(job.job_id) is not job or frame in job.frames_completed
+
+
+class LocalWorkerPool:
+    """Renders frames on the master machine with several persistent Blender processes.
+
+    Each worker picks a job and leases frames from it under its own slave id,
+    so priorities, leases, chunk sizing and progress treat it like a remote
+    slave. Workers exit once no animation job is left.
+    """
+
+    def __init__(
+        self,
+        blender_bin: str,
+        count: int,
+        threads: int = 0,
+        affinity: bool = False,
+        blender_version: str = "",
+    ) -> None:
+        self.blender_bin = blender_bin
+        self.blender_version = blender_version
+        self.count = max(1, count)
+        self.threads = threads
+        self.affinity = affinity
+        self.stop_event = threading.Event()
+        self.workers: list[threading.Thread] = []
+        self.slave_ids = [f"local-{i + 1}" for i in range(self.count)]
+        # A retiring pool's ids may already belong to its successor
+        self.infos: dict[str, SlaveInfo] = {}
+
+    def start(self) -> None:
+        if hasattr(os, "sched_getaffinity"):
+            cpus = sorted(os.sched_getaffinity(0))
+        else:
+            cpus = list(range(os.cpu_count() or 1))
+        per_worker = max(1, len(cpus) // self.count)
+        threads = self.threads or per_worker
+        if self.affinity and not hasattr(os, "sched_setaffinity"):
+            _safe_log("CPU affinity is not supported on this platform; using thread budgets only")
+        for i, slave_id in enumerate(self.slave_ids):
+            cores = cpus[i * per_worker:(i + 1) * per_worker] if self.affinity else None
+            with MASTER_STATE.lock:
+                info = SlaveInfo(slave_id, f"Local worker {i + 1}", ("127.0.0.1", 0))
+                info.connected = True
+                info.cores = len(cores) if cores else threads
+                info.blender_version = self.blender_version
+                MASTER_STATE.slaves[slave_id] = self.infos[slave_id] = info
+            t = threading.Thread(target=self._run, args=(slave_id, threads, cores or None), daemon=True)
+            self.workers.append(t)
+            t.start()
+        _safe_log(f"Started {self.count} local workers with {threads} threads each")
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def is_alive(self) -> bool:
+        return any(t.is_alive() for t in self.workers)
+
+    def accepting(self) -> bool:
+        """Running and not on its way out; check under MASTER_STATE.lock."""
+        return self.is_alive() and not self.stop_event.is_set()
+
+    def _run(self, slave_id: str, threads: int, cores: Optional[list[int]]) -> None:
+        worker: Optional[RenderWorker] = None
+        job: Optional[Job] = None
+        out_pattern = os.path.join(_spool_dir(), f"{slave_id}_#####")
+        try:
+            while not self.stop_event.is_set():
+                picked = MASTER_STATE.pick_job(slave_id, job, (JOB_ANIMATION,))
+                if picked is not job:
+                    MASTER_STATE.bind(slave_id, picked, job)
+                    job = picked
+                if job is None:
+                    with MASTER_STATE.lock:
+                        if not any(j.job_type == JOB_ANIMATION for j in MASTER_STATE.jobs.values()):
+                            # Retire the whole pool under the lock, so a job submitted
+                            # while the workers shut down gets a fresh pool
+                            self.stop_event.set()
+                            break
+                    # Frames may still come back from failed or expired leases
+                    self.stop_event.wait(1.0)
+                    continue
+                with MASTER_STATE.lock:
+                    frames = [] if job.should_defer(slave_id) else job.take_frames(job.chunk_size_for(slave_id))
+                    if frames:
+                        job.lease_frames(slave_id, frames)
+                if not frames:
+                    self.stop_event.wait(1.0)
+                    continue
+                for frame in frames:
+                    if self.stop_event.is_set() or MASTER_STATE.job_for(job.job_id) is not job:
+                        # Whatever is left of the chunk goes back with release_slave
+                        break
+                    if frame in job.frames_completed:
+                        # A speculative copy got there first
+                        job.complete_frame(slave_id, frame)
+                        continue
+                    try:
+                        if (
+                            worker is None
+                            or not worker.is_alive()
+                            or worker.blend_path != job.temp_blend_path
+                            or worker.frames_rendered >= WORKER_MAX_FRAMES
+                        ):
+                            if worker:
+                                worker.stop()
+                            worker = RenderWorker(self.blender_bin, str(job.temp_blend_path), threads, cores)
+                            worker.start()
+                        t0 = time.time()
+                        path = worker.render(
+                            frame,
+                            out_pattern,
+                            job.render_format,
+                            functools.partial(job.renew_leases, slave_id),
+                            functools.partial(_render_cancelled, job, frame),
+                        )
+                        dt = time.time() - t0
+                    except RenderAborted as exc:
+                        _safe_log(f"{exc} on {slave_id}")
+                        worker = None
+                        for name in os.listdir(_spool_dir()):
+                            if name.startswith(f"{slave_id}_{frame:05d}."):
+                                try:
+                                    os.remove(os.path.join(_spool_dir(), name))
+                                except OSError:
+                                    pass
+                        if frame in job.frames_completed:
+                            job.complete_frame(slave_id, frame)
+                        continue
+                    except Exception as exc:
+                        _safe_log(f"Local render failed for frame {frame}: {exc}")
+                        if worker:
+                            worker.stop()
+                        worker = None
+                        job.fail_frame(slave_id, frame)
+                        continue
+                    if MASTER_STATE.job_for(job.job_id) is not job or frame in job.frames_completed:
+                        os.remove(path)
+                        job.complete_frame(slave_id, frame)
+                        continue
+                    ext = os.path.splitext(path)[1].lstrip(".").lower() or job.render_format.lower()
+                    if ext == "jpeg":
+                        ext = "jpg"
+                    try:
+                        _commit_frame(job, frame, path, os.path.join(job.output_dir, f"frame_{frame:04d}.{ext}"), None)
+                    except Exception as exc:
+                        _safe_log(f"Failed to write frame {frame}: {exc}")
+                        job.unlease_frames(slave_id, [frame])
+                        continue
+                    job.record_frame_time(slave_id, dt)
+                    FARM_METRICS.record_render(slave_id, dt)
+                    if job.complete_frame(slave_id, frame):
+                        _on_loop(_cancel_duplicates, job, frame)
+        finally:
+            if worker:
+                worker.stop()
+            with MASTER_STATE.lock:
+                if job is not None:
+                    job.release_slave(slave_id)
+                if MASTER_STATE.slaves.get(slave_id) is self.infos.get(slave_id):
+                    MASTER_STATE.slaves.pop(slave_id, None)
+
+
+def ensure_local_pool(blender_bin: str, count: int, threads: int = 0, affinity: bool = False, blender_version: str = "") -> None:
+    """Start the local pool for a new submission unless one is still running."""
+    if count < 1 or not blender_bin:
+        return
+    with MASTER_STATE.lock:
+        pool = MASTER_STATE.local_pool
+        if pool is not None and pool.accepting():
+            return
+        pool = LocalWorkerPool(blender_bin, count, threads, affinity, blender_version)
+        MASTER_STATE.local_pool = pool
+        pool.start()
+
+
+def submit_job(job: Job, frames: list[int], scene: dict) -> Job:
+    """Hash the job's packed blend, journal the job and queue it; slaves pick it up by priority."""
+    if not job.blend_hash:
+        job.blend_hash = _file_sha256(str(job.temp_blend_path))
+    _safe_log(f"Prepared blend: {job.temp_blend_path} (sha256 {job.blend_hash[:12]})")
+    job.init_header = build_job_init_header(job, scene)
+    _stage_shared_blend(job)
+    _attach_preview(job, frames)
+    _attach_encoder(job, frames)
+    if _journal is not None:
+        _journal.record_job(job, frames)
+    MASTER_STATE.submit(job)
+    _safe_log(f"Queued job {job.name} ({job.job_type}, priority {job.priority}) units: {frames[:3]}... total={job.total_frames}")
+
+    # Slaves move over between chunks; they answer job_init with need_blend
+    # on a cache miss and with ready once the blend is available.
+    _on_loop(_fill_all)
+    return job
+
+
+def _stage_shared_blend(job: Job) -> None:
+    """Copy the job's blend next to its output when that is on shared storage."""
+    if job.job_type != JOB_ANIMATION or not job.output_dir or not job.temp_blend_path or not job.blend_hash:
+        return
+    if not _under_roots(job.output_dir, SHARED_ROOTS):
+        return
+    blend_dir = os.path.join(job.output_dir, SHARED_BLEND_DIR_NAME)
+    path = os.path.join(blend_dir, f"{job.blend_hash}.blend")
+    part_path = f"{path}.{uuid.uuid4().hex}.part"
+    try:
+        # Named by content, so a copy left by an earlier job is as good as a new one
+        if not os.path.exists(path):
+            os.makedirs(blend_dir, exist_ok=True)
+            shutil.copyfile(job.temp_blend_path, part_path)
+            os.replace(part_path, path)
+    except OSError as exc:
+        _safe_log(f"Could not stage {job.name} on shared storage; sending blends over TCP: {exc}")
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        return
+    job.shared_blend_path = path
+    _safe_log(f"Staged blend for {job.name} on shared storage at {path}")
+
+
+def _attach_preview(job: Job, frames: list[int], completed: Optional[set[int]] = None) -> None:
+    if job.frame_order == FRAME_ORDER_INTERLEAVED and job.job_type == JOB_ANIMATION and job.output_dir:
+        preview_dir = os.path.join(job.output_dir, PREVIEW_DIR_NAME)
+        job.preview = HoldFramePreview(frames, preview_dir, completed)
+        _safe_log(f"Hold-frame preview of {job.name} in {preview_dir}")
+
+
+def _attach_encoder(job: Job, frames: list[int], completed: Optional[list[tuple[int, str]]] = None) -> None:
+    if not job.encode_preset or job.job_type != JOB_ANIMATION or not job.output_dir:
+        return
+    if not shutil.which(FFMPEG_BIN):
+        _safe_log(f"{FFMPEG_BIN} not found; {job.name} will not be encoded")
+        return
+    job.encoder = FrameEncoder(frames, job.output_dir, job.encode_fps, job.encode_preset, job.encode_delete_frames, FFMPEG_BIN)
+    for frame, path in sorted(completed or ()):
+        job.encoder.add(frame, path)
+    job.encoder.start()
+
+
+def journal_dir() -> str:
+    """Directory holding the journal database and packed job blends."""
+    path = _journal_root or os.path.join(tempfile.gettempdir(), JOURNAL_DIR_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def blend_fingerprint(source_path: str, dependencies: Sequence[str] = (), extra: str = "") -> str:
+    """Identity of a scene: the saved blend, the external files it uses and ``extra`` (e.g. the Blender version)."""
+    digest = hashlib.sha256(extra.encode("utf-8"))
+    digest.update(_cached_sha256(source_path).encode("ascii"))
+    for path in sorted(set(dependencies)):
+        digest.update(path.encode("utf-8", "replace"))
+        try:
+            digest.update(_cached_sha256(path).encode("ascii"))
+        except OSError:
+            digest.update(b"missing")
+    return digest.hexdigest()
+
+
+_pack_lock = threading.Lock()
+
+
+def prepare_blend(source_path: str, fingerprint: Optional[str] = None, blender_bin: str = "") -> tuple[str, str]:
+    """Packed copy of a blend for a job and its sha256, reused while the fingerprint matches.
+
+    With ``blender_bin`` the copy is packed in a background Blender, so the
+    user's file is never touched; without it the file is copied as-is.
+    """
+    fingerprint = fingerprint or blend_fingerprint(source_path, extra="packed" if blender_bin else "copy")
+    with _pack_lock:
+        cached = _journal.packed_blend(fingerprint) if _journal is not None else None
+        if cached and os.path.exists(cached[0]):
+            _safe_log(f"Scene unchanged; reusing packed blend {os.path.basename(cached[0])}")
+            return cached[0], cached[1]
+        blend_dir = os.path.join(journal_dir(), "blends")
+        os.makedirs(blend_dir, exist_ok=True)
+        dest = os.path.join(blend_dir, f"ar_job_{uuid.uuid4().hex}.blend")
+        t0 = time.time()
+        if blender_bin:
+            cmd = [
+                blender_bin, "-b", "--factory-startup", source_path,
+                "--python-exit-code", "1", "--python-expr", _PACK_SCRIPT, "--", dest,
+            ]
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors="replace")
+            if result.returncode != 0 or not os.path.exists(dest):
+                tail = "\n".join(result.stdout.strip().splitlines()[-5:])
+                raise RuntimeError(f"Packing {os.path.basename(source_path)} failed: {tail}")
+        else:
+            shutil.copyfile(source_path, dest)
+        blend_hash = _file_sha256(dest)
+        if _journal is not None:
+            _journal.record_packed_blend(fingerprint, dest, blend_hash)
+        verb = "Packed" if blender_bin else "Copied"
+        _safe_log(f"{verb} {os.path.basename(source_path)} into {os.path.basename(dest)} in {time.time() - t0:0.1f}s")
+    _prune_packed_blends()
+    return dest, blend_hash
+
+
+def _prune_packed_blends() -> None:
+    """Delete cached packed blends beyond PACKED_BLEND_KEEP that no job still needs."""
+    if _journal is None:
+        return
+    with MASTER_STATE.lock:
+        in_use = {job.temp_blend_path for job in MASTER_STATE.jobs.values() if job.temp_blend_path}
+    # Interrupted jobs resume from their blends too
+    in_use.update(row["blend_path"] for row in _journal.unfinished_jobs() if row["blend_path"])
+    for path in _journal.prune_packed_blends(PACKED_BLEND_KEEP, in_use):  # type: ignore[arg-type]
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _verified_frames(journal: JobJournal, job_id: str) -> set[int]:
+    """Journaled frames still on disk with the recorded size and checksum.
+
+    Frames whose size and mtime match the journal are taken as they are;
+    only touched ones are hashed again. A file rewritten with the same size
+    and mtime is therefore not noticed.
+    """
+    done: set[int] = set()
+    for frame, path, size, sha256, mtime in journal.completed_frames(job_id):
+        try:
+            st = os.stat(path)
+            if st.st_size != size:
+                continue
+            if (mtime is not None and st.st_mtime == mtime) or _file_sha256(path) == sha256:
+                done.add(frame)
+        except OSError:
+            continue
+    return done
+
+
+_FRAME_FILE_RE = re.compile(r"frame_(\d+)\.[A-Za-z0-9]+")
+
+
+def _adopt_unjournaled_frames(journal: JobJournal, row: sqlite3.Row, frames: set[int], done: set[int]) -> set[int]:
+    """Frames in the job's output that never reached the journal, e.g. after a crash right after the write.
+
+    Frame files only ever appear by atomic rename, so any present is complete;
+    files older than the job belong to an earlier render and are ignored.
+    Adopted frames are hashed once and journaled.
+    """
+    adopted: set[int] = set()
+    try:
+        names = os.listdir(row["output_dir"])
+    except OSError:
+        return adopted
+    for name in names:
+        match = _FRAME_FILE_RE.fullmatch(name)
+        if not match:
+            continue
+        frame = int(match.group(1))
+        if frame not in frames or frame in done or frame in adopted:
+            continue
+        path = os.path.join(row["output_dir"], name)
+        try:
+            if os.path.getmtime(path) < row["submitted"]:
+                continue
+            journal.record_frame(row["job_id"], frame, path, _file_sha256(path))
+        except OSError:
+            continue
+        adopted.add(frame)
+    if adopted:
+        _safe_log(f"Found {len(adopted)} rendered frames of {row['name']} missing from the journal")
+    return adopted
+
+
+def resume_jobs() -> list[Job]:
+    """Requeue journaled jobs that never finished, skipping frames already on disk.
+
+    Checks frames and may copy blends to shared storage, so call it off the UI thread.
+    """
+    if _journal is None:
+        return []
+    resumed: list[Job] = []
+    for row in _journal.unfinished_jobs():
+        if MASTER_STATE.job_for(row["job_id"]):
+            continue
+        blend_path = row["blend_path"]
+        if not blend_path or not os.path.exists(blend_path):
+            _safe_log(f"Cannot resume {row['name']}: its packed blend is gone")
+            _journal.set_status(row["job_id"], "failed")
+            continue
+        frames = [int(f) for f in json.loads(row["frames"])]
+        stitch = json.loads(row["stitch"]) if row["stitch"] else None
+        stitcher = None
+        if stitch:
+            try:
+                stitcher = TileStitcher(
+                    stitch["res_x"], stitch["res_y"], stitch["tiles"], stitch["out_path"], stitch.get("bit_depth", 8)
+                )
+            except RuntimeError as exc:
+                _safe_log(f"Cannot resume {row['name']}: {exc}")
+                continue
+        # Tiles only ever live in the stitcher's memory, so a tiled still starts over
+        done: set[int] = set()
+        if not stitcher:
+            done = _verified_frames(_journal, row["job_id"]) & set(frames)
+            done |= _adopt_unjournaled_frames(_journal, row, set(frames), done)
+        settings = json.loads(row["settings"] or "{}")
+        job = Job(
+            MASTER_STATE,
+            row["job_id"],
+            row["name"],
+            row["priority"],
+            row["job_type"],
+            [f for f in frames if f not in done],
+            row["frame_step"],
+            row["output_dir"],
+            row["render_format"],
+            stitcher,
+            settings.get("frame_order", FRAME_ORDER_LINEAR),
+        )
+        job.submitted = row["submitted"]
+        job.total_frames = len(frames)
+        job.frames_completed = done
+        job.temp_blend_path = blend_path
+        job.blend_hash = row["blend_hash"]
+        job.init_header = json.loads(row["init_header"])
+        for key, value in settings.items():
+            setattr(job, key, value)
+        _stage_shared_blend(job)
+        _attach_preview(job, frames, done)
+        _attach_encoder(job, frames, [(f, p) for f, p, _, _, _ in _journal.completed_frames(job.job_id) if f in done])
+        MASTER_STATE.submit(job)
+        _safe_log(f"Resumed {job.name}: {len(done)}/{job.total_frames} frames already rendered")
+        resumed.append(job)
+    if resumed:
+        # Retires jobs that were complete after all and hands the rest to slaves
+        _on_loop(_retire_finished_jobs)
+    return resumed
+
+
+def cancel_job(job_id: str = "") -> None:
+    """Cancel one queued job, or all of them when no id is given."""
+    _on_loop(_cancel_on_loop, job_id)
+
+
+def _cancel_on_loop(job_id: str) -> None:
+    job_ids = [job_id] if job_id else list(MASTER_STATE.jobs)
+    for jid in job_ids:
+        job = MASTER_STATE.cancel_job(jid)
+        if job is not None:
+            _safe_log(f"Cancelled job {job.name}")
+            if job.encoder is not None:
+                job.encoder.abort()
+            if _journal is not None:
+                _journal.set_status(job.job_id, job.status)
+            _release_job(job)
+    _fill_all()
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m {secs:02d}s"
+
+
+_master_loop: Optional[MasterLoop] = None
+_journal: Optional[JobJournal] = None
+_journal_root: Optional[str] = None
+
+
+def start(journal_root: Optional[str] = None) -> None:
+    """Open the journal and start the event loop serving slaves. Safe to call twice."""
+    global _master_loop, _journal, _journal_root
+    if journal_root:
+        _journal_root = journal_root
+    if _journal is None:
+        try:
+            _journal = JobJournal(os.path.join(journal_dir(), "journal.sqlite"))
+            pending = len(_journal.unfinished_jobs())
+            if pending:
+                _safe_log(f"{pending} interrupted job(s) in the journal; use Resume to continue them")
+        except Exception as exc:
+            _safe_log(f"Job journal unavailable: {exc}")
+    if _master_loop is None:
+        _master_loop = MasterLoop()
+        _master_loop.start()
+
+
+def stop(wait: float = 0.0) -> None:
+    """Stop the event loop and local workers and close the journal."""
+    global _master_loop, _journal
+    if _master_loop is not None:
+        _master_loop.stop()
+        if wait:
+            _master_loop.join(wait)
+        _master_loop = None
+    if MASTER_STATE.local_pool:
+        MASTER_STATE.local_pool.stop()
+    with MASTER_STATE.lock:
+        encoders = [job.encoder for job in MASTER_STATE.jobs.values() if job.encoder is not None]
+    for encoder in encoders:
+        # Unfinished jobs re-encode from their frames on resume
+        encoder.abort()
+    if _journal is not None:
+        _journal.close()
+        _journal = None
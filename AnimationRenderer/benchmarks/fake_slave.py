@@ -0,0 +1,459 @@
+"""Simulated render slaves that speak the master's wire protocol without Blender.
+
+Each FakeSlave does the same handshake as slave.py: hello/hello_ack, then
+job_init answered with need_blend or have_blend, then ready. It renders by
+sleeping for a drawn render time and uploads a payload of a drawn size.
+Profiles can make a slave slow, flaky (reports frame_failed) or prone to
+dropping its connection mid-render and reconnecting later. Slaves given
+shared roots take the blend by path and write frames to the job's output
+directory, answering with frame_done instead of uploading. With peers
+enabled a slave keeps received blends on disk, serves them to other fake
+slaves and follows the master's blend_peer redirects like slave.py does.
+
+Run a crowd of them against a running master:
+
+    python AnimationRenderer/benchmarks/fake_slave.py --host 192.168.1.10 --count 50 --render-mean 5
+"""
+
+import argparse
+import hashlib
+import math
+import os
+import queue
+import random
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ar_master import MessageProtocol  # noqa: E402
+
+HEARTBEAT_INTERVAL = 10.0
+PROGRESS_INTERVAL = 1.0
+# Shared random payload; uploads send a prefix of it
+_PAYLOAD = os.urandom(8 * 1024 * 1024)
+
+
+class SlaveProfile:
+    """Render time and payload size distributions plus fault behaviour for one fake slave."""
+
+    def __init__(
+        self,
+        render_mean: float = 1.0,
+        render_sigma: float = 0.25,
+        payload_kb: float = 256.0,
+        payload_sigma: float = 0.2,
+        slowdown: float = 1.0,
+        fail_rate: float = 0.0,
+        disconnect_mean: float = 0.0,
+        reconnect_delay: float = 2.0,
+        cores: int = 8,
+    ) -> None:
+        self.render_mean = render_mean
+        self.render_sigma = render_sigma
+        self.payload_kb = payload_kb
+        self.payload_sigma = payload_sigma
+        # Render time multiplier; 4.0 is a machine four times slower
+        self.slowdown = slowdown
+        # Chance each frame is reported as failed instead of rendered
+        self.fail_rate = fail_rate
+        # Mean seconds of connection before a drop (0 never drops)
+        self.disconnect_mean = disconnect_mean
+        self.reconnect_delay = reconnect_delay
+        self.cores = cores
+
+    def render_time(self, rng: random.Random) -> float:
+        # Lognormal with the requested mean
+        mu = math.log(max(self.render_mean, 1e-6)) - self.render_sigma ** 2 / 2
+        return rng.lognormvariate(mu, self.render_sigma) * self.slowdown
+
+    def payload_size(self, rng: random.Random) -> int:
+        mu = math.log(max(self.payload_kb, 1e-3) * 1024) - self.payload_sigma ** 2 / 2
+        return min(len(_PAYLOAD), max(1, int(rng.lognormvariate(mu, self.payload_sigma))))
+
+
+class FakeSlave(threading.Thread):
+    """One simulated slave; reconnects after drops until stop() is called."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        name: str,
+        profile: SlaveProfile,
+        seed: Optional[int] = None,
+        protocols: tuple[int, ...] = (1, 2),
+        shared_roots: tuple[str, ...] = (),
+        peers: bool = False,
+    ) -> None:
+        super().__init__(daemon=True, name=f"fake-{name}")
+        self.host = host
+        self.port = port
+        self.slave_name = name
+        self.profile = profile
+        self.protocols = protocols
+        self.shared_roots = shared_roots
+        self.peers = peers
+        self.cache_dir = tempfile.mkdtemp(prefix=f"{name}-")
+        self.peer_sock: Optional[socket.socket] = None
+        if peers:
+            self.peer_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.peer_sock.bind(("127.0.0.1", 0))
+            self.peer_sock.listen(8)
+            self.peer_sock.settimeout(0.5)
+        self.rng = random.Random(seed)
+        self.stop_event = threading.Event()
+        self.send_lock = threading.Lock()
+        self.blend_cache: set[str] = set()
+        self.sock: Optional[socket.socket] = None
+        self.version = 1
+        self.job_id: Optional[str] = None
+        self.shared_output_dir: Optional[str] = None
+        self.render_queue: queue.Queue = queue.Queue()
+        self.withdrawn: set[int] = set()
+        # Stats, read by the benchmark once the run is over
+        self.frames_rendered = 0
+        self.frames_failed = 0
+        self.frames_lost = 0
+        self.connections = 0
+        self.busy_seconds = 0.0
+        self.connected_seconds = 0.0
+        self.messages_sent = 0
+        self.messages_received = 0
+        self.control_bytes_sent = 0
+        self.control_bytes_received = 0
+        self.payload_bytes_sent = 0
+        self.blend_bytes_received = 0
+        self.peer_blend_bytes_received = 0
+        self.shared_bytes_written = 0
+        # perf_counter() when the first frame started rendering
+        self.first_frame_at: Optional[float] = None
+        self.dispatch_waits: list[float] = []
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        sock = self.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def run(self) -> None:
+        if self.peer_sock is not None:
+            threading.Thread(target=self._serve_peers, daemon=True).start()
+        try:
+            self._run()
+        finally:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _run(self) -> None:
+        while not self.stop_event.is_set():
+            try:
+                sock = socket.create_connection((self.host, self.port), timeout=5.0)
+            except OSError:
+                self.stop_event.wait(0.5)
+                continue
+            sock.settimeout(None)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.sock = sock
+            self.connections += 1
+            started = time.perf_counter()
+            try:
+                self._session(sock)
+            except (OSError, RuntimeError):
+                pass
+            finally:
+                self.connected_seconds += time.perf_counter() - started
+                self.sock = None
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+            if not self.stop_event.is_set():
+                self.stop_event.wait(self.profile.reconnect_delay)
+
+    def _send(self, header: dict, binary: Optional[bytes] = None, version: Optional[int] = None) -> None:
+        version = self.version if version is None else version
+        size = len(binary) if binary else 0
+        with self.send_lock:
+            MessageProtocol.send(self.sock, header, binary=binary, version=version)  # type: ignore[arg-type]
+            self.messages_sent += 1
+            self.control_bytes_sent += sum(len(b) for b in MessageProtocol.encode(header, size, version))
+            self.payload_bytes_sent += size
+
+    def _blend_sink(self, header: dict) -> str:
+        if header.get("type") == "job_blend" and self.peers:
+            return os.path.join(self.cache_dir, f"{header.get('blend_hash')}.{uuid.uuid4().hex}.part")
+        return os.devnull
+
+    def _recv(self, sock: socket.socket) -> Optional[dict]:
+        msg = MessageProtocol.recv(sock, self._blend_sink)
+        if msg is None:
+            return None
+        header = msg[0]
+        size = int(header.pop("bin_size", 0))
+        part_path = header.pop("bin_path", None)
+        if part_path and part_path != os.devnull:
+            os.replace(part_path, os.path.join(self.cache_dir, f"{header.get('blend_hash')}.blend"))
+        self.messages_received += 1
+        self.control_bytes_received += sum(len(b) for b in MessageProtocol.encode(header, size, self.version))
+        if header.get("type") == "job_blend":
+            self.blend_bytes_received += size
+        return header
+
+    def _session(self, sock: socket.socket) -> None:
+        self.version = 1
+        self.job_id = None
+        self.shared_output_dir = None
+        self.withdrawn.clear()
+        self.render_queue = queue.Queue()
+        self._send({
+            "type": "hello",
+            "id": self.slave_name,
+            "name": self.slave_name,
+            "protocols": list(self.protocols),
+            "cores": self.profile.cores,
+            "ram": 16 * 2**30,
+            "blender": "fake",
+            "shared_roots": [{"path": root, "read": True, "write": True} for root in self.shared_roots],
+            "peer_port": self.peer_sock.getsockname()[1] if self.peer_sock is not None else 0,
+        })
+        session_stop = threading.Event()
+        drop_at = None
+        if self.profile.disconnect_mean > 0:
+            drop_at = time.perf_counter() + self.rng.expovariate(1.0 / self.profile.disconnect_mean)
+        renderer = threading.Thread(target=self._render_loop, args=(session_stop, drop_at), daemon=True)
+        renderer.start()
+        try:
+            while not self.stop_event.is_set():
+                header = self._recv(sock)
+                if header is None:
+                    break
+                mtype = header.get("type")
+                if mtype == "hello_ack":
+                    self.version = int(header.get("protocol", 1))
+                elif mtype == "job_init":
+                    blend_hash = str(header.get("blend_hash") or "")
+                    shared = header.get("shared") or {}
+                    self.shared_output_dir = shared.get("output_dir")
+                    if shared.get("blend_path") and os.path.isfile(shared["blend_path"]):
+                        self._send({"type": "have_blend", "job_id": header.get("job_id"), "blend_hash": blend_hash, "shared": True})
+                        self._activate(header.get("job_id"))
+                    elif blend_hash in self.blend_cache:
+                        self._send({"type": "have_blend", "job_id": header.get("job_id"), "blend_hash": blend_hash})
+                        self._activate(header.get("job_id"))
+                    else:
+                        self._send({"type": "need_blend", "job_id": header.get("job_id"), "blend_hash": blend_hash})
+                elif mtype == "job_blend":
+                    self.blend_cache.add(str(header.get("blend_hash") or ""))
+                    self._activate(header.get("job_id"))
+                elif mtype == "blend_peer":
+                    threading.Thread(target=self._fetch_from_peer, args=(header,), daemon=True).start()
+                elif mtype == "assign":
+                    job_id = header.get("job_id") or self.job_id
+                    for frame in header.get("frames") or [header.get("frame")]:
+                        self.render_queue.put((job_id, int(frame), time.perf_counter()))
+                elif mtype == "cancel" and header.get("frames"):
+                    if not header.get("job_id") or header.get("job_id") == self.job_id:
+                        self.withdrawn.update(int(f) for f in header["frames"])
+                elif mtype == "cancel":
+                    if not header.get("job_id") or header.get("job_id") == self.job_id:
+                        self.job_id = None
+                        self._drain()
+        finally:
+            session_stop.set()
+            self.frames_lost += self._drain()
+            renderer.join(5.0)
+
+    def _serve_peers(self) -> None:
+        while not self.stop_event.is_set():
+            try:
+                conn, _ = self.peer_sock.accept()  # type: ignore[union-attr]
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            threading.Thread(target=self._serve_peer, args=(conn,), daemon=True).start()
+        self.peer_sock.close()  # type: ignore[union-attr]
+
+    def _serve_peer(self, conn: socket.socket) -> None:
+        with conn:
+            try:
+                msg = MessageProtocol.recv(conn)
+                blend_hash = str(msg[0].get("blend_hash") or "") if msg else ""
+                path = os.path.join(self.cache_dir, f"{blend_hash}.blend")
+                if blend_hash not in self.blend_cache or not os.path.exists(path):
+                    MessageProtocol.send(conn, {"type": "log", "text": "not cached"})
+                    return
+                MessageProtocol.send(conn, {"type": "job_blend", "blend_hash": blend_hash}, file_path=path)
+            except OSError:
+                pass
+
+    def _fetch_from_peer(self, header: dict) -> None:
+        blend_hash = str(header.get("blend_hash") or "")
+        try:
+            with socket.create_connection((str(header.get("host")), int(header.get("port") or 0)), timeout=5.0) as peer:
+                MessageProtocol.send(peer, {"type": "blend_request", "blend_hash": blend_hash})
+                msg = MessageProtocol.recv(peer, self._blend_sink)
+            if not msg or msg[0].get("type") != "job_blend":
+                raise OSError("peer has no blend")
+            os.replace(msg[0]["bin_path"], os.path.join(self.cache_dir, f"{blend_hash}.blend"))
+            self.peer_blend_bytes_received += int(msg[0].get("bin_size", 0))
+        except (OSError, RuntimeError):
+            self._try_send({"type": "need_blend", "job_id": header.get("job_id"), "blend_hash": blend_hash, "peer_failed": True})
+            return
+        self.blend_cache.add(blend_hash)
+        try:
+            self._activate(header.get("job_id"))
+        except (OSError, RuntimeError):
+            pass
+
+    def _activate(self, job_id: Optional[str]) -> None:
+        self.job_id = job_id
+        self.withdrawn.clear()
+        self._send({"type": "ready", "job_id": job_id})
+
+    def _drain(self) -> int:
+        count = 0
+        while True:
+            try:
+                self.render_queue.get_nowait()
+                count += 1
+            except queue.Empty:
+                return count
+
+    def _outstanding(self, job_id: Optional[str], current: Optional[int] = None) -> list[int]:
+        with self.render_queue.mutex:
+            frames = {frame for jid, frame, _ in self.render_queue.queue if jid == job_id}
+        if current is not None:
+            frames.add(current)
+        return sorted(frames)
+
+    def _render_loop(self, session_stop: threading.Event, drop_at: Optional[float]) -> None:
+        idle_since = time.perf_counter()
+        last_heartbeat = time.perf_counter()
+        while not session_stop.is_set():
+            try:
+                job_id, frame, _ = self.render_queue.get(timeout=0.1)
+            except queue.Empty:
+                if time.perf_counter() - last_heartbeat >= HEARTBEAT_INTERVAL:
+                    last_heartbeat = time.perf_counter()
+                    self._try_send({"type": "heartbeat", "job_id": self.job_id, "frames": self._outstanding(self.job_id)})
+                continue
+            if job_id != self.job_id or frame in self.withdrawn:
+                self.withdrawn.discard(frame)
+                continue
+            self.dispatch_waits.append(time.perf_counter() - idle_since)
+            if self.first_frame_at is None:
+                self.first_frame_at = time.perf_counter()
+            render_time = self.profile.render_time(self.rng)
+            t0 = time.perf_counter()
+            deadline = t0 + render_time
+            last_progress = t0
+            # Sleep in slices so heartbeats, withdrawals and drops still happen
+            while not session_stop.is_set():
+                now = time.perf_counter()
+                if drop_at is not None and now >= drop_at:
+                    self.busy_seconds += now - t0
+                    self.frames_lost += 1
+                    self._drop_connection()
+                    return
+                if now >= deadline or frame in self.withdrawn:
+                    break
+                if now - last_heartbeat >= HEARTBEAT_INTERVAL:
+                    last_heartbeat = now
+                    self._try_send({"type": "heartbeat", "job_id": job_id, "frame": frame, "frames": self._outstanding(job_id, frame)})
+                if now - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = now
+                    self._try_send({
+                        "type": "progress",
+                        "job_id": job_id,
+                        "frame": frame,
+                        "percent": round(100.0 * (now - t0) / render_time, 1),
+                        "eta": round(deadline - now, 1),
+                    })
+                session_stop.wait(min(0.05, deadline - now))
+            self.busy_seconds += time.perf_counter() - t0
+            if session_stop.is_set():
+                return
+            if frame in self.withdrawn:
+                self.withdrawn.discard(frame)
+            elif self.rng.random() < self.profile.fail_rate:
+                self.frames_failed += 1
+                self._try_send({"type": "frame_failed", "job_id": job_id, "frame": frame, "error": "simulated failure"})
+            else:
+                payload = _PAYLOAD[:self.profile.payload_size(self.rng)]
+                header = {"type": "frame_result", "job_id": job_id, "frame": frame, "ext": "png", "render_time": render_time}
+                if self.shared_output_dir:
+                    header = {**header, **self._write_shared(frame, payload)}
+                    payload = None
+                if self._try_send(header, payload):
+                    self.frames_rendered += 1
+            if self.render_queue.empty():
+                self._try_send({"type": "ready", "job_id": job_id})
+            idle_since = time.perf_counter()
+
+    def _write_shared(self, frame: int, payload: bytes) -> dict:
+        """Save a frame into the shared output directory; returns the frame_done fields."""
+        name = f".frame_{frame:04d}.{uuid.uuid4().hex}.part"
+        with open(os.path.join(self.shared_output_dir, name), "wb") as f:  # type: ignore[arg-type]
+            f.write(payload)
+        self.shared_bytes_written += len(payload)
+        return {"type": "frame_done", "name": name, "size": len(payload), "sha256": hashlib.sha256(payload).hexdigest()}
+
+    def _drop_connection(self) -> None:
+        """Drop the connection as a flaky network would, without a bye."""
+        sock = self.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _try_send(self, header: dict, binary: Optional[bytes] = None) -> bool:
+        try:
+            self._send(header, binary)
+            return True
+        except (OSError, RuntimeError):
+            return False
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=55334)
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--render-mean", type=float, default=1.0)
+    parser.add_argument("--render-sigma", type=float, default=0.25)
+    parser.add_argument("--payload-kb", type=float, default=256.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--disconnect-mean", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    profile = SlaveProfile(
+        render_mean=args.render_mean,
+        render_sigma=args.render_sigma,
+        payload_kb=args.payload_kb,
+        fail_rate=args.fail_rate,
+        disconnect_mean=args.disconnect_mean,
+    )
+    slaves = [FakeSlave(args.host, args.port, f"fake-{i:03d}", profile, args.seed + i) for i in range(args.count)]
+    for slave in slaves:
+        slave.start()
+    try:
+        while True:
+            time.sleep(5.0)
+            print(f"{sum(s.frames_rendered for s in slaves)} frames rendered, {sum(s.frames_failed for s in slaves)} failed", flush=True)
+    except KeyboardInterrupt:
+        for slave in slaves:
+            slave.stop()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
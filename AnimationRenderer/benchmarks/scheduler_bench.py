@@ -0,0 +1,200 @@
+"""Run the master core against simulated slaves on localhost and score the scheduler.
+
+Starts the ar_master engine in-process, submits one synthetic animation job
+and lets N FakeSlaves render it. A fraction of the crowd can be slow, flaky
+or prone to disconnecting. Reports makespan against the ideal, slave idle
+fraction, duplicated work and protocol overhead, so scheduler changes can
+be measured rather than guessed:
+
+    python AnimationRenderer/benchmarks/scheduler_bench.py --slaves 50 --frames 1000 --render-mean 0.5
+    python AnimationRenderer/benchmarks/scheduler_bench.py --slaves 200 --slow-fraction 0.1 --drop-fraction 0.05 --json
+    python AnimationRenderer/benchmarks/scheduler_bench.py --slaves 50 --shared
+    python AnimationRenderer/benchmarks/scheduler_bench.py --slaves 30 --blend-kb 200000 --peers
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ar_master import core  # noqa: E402
+from fake_slave import FakeSlave, SlaveProfile  # noqa: E402
+
+
+def _profiles(args: argparse.Namespace) -> list[SlaveProfile]:
+    rng = random.Random(args.seed)
+    kinds = ["normal"] * args.slaves
+    picks = list(range(args.slaves))
+    rng.shuffle(picks)
+    n_slow = int(args.slaves * args.slow_fraction)
+    n_flaky = int(args.slaves * args.flaky_fraction)
+    n_drop = int(args.slaves * args.drop_fraction)
+    for i in picks[:n_slow]:
+        kinds[i] = "slow"
+    for i in picks[n_slow:n_slow + n_flaky]:
+        kinds[i] = "flaky"
+    for i in picks[n_slow + n_flaky:n_slow + n_flaky + n_drop]:
+        kinds[i] = "drop"
+    profiles = []
+    for kind in kinds:
+        profiles.append(SlaveProfile(
+            render_mean=args.render_mean,
+            render_sigma=args.render_sigma,
+            payload_kb=args.payload_kb,
+            slowdown=args.slowdown if kind == "slow" else 1.0,
+            fail_rate=args.fail_rate if kind == "flaky" else 0.0,
+            disconnect_mean=args.disconnect_mean if kind == "drop" else 0.0,
+            reconnect_delay=args.reconnect_delay,
+        ))
+    return profiles
+
+
+def _submit(frames: int, out_dir: str, args: argparse.Namespace) -> core.Job:
+    blend_path = os.path.join(out_dir, "bench.blend")
+    with open(blend_path, "wb") as f:
+        f.write(os.urandom(args.blend_kb * 1024))
+    frame_list = list(range(1, frames + 1))
+    job = core.Job(core.MASTER_STATE, uuid.uuid4().hex, "bench", core.JOB_PRIORITY, core.JOB_ANIMATION, frame_list, 1, os.path.join(out_dir, "frames"), "PNG")
+    os.makedirs(job.output_dir, exist_ok=True)
+    job.chunk_target_seconds = args.chunk_seconds
+    job.prefetch_depth = args.prefetch
+    job.max_speculative = args.max_speculative
+    job.temp_blend_path = blend_path
+    return core.submit_job(job, frame_list, {"frame_start": 1, "frame_end": frames})
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run(args: argparse.Namespace) -> dict:
+    core.TCP_CONTROL_PORT = args.port
+    core.TELEMETRY_PORT = args.port + 1
+    core.UDP_DISCOVERY_PORT = args.port + 2
+    # Keep discovery broadcasts off the real network
+    core.DISCOVERY_BROADCAST_ADDR = "127.0.0.1"
+    core.BLEND_FANOUT = args.fanout
+    with tempfile.TemporaryDirectory() as tmp, open(args.log, "w") as log:
+        # The temp dir stands in for the NAS every node mounts
+        core.SHARED_ROOTS = [tmp] if args.shared else []
+        shared_roots = (tmp,) if args.shared else ()
+        with contextlib.redirect_stdout(log):
+            core.start(os.path.join(tmp, "journal"))
+            time.sleep(0.2)
+            slaves = [
+                FakeSlave(
+                    "127.0.0.1", args.port, f"sim-{i:03d}", profile, args.seed + i,
+                    (args.protocol,) if args.protocol else (1, 2), shared_roots, args.peers,
+                )
+                for i, profile in enumerate(_profiles(args))
+            ]
+            t0 = time.perf_counter()
+            job = _submit(args.frames, tmp, args)
+            for slave in slaves:
+                slave.start()
+            deadline = t0 + args.timeout
+            while core.MASTER_STATE.job_active and time.perf_counter() < deadline:
+                time.sleep(0.02)
+            makespan = time.perf_counter() - t0
+            for slave in slaves:
+                slave.stop()
+            for slave in slaves:
+                slave.join(5.0)
+            core.stop(wait=10.0)
+
+    rendered = sum(s.frames_rendered for s in slaves)
+    busy = sum(s.busy_seconds for s in slaves)
+    waits = [w for s in slaves for w in s.dispatch_waits]
+    starts = [s.first_frame_at - t0 for s in slaves if s.first_frame_at is not None]
+    messages = sum(s.messages_sent + s.messages_received for s in slaves)
+    control = sum(s.control_bytes_sent + s.control_bytes_received for s in slaves)
+    payload = sum(s.payload_bytes_sent + s.blend_bytes_received for s in slaves)
+    # Best case: every slave busy all the time on exactly the job's frames
+    speeds = [1.0 / p.slowdown for p in _profiles(args)]
+    ideal = args.frames * args.render_mean / sum(speeds)
+    return {
+        "slaves": args.slaves,
+        "frames": args.frames,
+        "completed": job.frames_done,
+        "failed": len(job.frames_failed),
+        "status": job.status,
+        "makespan_s": makespan,
+        "ideal_makespan_s": ideal,
+        "efficiency": ideal / makespan if makespan else 0.0,
+        "idle_fraction": max(0.0, 1.0 - busy / (args.slaves * makespan)) if makespan else 0.0,
+        "duplicate_frames": max(0, rendered - job.frames_done),
+        "lost_frames": sum(s.frames_lost for s in slaves),
+        "reported_failures": sum(s.frames_failed for s in slaves),
+        "reconnects": sum(max(0, s.connections - 1) for s in slaves),
+        "messages": messages,
+        "messages_per_frame": messages / max(1, job.frames_done),
+        "control_bytes": control,
+        "control_bytes_per_frame": control / max(1, job.frames_done),
+        "control_to_payload": control / payload if payload else 0.0,
+        "payload_bytes_via_master": payload,
+        "shared_bytes_written": sum(s.shared_bytes_written for s in slaves),
+        "blend_bytes_from_master": sum(s.blend_bytes_received for s in slaves),
+        "blend_bytes_from_peers": sum(s.peer_blend_bytes_received for s in slaves),
+        "first_frame_s": min(starts) if starts else 0.0,
+        "farm_busy_s": max(starts) if starts else 0.0,
+        "dispatch_wait_mean_s": statistics.fmean(waits) if waits else 0.0,
+        "dispatch_wait_p95_s": _percentile(waits, 0.95),
+    }
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slaves", type=int, default=50)
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--render-mean", type=float, default=0.5, help="mean seconds per frame on a normal slave")
+    parser.add_argument("--render-sigma", type=float, default=0.25, help="lognormal spread of render times")
+    parser.add_argument("--payload-kb", type=float, default=64.0)
+    parser.add_argument("--blend-kb", type=int, default=512)
+    parser.add_argument("--slow-fraction", type=float, default=0.0)
+    parser.add_argument("--slowdown", type=float, default=4.0)
+    parser.add_argument("--flaky-fraction", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.3)
+    parser.add_argument("--drop-fraction", type=float, default=0.0)
+    parser.add_argument("--disconnect-mean", type=float, default=5.0)
+    parser.add_argument("--reconnect-delay", type=float, default=2.0)
+    parser.add_argument("--chunk-seconds", type=float, default=core.CHUNK_TARGET_SECONDS)
+    parser.add_argument("--prefetch", type=int, default=core.PREFETCH_DEPTH)
+    parser.add_argument("--max-speculative", type=int, default=core.MAX_SPECULATIVE_COPIES)
+    parser.add_argument("--shared", action="store_true", help="serve the job from shared storage instead of over TCP")
+    parser.add_argument("--peers", action="store_true", help="let slaves pass the blend on to each other")
+    parser.add_argument("--fanout", type=int, default=core.BLEND_FANOUT, help="concurrent blend transfers per source")
+    parser.add_argument("--protocol", type=int, choices=(0, 1, 2), default=0, help="force a wire protocol version (0 negotiates)")
+    parser.add_argument("--port", type=int, default=57334)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--log", default=os.devnull, help="file for the master's log output")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['completed']}/{result['frames']} frames on {result['slaves']} slaves ({result['status']}, {result['failed']} given up)")
+    print(f"makespan      {result['makespan_s']:8.2f}s  (ideal {result['ideal_makespan_s']:0.2f}s, efficiency {result['efficiency']:0.1%})")
+    print(f"idle fraction {result['idle_fraction']:8.1%}")
+    print(f"duplicates    {result['duplicate_frames']:8d}   lost {result['lost_frames']}, failures {result['reported_failures']}, reconnects {result['reconnects']}")
+    print(f"dispatch wait {result['dispatch_wait_mean_s'] * 1000:8.1f}ms mean, {result['dispatch_wait_p95_s'] * 1000:0.1f}ms p95")
+    print(f"protocol      {result['messages_per_frame']:8.2f} msgs/frame, {result['control_bytes_per_frame']:0.0f} control B/frame, {result['control_to_payload']:0.3%} of payload")
+    print(f"blend         {result['blend_bytes_from_master'] / 2**20:8.1f} MB from master, {result['blend_bytes_from_peers'] / 2**20:0.1f} MB from peers; "
+          f"first frame after {result['first_frame_s']:0.2f}s, all slaves busy after {result['farm_busy_s']:0.2f}s")
+    print(f"master NIC    {result['payload_bytes_via_master'] / 2**20:8.1f} MB payload, {result['shared_bytes_written'] / 2**20:0.1f} MB written to shared storage")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,105 @@
+"""Measure MessageProtocol payload throughput and peak memory.
+
+Compares the original in-memory transfer (read the whole file, ``data +=
+chunk`` reassembly) with the streaming mode (``sendfile`` on the sender,
+``recv_into`` straight to disk on the receiver) over a localhost TCP link.
+
+The protocol lives in the bpy-free ar_master package, so plain Python works:
+
+    python AnimationRenderer/benchmarks/transfer_bench.py --size-mb 512
+"""
+
+import argparse
+import os
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ar_master import MessageProtocol  # noqa: E402
+
+
+def _legacy_send(sock: socket.socket, path: str) -> None:
+    with open(path, "rb") as f:
+        data = f.read()
+    header = b'{"type": "bench", "bin_size": %d}' % len(data)
+    sock.sendall(struct.pack("!I", len(header)))
+    sock.sendall(header)
+    sock.sendall(data)
+
+
+def _legacy_recv(sock: socket.socket, out_path: str) -> None:
+    def recvn(n: int) -> bytes:
+        data = b""
+        while len(data) < n:
+            chunk = sock.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("peer closed")
+            data += chunk
+        return data
+
+    (header_len,) = struct.unpack("!I", recvn(4))
+    header = recvn(header_len)
+    size = int(header.split(b":")[-1].strip(b" }"))
+    with open(out_path, "wb") as f:
+        f.write(recvn(size))
+
+
+def _connected_pair() -> tuple[socket.socket, socket.socket]:
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(1)
+    client = socket.create_connection(srv.getsockname())
+    server, _ = srv.accept()
+    srv.close()
+    return client, server
+
+
+def _run(name: str, send, recv, src_path: str, out_path: str) -> None:
+    tx, rx = _connected_pair()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    sender = threading.Thread(target=send, args=(tx, src_path))
+    t0 = time.perf_counter()
+    sender.start()
+    recv(rx, out_path)
+    sender.join()
+    dt = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    tx.close()
+    rx.close()
+    size_mb = os.path.getsize(src_path) / (1024 * 1024)
+    print(f"{name:10s} {size_mb / dt:9.1f} MB/s  {dt:7.2f}s  peak python heap {peak / (1024 * 1024):8.1f} MB")
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=256)
+    args = parser.parse_args(argv)
+
+    proto = MessageProtocol
+
+    def stream_send(sock: socket.socket, path: str) -> None:
+        proto.send(sock, {"type": "bench"}, file_path=path)
+
+    def stream_recv(sock: socket.socket, out_path: str) -> None:
+        proto.recv(sock, lambda header: out_path)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src_path = os.path.join(tmp, "payload.bin")
+        with open(src_path, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+        out_path = os.path.join(tmp, "received.bin")
+        _run("legacy", _legacy_send, _legacy_recv, src_path, out_path)
+        _run("streaming", stream_send, stream_recv, src_path, out_path)
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    main(argv)
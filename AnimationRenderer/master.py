@@ -8,336 +8,55 @@ bl_info = {
 }
 
 import bpy
-import bpy.types as _btypes
 from bpy.props import (
     BoolProperty,
+    EnumProperty,
     FloatProperty,
     IntProperty,
     StringProperty,
 )
 
-import socket
-import struct
-import json
-import threading
-import queue
-import time
 import os
+import sys
 import tempfile
-import subprocess
-import uuid
+import threading
 import traceback
-from typing import Optional, Tuple
-
+import uuid
 
-# Networking configuration
-UDP_DISCOVERY_PORT = 55333
-TCP_CONTROL_PORT = 55334
-DISCOVERY_BROADCAST_ADDR = "255.255.255.255"
-DISCOVERY_MAGIC = "AR_DISCOVERY_V1"
+# Scheduling, networking and job state live in the bpy-free ar_master
+# package installed next to this file; this add-on is its Blender front end.
+_ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
+if _ADDON_DIR not in sys.path:
+    sys.path.append(_ADDON_DIR)
+
+from ar_master import core
+from ar_master.core import (
+    CHUNK_TARGET_SECONDS,
+    FARM_METRICS,
+    FRAME_ORDER_INTERLEAVED,
+    FRAME_ORDER_LINEAR,
+    JOB_ANIMATION,
+    JOB_PRIORITY,
+    JOB_TILED_STILL,
+    JOURNAL_DIR_NAME,
+    LOCAL_WORKERS,
+    MASTER_STATE,
+    MAX_SPECULATIVE_COPIES,
+    PREFETCH_DEPTH,
+    TELEMETRY_HOST,
+    TELEMETRY_PORT,
+    TILED_FLOAT_FORMATS,
+    Job,
+    TileStitcher,
+    format_duration,
+    split_tiles,
+)
 
 
 def _safe_log(message: str) -> None:
     print(f"[AR-MASTER] {message}")
 
 
-class MessageProtocol:
-    @staticmethod
-    def send(sock: socket.socket, header: dict, binary: Optional[bytes] = None) -> None:
-        try:
-            payload_size = len(binary) if binary else 0
-            header = dict(header)
-            header["bin_size"] = payload_size
-            header_bytes = json.dumps(header).encode("utf-8")
-            try:
-                peer = "unknown"
-                try:
-                    host, port = sock.getpeername()
-                    peer = f"{host}:{port}"
-                except Exception:
-                    pass
-                _safe_log(f"TX to {peer}: {header.get('type')} bin={payload_size}")
-            except Exception:
-                pass
-            sock.sendall(struct.pack("!I", len(header_bytes)))
-            sock.sendall(header_bytes)
-            if payload_size:
-                sock.sendall(binary)  # type: ignore[arg-type]
-        except Exception as exc:
-            raise RuntimeError(f"Failed to send message: {exc}") from exc
-
-    @staticmethod
-    def recv(sock: socket.socket) -> Optional[Tuple[dict, Optional[bytes]]]:
-        def recvn(n: int) -> bytes | None:
-            data = b""
-            while len(data) < n:
-                chunk = sock.recv(n - len(data))
-                if not chunk:
-                    return None
-                data += chunk
-            return data
-
-        size_bytes = recvn(4)
-        if not size_bytes:
-            return None
-        (header_len,) = struct.unpack("!I", size_bytes)
-        header_bytes = recvn(header_len)
-        if not header_bytes:
-            return None
-        header = json.loads(header_bytes.decode("utf-8"))
-        bin_size = int(header.get("bin_size", 0))
-        try:
-            peer = "unknown"
-            try:
-                host, port = sock.getpeername()
-                peer = f"{host}:{port}"
-            except Exception:
-                pass
-            _safe_log(f"RX from {peer}: {header.get('type')} bin={bin_size}")
-        except Exception:
-            pass
-        binary = None
-        if bin_size:
-            binary = recvn(bin_size)
-            if binary is None:
-                return None
-        return header, binary
-
-
-class SlaveInfo:
-    def __init__(self, slave_id: str, name: str, address: tuple[str, int]):
-        self.slave_id = slave_id
-        self.name = name
-        self.address = address
-        self.connected = False
-        self.last_seen = time.time()
-
-
-class MasterState:
-    def __init__(self) -> None:
-        self.lock = threading.RLock()
-        self.slaves: dict[str, SlaveInfo] = {}
-        self.connections: dict[str, "SlaveConnection"] = {}
-        self.job_active = False
-        self.job_cancel_event = threading.Event()
-        self.job_id: Optional[str] = None
-        self.total_frames = 0
-        self.frames_done = 0
-        self.frames_in_progress: dict[str, int] = {}
-        self.frame_queue: queue.Queue[int] = queue.Queue()
-        self.output_dir: Optional[str] = None
-        self.temp_blend_path: Optional[str] = None
-        self.local_worker_thread: Optional[threading.Thread] = None
-        self.local_worker_active = False
-
-    def reset_job(self) -> None:
-        with self.lock:
-            self.job_active = False
-            self.job_cancel_event.clear()
-            self.job_id = None
-            self.total_frames = 0
-            self.frames_done = 0
-            self.frames_in_progress.clear()
-            while not self.frame_queue.empty():
-                try:
-                    self.frame_queue.get_nowait()
-                except queue.Empty:
-                    break
-            self.output_dir = None
-            self.local_worker_active = False
-            self.local_worker_thread = None
-            tmp = self.temp_blend_path
-            self.temp_blend_path = None
-        if tmp and os.path.exists(tmp):
-            try:
-                os.remove(tmp)
-            except Exception:
-                pass
-
-
-MASTER_STATE = MasterState()
-
-
-class DiscoveryBroadcaster(threading.Thread):
-    def __init__(self) -> None:
-        super().__init__(daemon=True)
-        self.stop_event = threading.Event()
-
-    def run(self) -> None:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        sock.settimeout(1.0)
-        hostname = socket.gethostname()
-        while not self.stop_event.is_set():
-            try:
-                payload = json.dumps({
-                    "magic": DISCOVERY_MAGIC,
-                    "role": "master",
-                    "name": hostname,
-                    "port": TCP_CONTROL_PORT,
-                }).encode("utf-8")
-                sock.sendto(payload, (DISCOVERY_BROADCAST_ADDR, UDP_DISCOVERY_PORT))
-            except Exception:
-                pass
-            self.stop_event.wait(2.0)
-
-
-class DiscoveryListener(threading.Thread):
-    def __init__(self) -> None:
-        super().__init__(daemon=True)
-        self.stop_event = threading.Event()
-
-    def run(self) -> None:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        try:
-            sock.bind(("", UDP_DISCOVERY_PORT))
-        except Exception as exc:
-            _safe_log(f"Failed to bind discovery port: {exc}")
-            return
-        sock.settimeout(1.0)
-        while not self.stop_event.is_set():
-            try:
-                data, addr = sock.recvfrom(65535)
-            except socket.timeout:
-                continue
-            except Exception:
-                break
-            try:
-                msg = json.loads(data.decode("utf-8"))
-                if msg.get("magic") != DISCOVERY_MAGIC:
-                    continue
-                if msg.get("role") != "slave":
-                    continue
-                slave_name = str(msg.get("name", "unknown"))
-                slave_id = str(msg.get("id", slave_name))
-                with MASTER_STATE.lock:
-                    info = MASTER_STATE.slaves.get(slave_id)
-                    if not info:
-                        info = SlaveInfo(slave_id, slave_name, (addr[0], 0))
-                        MASTER_STATE.slaves[slave_id] = info
-                    info.last_seen = time.time()
-            except Exception:
-                continue
-
-
-class SlaveConnection(threading.Thread):
-    def __init__(self, conn: socket.socket, address: tuple[str, int]) -> None:
-        super().__init__(daemon=True)
-        self.conn = conn
-        self.address = address
-        self.stop_event = threading.Event()
-        self.slave_id: Optional[str] = None
-        self.slave_name: Optional[str] = None
-
-    def identify(self, slave_id: str, slave_name: str) -> None:
-        self.slave_id = slave_id
-        self.slave_name = slave_name
-        with MASTER_STATE.lock:
-            info = MASTER_STATE.slaves.get(slave_id)
-            if not info:
-                info = SlaveInfo(slave_id, slave_name, self.address)
-                MASTER_STATE.slaves[slave_id] = info
-            info.connected = True
-            info.name = slave_name
-            info.address = self.address
-            info.last_seen = time.time()
-            MASTER_STATE.connections[slave_id] = self
-
-    def run(self) -> None:
-        try:
-            _safe_log(f"Accepted connection from {self.address}")
-            while not self.stop_event.is_set():
-                msg = MessageProtocol.recv(self.conn)
-                if msg is None:
-                    break
-                header, binary = msg
-                mtype = header.get("type")
-                if mtype == "hello":
-                    sid = str(header.get("id", "")) or str(uuid.uuid4())
-                    sname = str(header.get("name", sid))
-                    self.identify(sid, sname)
-                    MessageProtocol.send(self.conn, {"type": "hello_ack"})
-                    _safe_log(f"Handshake complete with {sname} ({sid}) @ {self.address}")
-                    if MASTER_STATE.job_active and MASTER_STATE.temp_blend_path:
-                        try:
-                            with open(MASTER_STATE.temp_blend_path, "rb") as f:
-                                blend_bytes = f.read()
-                            header = _build_job_init_header(blend_bytes)
-                            MessageProtocol.send(self.conn, header, blend_bytes)
-                            self._assign_next_frame()
-                        except Exception as exc:
-                            _safe_log(f"Failed to init new slave: {exc}")
-                elif mtype == "ready":
-                    _safe_log(f"Slave {self.slave_name or self.address} ready; assigning next frame")
-                    self._assign_next_frame()
-                elif mtype == "frame_result":
-                    frame = int(header.get("frame"))
-                    ext = str(header.get("ext", "png"))
-                    size = int(header.get("bin_size", 0))
-                    _safe_log(f"Received frame {frame} ({size} bytes, .{ext}) from {self.slave_name or self.address}")
-                    if binary and size == len(binary):
-                        self._store_frame(frame, ext, binary)
-                        with MASTER_STATE.lock:
-                            MASTER_STATE.frames_done += 1
-                            if self.slave_id in MASTER_STATE.frames_in_progress:
-                                del MASTER_STATE.frames_in_progress[self.slave_id]  # type: ignore[index]
-                        self._assign_next_frame()
-                elif mtype == "log":
-                    text = str(header.get("text", ""))
-                    _safe_log(f"Slave {self.slave_name or self.address} log: {text}")
-                elif mtype == "bye":
-                    _safe_log(f"Slave {self.slave_name or self.address} disconnected")
-                    break
-        except Exception as exc:
-            _safe_log(f"Slave connection error: {exc}")
-        finally:
-            try:
-                self.conn.close()
-            except Exception:
-                pass
-            with MASTER_STATE.lock:
-                if self.slave_id and self.slave_id in MASTER_STATE.connections:
-                    del MASTER_STATE.connections[self.slave_id]
-                if self.slave_id and self.slave_id in MASTER_STATE.slaves:
-                    MASTER_STATE.slaves[self.slave_id].connected = False
-
-    def _assign_next_frame(self) -> None:
-        if MASTER_STATE.job_cancel_event.is_set():
-            try:
-                MessageProtocol.send(self.conn, {"type": "cancel"})
-            except Exception:
-                pass
-            return
-        try:
-            frame = MASTER_STATE.frame_queue.get_nowait()
-        except queue.Empty:
-            return
-        with MASTER_STATE.lock:
-            if self.slave_id:
-                MASTER_STATE.frames_in_progress[self.slave_id] = frame
-        try:
-            _safe_log(f"Assigning frame {frame} to {self.slave_name or self.address}")
-            MessageProtocol.send(self.conn, {"type": "assign", "frame": frame})
-        except Exception as exc:
-            _safe_log(f"Failed to assign frame {frame}: {exc}")
-            with MASTER_STATE.lock:
-                if self.slave_id and self.slave_id in MASTER_STATE.frames_in_progress:
-                    del MASTER_STATE.frames_in_progress[self.slave_id]
-            MASTER_STATE.frame_queue.put(frame)
-
-    def _store_frame(self, frame: int, ext: str, data: bytes) -> None:
-        out_dir = MASTER_STATE.output_dir or _ensure_output_dir()
-        MASTER_STATE.output_dir = out_dir
-        fname = f"frame_{frame:04d}.{ext}"
-        fpath = os.path.join(out_dir, fname)
-        try:
-            with open(fpath, "wb") as f:
-                f.write(data)
-        except Exception as exc:
-            _safe_log(f"Failed to write frame {frame}: {exc}")
-
-
 def _ensure_output_dir() -> str:
     base = bpy.path.abspath(bpy.context.scene.render.filepath)
     if not base:
@@ -352,189 +71,302 @@ def _ensure_output_dir() -> str:
     return base
 
 
-class ControlServer(threading.Thread):
-    def __init__(self) -> None:
-        super().__init__(daemon=True)
-        self.stop_event = threading.Event()
-
-    def run(self) -> None:
-        srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        try:
-            srv.bind(("", TCP_CONTROL_PORT))
-            srv.listen(50)
-        except Exception as exc:
-            _safe_log(f"Failed to bind control port: {exc}")
-            return
-        srv.settimeout(1.0)
-        while not self.stop_event.is_set():
-            try:
-                conn, addr = srv.accept()
-            except socket.timeout:
+# Work still being prepared in the background: job id -> (name, "packing" or "resuming")
+_preparing: dict[str, tuple[str, str]] = {}
+_preparing_lock = threading.Lock()
+# Key in _preparing while journaled jobs are checked and requeued
+_RESUME_KEY = "resume"
+
+
+def _external_files() -> list[str]:
+    """Files the scene reads from disk, so edits to them change the fingerprint."""
+    paths = set()
+    collections = (
+        bpy.data.images,
+        bpy.data.sounds,
+        bpy.data.movieclips,
+        bpy.data.fonts,
+        bpy.data.volumes,
+        bpy.data.cache_files,
+        bpy.data.libraries,
+    )
+    for collection in collections:
+        for item in collection:
+            filepath = getattr(item, "filepath", "")
+            if not filepath or getattr(item, "packed_file", None) is not None:
+                continue
+            if getattr(item, "source", "") in {"GENERATED", "VIEWER"}:
                 continue
-            except Exception:
-                break
-            handler = SlaveConnection(conn, addr)
-            handler.start()
+            paths.add(os.path.normpath(bpy.path.abspath(filepath, library=item.library)))
+    return sorted(paths)
 
 
-def _pack_and_copy_blend() -> str:
-    scene = bpy.context.scene
-    try:
-        bpy.ops.file.pack_all()
-    except Exception:
-        pass
-    tmp_dir = tempfile.gettempdir()
-    fname = f"ar_job_{uuid.uuid4().hex}.blend"
-    tmp_path = os.path.join(tmp_dir, fname)
-    bpy.ops.wm.save_as_mainfile(filepath=tmp_path, copy=True)
-    return tmp_path
+def _blend_source() -> tuple[str, bool]:
+    """Path of the scene as saved, and whether it is a temporary copy to delete afterwards."""
+    if bpy.data.filepath and not bpy.data.is_dirty:
+        return bpy.data.filepath, False
+    # Unsaved edits: snapshot them without touching the user's file
+    blend_dir = os.path.join(core.journal_dir(), "blends")
+    os.makedirs(blend_dir, exist_ok=True)
+    path = os.path.join(blend_dir, f"ar_src_{uuid.uuid4().hex}.blend")
+    bpy.ops.wm.save_as_mainfile(filepath=path, copy=True)
+    return path, True
 
 
-def _build_job_init_header(blend_bytes: bytes) -> dict:
-    scene = bpy.context.scene
+def _scene_settings(scene) -> dict:
+    """Frame range and render settings the engine puts in job_init."""
     render = scene.render
-    ext = scene.render.image_settings.file_format.lower()
-    if ext == "jpeg":
-        ext = "jpg"
-    header = {
-        "type": "job_init",
-        "job_id": MASTER_STATE.job_id,
+    return {
         "frame_start": int(scene.frame_start),
         "frame_end": int(scene.frame_end),
         "frame_step": max(1, int(scene.frame_step)),
         "res_x": int(render.resolution_x),
         "res_y": int(render.resolution_y),
-        "format": scene.render.image_settings.file_format,
-        "engine": scene.render.engine,
-        "bin_size": len(blend_bytes),
-        "blend_name": os.path.basename(MASTER_STATE.temp_blend_path or "scene.blend"),
+        "engine": render.engine,
+        "still_frame": int(scene.frame_current),
     }
-    return header
 
 
-def _start_local_worker() -> None:
-    if not MASTER_STATE.temp_blend_path:
-        return
+def _apply_shared_roots(props) -> None:
+    core.SHARED_ROOTS = [os.path.abspath(bpy.path.abspath(p.strip())) for p in props.shared_roots.split(";") if p.strip()]
+
 
-    def worker() -> None:
-        MASTER_STATE.local_worker_active = True
+def _submit_job() -> Job:
+    """Queue the open scene as a new job; its blend is packed and submitted in the background."""
+    scene = bpy.context.scene
+    props = scene.ar_master
+    _apply_shared_roots(props)
+    output_dir = _ensure_output_dir()
+    render_format = scene.render.image_settings.file_format
+    stitcher = None
+    if props.job_type == "TILED_STILL":
+        render = scene.render
+        res_x = max(1, int(render.resolution_x * render.resolution_percentage / 100))
+        res_y = max(1, int(render.resolution_y * render.resolution_percentage / 100))
+        if render_format in TILED_FLOAT_FORMATS:
+            # Tiles come back display-referred; a PNG would silently drop the float range
+            raise RuntimeError(f"Tiled stills are stitched into a PNG and cannot keep {render_format} data; use PNG or TIFF")
+        bit_depth = 16 if scene.render.image_settings.color_depth == "16" else 8
+        if render_format != "PNG":
+            _safe_log(f"Tiled stills are stitched into a {bit_depth}-bit PNG, not {render_format}")
+        tiles = split_tiles(res_x, res_y, int(props.tiles_x), int(props.tiles_y))
+        out_path = os.path.join(output_dir, f"still_{scene.frame_current:04d}.png")
+        stitcher = TileStitcher(res_x, res_y, tiles, out_path, bit_depth)
+        job_type = JOB_TILED_STILL
+        frame_step = 1
+        # Tiles are scheduled like frames, identified by their index
+        frames = list(range(len(tiles)))
+        default_name = f"Still {scene.frame_current}"
+    else:
+        job_type = JOB_ANIMATION
+        frame_step = max(1, scene.frame_step)
+        frames = list(range(scene.frame_start, scene.frame_end + 1, frame_step))
+        default_name = f"Frames {scene.frame_start}-{scene.frame_end}"
+    blend_name = os.path.splitext(os.path.basename(bpy.data.filepath))[0] or "untitled"
+    job = Job(
+        MASTER_STATE,
+        uuid.uuid4().hex,
+        props.job_name or f"{blend_name}: {default_name}",
+        int(props.priority),
+        job_type,
+        frames,
+        frame_step,
+        output_dir,
+        render_format,
+        stitcher,
+        FRAME_ORDER_INTERLEAVED if props.frame_order == "INTERLEAVED" else FRAME_ORDER_LINEAR,
+    )
+    job.chunk_target_seconds = float(props.chunk_target_seconds)
+    job.prefetch_depth = int(props.prefetch_depth)
+    job.max_speculative = int(props.max_speculative)
+    if job_type == JOB_ANIMATION and props.encode != "NONE":
+        job.encode_preset = props.encode.lower()
+        job.encode_fps = scene.render.fps / (scene.render.fps_base or 1.0)
+        job.encode_delete_frames = bool(props.encode_delete_frames)
+
+    source, temporary = _blend_source()
+    externals = _external_files()
+    settings = _scene_settings(scene)
+    version = bpy.app.version_string
+    binary = bpy.app.binary_path
+    pool = None
+    if job_type == JOB_ANIMATION:
+        pool = (int(props.local_workers), int(props.local_threads), bool(props.local_affinity))
+
+    def prepare() -> None:
         try:
-            blender_bin = bpy.app.binary_path
-            while not MASTER_STATE.job_cancel_event.is_set():
-                try:
-                    frame = MASTER_STATE.frame_queue.get_nowait()
-                except queue.Empty:
-                    break
-                out_dir = _ensure_output_dir()
-                out_pattern = os.path.join(out_dir, f"frame_#####")
-                cmd = [
-                    blender_bin,
-                    "-b",
-                    MASTER_STATE.temp_blend_path,
-                    "-o",
-                    out_pattern,
-                    "-F",
-                    bpy.context.scene.render.image_settings.file_format,
-                    "-f",
-                    str(frame),
-                ]
-                try:
-                    subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    ext = bpy.context.scene.render.image_settings.file_format.lower()
-                    if ext == "jpeg":
-                        ext = "jpg"
-                    file_name = f"frame_{frame:05d}.{ext}"
-                    src_path = os.path.join(out_dir, file_name)
-                    if not os.path.exists(src_path):
-                        # Some Blender versions use 4-digit padding depending on pattern; try 4
-                        file_name = f"frame_{frame:04d}.{ext}"
-                        src_path = os.path.join(out_dir, file_name)
-                    if os.path.exists(src_path):
-                        with open(src_path, "rb") as f:
-                            data = f.read()
-                        # Already in output dir; nothing else to do
-                        with MASTER_STATE.lock:
-                            MASTER_STATE.frames_done += 1
-                    else:
-                        with MASTER_STATE.lock:
-                            MASTER_STATE.frames_done += 1
-                except Exception as exc:
-                    _safe_log(f"Local render failed for frame {frame}: {exc}")
-                    traceback.print_exc()
+            fingerprint = core.blend_fingerprint(source, externals, version)
+            job.temp_blend_path, job.blend_hash = core.prepare_blend(source, fingerprint, binary)
+            core.submit_job(job, frames, settings)
+            if pool is not None:
+                core.ensure_local_pool(binary, *pool, version)
+        except Exception as exc:
+            _safe_log(f"Failed to prepare {job.name}: {exc}")
+            traceback.print_exc()
         finally:
-            MASTER_STATE.local_worker_active = False
+            with _preparing_lock:
+                _preparing.pop(job.job_id, None)
+            if temporary:
+                try:
+                    os.remove(source)
+                except OSError:
+                    pass
 
-    t = threading.Thread(target=worker, daemon=True)
-    MASTER_STATE.local_worker_thread = t
-    t.start()
+    with _preparing_lock:
+        _preparing[job.job_id] = (job.name, "packing")
+    threading.Thread(target=prepare, daemon=True, name="ar-pack").start()
+    return job
 
 
-def _start_job_distribution() -> None:
-    MASTER_STATE.job_id = uuid.uuid4().hex
-    MASTER_STATE.job_active = True
-    MASTER_STATE.job_cancel_event.clear()
+def _resume_jobs() -> bool:
+    """Requeue journaled jobs in the background; False if a resume is already running.
 
-    MASTER_STATE.temp_blend_path = _pack_and_copy_blend()
-    _safe_log(f"Prepared blend: {MASTER_STATE.temp_blend_path}")
-    blend_bytes = b""
-    with open(MASTER_STATE.temp_blend_path, "rb") as f:
-        blend_bytes = f.read()
+    Resuming re-checks every journaled frame and may copy blends to shared
+    storage, which takes minutes on a slow share.
+    """
+    props = bpy.context.scene.ar_master
+    _apply_shared_roots(props)
+    binary = bpy.app.binary_path
+    version = bpy.app.version_string
+    pool = (int(props.local_workers), int(props.local_threads), bool(props.local_affinity))
 
-    scene = bpy.context.scene
-    frames = list(range(scene.frame_start, scene.frame_end + 1, max(1, scene.frame_step)))
-    for fr in frames:
-        MASTER_STATE.frame_queue.put(int(fr))
-    MASTER_STATE.total_frames = len(frames)
-    MASTER_STATE.frames_done = 0
-    _safe_log(f"Job {MASTER_STATE.job_id} frames: {frames[:3]}... total={MASTER_STATE.total_frames}")
-
-    for conn in list(MASTER_STATE.connections.values()):
+    def resume() -> None:
         try:
-            header = _build_job_init_header(blend_bytes)
-            MessageProtocol.send(conn.conn, header, blend_bytes)
-            _safe_log(f"Sent job init to {conn.address} ({len(blend_bytes)} bytes)")
+            jobs = core.resume_jobs()
+            if not jobs:
+                _safe_log("Nothing to resume")
+            elif any(job.job_type == JOB_ANIMATION for job in jobs):
+                core.ensure_local_pool(binary, *pool, version)
         except Exception as exc:
-            _safe_log(f"Failed to send job to {conn.address}: {exc}")
-
-    for conn in list(MASTER_STATE.connections.values()):
-        try:
-            conn._assign_next_frame()
-        except Exception:
-            pass
+            _safe_log(f"Failed to resume jobs: {exc}")
+            traceback.print_exc()
+        finally:
+            with _preparing_lock:
+                _preparing.pop(_RESUME_KEY, None)
 
-    _start_local_worker()
+    with _preparing_lock:
+        if _RESUME_KEY in _preparing:
+            return False
+        _preparing[_RESUME_KEY] = ("Interrupted jobs", "resuming")
+    threading.Thread(target=resume, daemon=True, name="ar-resume").start()
+    return True
 
 
-def _cancel_job() -> None:
-    MASTER_STATE.job_cancel_event.set()
-    for conn in list(MASTER_STATE.connections.values()):
-        try:
-            MessageProtocol.send(conn.conn, {"type": "cancel"})
-        except Exception:
-            pass
-    MASTER_STATE.reset_job()
+def _journal_dir() -> str:
+    try:
+        path = bpy.utils.user_resource("CONFIG", path=JOURNAL_DIR_NAME, create=True)
+    except Exception:
+        path = ""
+    if not path:
+        path = os.path.join(tempfile.gettempdir(), JOURNAL_DIR_NAME)
+        os.makedirs(path, exist_ok=True)
+    return path
 
 
 class AR_MasterProps(bpy.types.PropertyGroup):
+    job_type: EnumProperty(
+        name="Job Type",
+        items=(
+            ("ANIMATION", "Animation", "Distribute the frame range across slaves"),
+            ("TILED_STILL", "Tiled Still", "Split the current frame into tiles and stitch them on the master"),
+        ),
+        default="ANIMATION",
+    )
+    frame_order: EnumProperty(
+        name="Frame Order",
+        items=(
+            ("LINEAR", "Linear", "Render frames in order; contiguous chunks keep slave caches warm"),
+            ("INTERLEAVED", "Interleaved", "Render every 16th frame first, then fill in; a hold-frame preview of the whole shot goes to the preview folder"),
+        ),
+        default="LINEAR",
+    )
+    encode: EnumProperty(
+        name="Encode",
+        description="Pipe frames to ffmpeg as they arrive so the video is ready with the last frame",
+        items=(
+            ("NONE", "None", "Keep the image sequence only"),
+            ("H264", "H.264 MP4", "H.264 in an MP4 container"),
+            ("PRORES", "ProRes MOV", "ProRes 422 HQ in a MOV container"),
+        ),
+        default="NONE",
+    )
+    encode_delete_frames: BoolProperty(
+        name="Delete Frames After Encoding",
+        description="Remove the rendered image sequence once the video has been written",
+        default=False,
+    )
+    tiles_x: IntProperty(name="Tiles X", default=4, min=1, max=64)
+    tiles_y: IntProperty(name="Tiles Y", default=4, min=1, max=64)
     show_slaves: BoolProperty(name="Show Slaves", default=False)
     progress: FloatProperty(name="Progress", default=0.0, subtype="PERCENTAGE", min=0.0, max=100.0)
     status_text: StringProperty(name="Status", default="Idle")
     connected_count: IntProperty(name="Connected", default=0)
+    chunk_target_seconds: FloatProperty(
+        name="Chunk Target (s)",
+        description="Wall time each slave assignment should take; chunk sizes adapt to measured render speed",
+        default=CHUNK_TARGET_SECONDS,
+        min=1.0,
+    )
+    prefetch_depth: IntProperty(
+        name="Prefetch Depth",
+        description="Chunks each slave holds at once so it can render while uploading",
+        default=PREFETCH_DEPTH,
+        min=1,
+        max=8,
+    )
+    max_speculative: IntProperty(
+        name="Max Duplicates",
+        description="Straggler frames that may be re-rendered on idle slaves at the same time (0 disables)",
+        default=MAX_SPECULATIVE_COPIES,
+        min=0,
+    )
+    local_workers: IntProperty(
+        name="Local Workers",
+        description="Blender processes rendering on this machine alongside the slaves (0 disables)",
+        default=LOCAL_WORKERS,
+        min=0,
+        max=64,
+    )
+    local_threads: IntProperty(
+        name="Threads per Worker",
+        description="Render threads for each local worker (0 splits the cores evenly)",
+        default=0,
+        min=0,
+    )
+    local_affinity: BoolProperty(
+        name="Pin to Cores",
+        description="Give each local worker its own set of CPU cores (Linux only)",
+        default=False,
+    )
+    shared_roots: StringProperty(
+        name="Shared Storage",
+        description="Network storage that slaves mount at the same paths, separated by ';'. Jobs writing there are served by path instead of over TCP",
+        default="",
+    )
+    job_name: StringProperty(
+        name="Job Name",
+        description="Label for the job queue (defaults to the blend name and frame range)",
+        default="",
+    )
+    priority: IntProperty(
+        name="Priority",
+        description="Higher priority jobs take slaves first; equal priorities share the farm",
+        default=JOB_PRIORITY,
+        min=0,
+        max=100,
+    )
 
 
 class AR_OT_MasterStart(bpy.types.Operator):
     bl_idname = "ar.master_start"
-    bl_label = "Start Distributed Render"
+    bl_label = "Submit Distributed Render"
     bl_options = {"REGISTER"}
 
     def execute(self, context):
-        if MASTER_STATE.job_active:
-            self.report({"WARNING"}, "Job already running")
-            return {"CANCELLED"}
         try:
-            _start_job_distribution()
-            context.scene.ar_master.status_text = "Rendering..."
+            job = _submit_job()
+            context.scene.ar_master.status_text = "Packing..."
+            self.report({"INFO"}, f"Packing {job.name} in the background")
             return {"FINISHED"}
         except Exception as exc:
             _safe_log(f"Failed to start render: {exc}")
@@ -543,17 +375,40 @@ class AR_OT_MasterStart(bpy.types.Operator):
             return {"CANCELLED"}
 
 
+class AR_OT_MasterResume(bpy.types.Operator):
+    bl_idname = "ar.master_resume"
+    bl_label = "Resume Interrupted Jobs"
+    bl_options = {"REGISTER"}
+
+    def execute(self, context):
+        try:
+            started = _resume_jobs()
+        except Exception as exc:
+            _safe_log(f"Failed to resume jobs: {exc}")
+            traceback.print_exc()
+            self.report({"ERROR"}, f"Resume failed: {exc}")
+            return {"CANCELLED"}
+        if not started:
+            self.report({"INFO"}, "Already resuming")
+            return {"CANCELLED"}
+        context.scene.ar_master.status_text = "Resuming..."
+        self.report({"INFO"}, "Checking interrupted jobs in the background")
+        return {"FINISHED"}
+
+
 class AR_OT_MasterCancel(bpy.types.Operator):
     bl_idname = "ar.master_cancel"
     bl_label = "Cancel Distributed Render"
     bl_options = {"REGISTER"}
 
+    job_id: StringProperty(default="", options={"HIDDEN"})
+
     def execute(self, context):
         if not MASTER_STATE.job_active:
             self.report({"INFO"}, "No active job")
             return {"CANCELLED"}
         try:
-            _cancel_job()
+            core.cancel_job(self.job_id)
             context.scene.ar_master.status_text = "Cancelled"
             return {"FINISHED"}
         except Exception as exc:
@@ -576,8 +431,12 @@ class AR_PT_MasterPanel(bpy.types.Panel):
         # Read-only snapshot; do not write to ID properties here
         with MASTER_STATE.lock:
             connected_count = len([c for c in MASTER_STATE.slaves.values() if c.connected])
-            total = MASTER_STATE.total_frames
-            done = MASTER_STATE.frames_done
+            done, total = MASTER_STATE.totals()
+            jobs = list(MASTER_STATE.jobs.values())
+            history = list(MASTER_STATE.history)
+            blacklisted = set().union(*(job.blacklist for job in jobs))
+        with _preparing_lock:
+            preparing = sorted(_preparing.values())
         fraction = (float(done) / float(total)) if total > 0 else 0.0
 
         row = layout.row()
@@ -591,21 +450,75 @@ class AR_PT_MasterPanel(bpy.types.Panel):
                 else:
                     for s in MASTER_STATE.slaves.values():
                         status = "Connected" if s.connected else "Seen"
+                        if s.cores:
+                            status += f", {s.cores} cores"
+                        if s.score:
+                            status += f", score {s.score:0.0f}"
+                        metrics = FARM_METRICS.slaves.get(s.slave_id)
+                        if metrics and metrics.render_seconds.count:
+                            per_frame = metrics.render_seconds.total / metrics.render_seconds.count
+                            status += f", {metrics.frames_rendered} frames at {per_frame:0.1f}s"
+                        for job in jobs:
+                            progress = job.progress_for(s.slave_id)
+                            if progress is None:
+                                continue
+                            unit, percent, left = progress
+                            kind = "tile" if job.job_type == JOB_TILED_STILL else "frame"
+                            status += f", {kind} {unit} {percent:0.0f}%"
+                            if left is not None:
+                                status += f" ({format_duration(left)} left)"
+                            break
+                        if s.slave_id in blacklisted:
+                            status += ", blacklisted"
                         box.label(text=f"{s.name} ({status})")
 
         layout.separator()
+        box = layout.box()
+        if not jobs and not history and not preparing:
+            box.label(text="No jobs queued")
+        for name, activity in preparing:
+            box.label(text=f"{name}: {activity}...")
+        for job in jobs:
+            row = box.row()
+            row.label(text=f"[{job.priority}] {job.name}: {job.frames_done}/{job.total_frames} ({job.status}, {len(job.workers)} workers)")
+            op = row.operator(AR_OT_MasterCancel.bl_idname, text="", icon="X")
+            op.job_id = job.job_id
+        for job in reversed(history):
+            box.label(text=f"{job.name}: {job.frames_done}/{job.total_frames} ({job.status})")
+
+        layout.prop(props, "job_name")
+        layout.prop(props, "priority")
+        layout.prop(props, "job_type")
+        if props.job_type == "TILED_STILL":
+            row = layout.row(align=True)
+            row.prop(props, "tiles_x")
+            row.prop(props, "tiles_y")
+        else:
+            layout.prop(props, "frame_order")
+            layout.prop(props, "encode")
+            if props.encode != "NONE":
+                layout.prop(props, "encode_delete_frames")
+        layout.prop(props, "chunk_target_seconds")
+        layout.prop(props, "prefetch_depth")
+        layout.prop(props, "max_speculative")
+        layout.prop(props, "local_workers")
+        if props.local_workers > 0:
+            row = layout.row(align=True)
+            row.prop(props, "local_threads")
+            row.prop(props, "local_affinity")
+        layout.prop(props, "shared_roots")
         row = layout.row()
         row.operator(AR_OT_MasterStart.bl_idname, icon="RENDER_ANIMATION")
         row.operator(AR_OT_MasterCancel.bl_idname, icon="CANCEL")
+        layout.operator(AR_OT_MasterResume.bl_idname, icon="RECOVER_LAST")
         layout.separator()
         layout.label(text=f"Frames: {int(done)}/{int(total)}")
+        eta = FARM_METRICS.eta_seconds() if jobs else None
+        if eta is not None:
+            rate = FARM_METRICS.throughput() or 0.0
+            layout.label(text=f"ETA: {format_duration(eta)} ({rate * 60:0.1f} frames/min)")
         layout.label(text=props.status_text)
-
-
-_threads_started = False
-_discovery_broadcaster: Optional[DiscoveryBroadcaster] = None
-_discovery_listener: Optional[DiscoveryListener] = None
-_control_server: Optional[ControlServer] = None
+        layout.label(text=f"Metrics: http://{TELEMETRY_HOST}:{TELEMETRY_PORT}/metrics")
 
 
 def _ui_timer_update() -> float:
@@ -613,15 +526,17 @@ def _ui_timer_update() -> float:
     if not hasattr(scene, "ar_master"):
         return 1.0
     props = scene.ar_master
-    with MASTER_STATE.lock:
-        total = MASTER_STATE.total_frames
-        done = MASTER_STATE.frames_done
+    done, total = MASTER_STATE.totals()
     fraction = (float(done) / float(total)) if total > 0 else 0.0
     props.progress = 100.0 * fraction
+    with _preparing_lock:
+        activities = {activity for _, activity in _preparing.values()}
     if MASTER_STATE.job_active:
         props.status_text = "Rendering..."
+    elif activities:
+        props.status_text = "Resuming..." if "resuming" in activities else "Packing..."
     else:
-        if props.status_text == "Rendering...":
+        if props.status_text in {"Rendering...", "Packing...", "Resuming..."}:
             props.status_text = "Idle"
     return 0.5
 
@@ -629,43 +544,27 @@ def _ui_timer_update() -> float:
 classes = (
     AR_MasterProps,
     AR_OT_MasterStart,
+    AR_OT_MasterResume,
     AR_OT_MasterCancel,
     AR_PT_MasterPanel,
 )
 
 
 def register():
-    global _threads_started, _discovery_broadcaster, _discovery_listener, _control_server
     for cls in classes:
         bpy.utils.register_class(cls)
     if not hasattr(bpy.types.Scene, "ar_master"):
         bpy.types.Scene.ar_master = bpy.props.PointerProperty(type=AR_MasterProps)
-
-    if not _threads_started:
-        _discovery_broadcaster = DiscoveryBroadcaster()
-        _discovery_listener = DiscoveryListener()
-        _control_server = ControlServer()
-        _discovery_broadcaster.start()
-        _discovery_listener.start()
-        _control_server.start()
-        _threads_started = True
+    core.start(_journal_dir())
     bpy.app.timers.register(_ui_timer_update, persistent=True)
 
 
 def unregister():
-    global _threads_started, _discovery_broadcaster, _discovery_listener, _control_server
     try:
         bpy.app.timers.unregister(_ui_timer_update)
     except Exception:
         pass
-    if _threads_started:
-        if _discovery_broadcaster:
-            _discovery_broadcaster.stop_event.set()
-        if _discovery_listener:
-            _discovery_listener.stop_event.set()
-        if _control_server:
-            _control_server.stop_event.set()
-        _threads_started = False
+    core.stop()
     for cls in reversed(classes):
         try:
             bpy.utils.unregister_class(cls)
@@ -676,5 +575,3 @@ def unregister():
             del bpy.types.Scene.ar_master
         except Exception:
             pass
-
-
@@ -10,6 +10,7 @@ bl_info = {
 import bpy
 from bpy.props import (
     BoolProperty,
+    IntProperty,
     StringProperty,
 )
 
@@ -21,77 +22,280 @@ import os
 import tempfile
 import uuid
 import time
+import hashlib
 import subprocess
+import queue
+import re
 import traceback
-from typing import Optional, Tuple
+from typing import Callable, Optional, Tuple
 
 
 UDP_DISCOVERY_PORT = 55333
 TCP_CONTROL_PORT = 55334
 DISCOVERY_MAGIC = "AR_DISCOVERY_V1"
 
+# Persistent render worker configuration
+WORKER_MARKER = "@@AR_WORKER "
+WORKER_MAX_FRAMES = 50
+WORKER_START_TIMEOUT = 600.0
+
+# Content-addressed blend cache (LRU by mtime)
+BLEND_CACHE_MAX_ENTRIES = 8
+BLEND_CACHE_MAX_BYTES = 8 * 1024 * 1024 * 1024
+RECV_CHUNK_SIZE = 1024 * 1024
+# Other slaves pull cached blends from this one when the master says so;
+# a fetch that stalls this long falls back to the master
+PEER_TIMEOUT = 60.0
+# Keeps the master's frame leases alive during long renders
+HEARTBEAT_INTERVAL = 10.0
+# Render progress parsed from the worker's status lines goes to the master
+# at most this often, and only when it changed
+PROGRESS_INTERVAL = 1.0
+# Size of the hashing run behind the calibration score reported in hello
+CALIBRATION_BYTES = 64 * 1024 * 1024
+
+# Wire protocol. Version 1 frames are a 4-byte length and a JSON header.
+# Version 2 frames start with a fixed struct header (magic, version, type
+# code, meta length, payload length) followed by compact JSON meta fields
+# and go out in one vectored write. The version is negotiated in hello.
+SUPPORTED_PROTOCOLS = (1, 2)
+PROTOCOL_TRACE = False
+_V2_MAGIC = b"AR"
+_V2_HEADER = struct.Struct("!2sBBIQ")
+_MESSAGE_CODES = {
+    "hello": 1,
+    "hello_ack": 2,
+    "job_init": 3,
+    "job_blend": 4,
+    "need_blend": 5,
+    "have_blend": 6,
+    "ready": 7,
+    "assign": 8,
+    "frame_result": 9,
+    "frame_failed": 10,
+    "heartbeat": 11,
+    "cancel": 12,
+    "log": 13,
+    "bye": 14,
+    "frame_done": 15,
+    "blend_peer": 16,
+    "blend_request": 17,
+    "progress": 18,
+    "frame_aborted": 19,
+}
+_MESSAGE_NAMES = {code: name for name, code in _MESSAGE_CODES.items()}
+
+# Executed inside the background Blender worker via --python-expr. The blend is
+# loaded once on startup; frames are rendered on request from JSON lines on
+# stdin and acknowledged on stdout with WORKER_MARKER-prefixed JSON lines.
+_WORKER_SCRIPT = r'''
+import bpy
+import json
+import os
+import sys
+
+import numpy as np
+
+MARKER = "@@MARKER@@"
+
+
+def _reply(**msg):
+    sys.stdout.write(MARKER + json.dumps(msg) + "\n")
+    sys.stdout.flush()
+
+
+def _render(cmd):
+    frame = int(cmd["frame"])
+    scene.render.image_settings.file_format = cmd["format"]
+    scene.render.filepath = cmd["output"]
+    scene.frame_set(frame)
+    bpy.ops.render.render(write_still=True)
+    return scene.render.frame_path(frame=frame)
+
+
+def _render_tile(cmd):
+    # Border render the tile, then hand back its pixels as a bottom-up
+    # float32 RGBA array for the master to stitch. The 16-bit PNG keeps
+    # the view transform and enough precision for a 16-bit still.
+    render = scene.render
+    render.use_border = True
+    render.use_crop_to_border = True
+    render.border_min_x, render.border_min_y, render.border_max_x, render.border_max_y = cmd["border"]
+    render.image_settings.file_format = "PNG"
+    render.image_settings.color_mode = "RGBA"
+    render.image_settings.color_depth = "16"
+    png_path = _render({"frame": cmd["frame"], "format": "PNG", "output": cmd["output"]})
+    image = bpy.data.images.load(png_path)
+    try:
+        width, height = image.size
+        pixels = np.empty(width * height * 4, dtype=np.float32)
+        image.pixels.foreach_get(pixels)
+    finally:
+        bpy.data.images.remove(image)
+    os.remove(png_path)
+    tile = pixels.reshape(height, width, 4)
+    with open(cmd["tile_path"], "wb") as f:
+        np.save(f, tile)
+    return cmd["tile_path"]
+
+
+OPS = {"render": _render, "render_tile": _render_tile}
+
+scene = bpy.context.scene
+_reply(event="loaded")
+for line in sys.stdin:
+    line = line.strip()
+    if not line:
+        continue
+    try:
+        cmd = json.loads(line)
+    except ValueError:
+        continue
+    op = cmd.get("op")
+    if op == "quit":
+        break
+    if op not in OPS:
+        continue
+    try:
+        _reply(event="done", frame=cmd.get("frame"), path=OPS[op](cmd))
+    except Exception as exc:
+        _reply(event="error", frame=cmd.get("frame"), error=str(exc))
+'''.replace("@@MARKER@@", WORKER_MARKER)
+
 
 def _safe_log(message: str) -> None:
     print(f"[AR-SLAVE] {message}")
 
 
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 class MessageProtocol:
     @staticmethod
-    def send(sock: socket.socket, header: dict, binary: Optional[bytes] = None) -> None:
-        payload_size = len(binary) if binary else 0
-        header = dict(header)
-        header["bin_size"] = payload_size
-        header_bytes = json.dumps(header).encode("utf-8")
-        try:
-            peer = "unknown"
-            try:
-                host, port = sock.getpeername()
-                peer = f"{host}:{port}"
-            except Exception:
-                pass
-            _safe_log(f"TX to {peer}: {header.get('type')} bin={payload_size}")
-        except Exception:
-            pass
-        sock.sendall(struct.pack("!I", len(header_bytes)))
-        sock.sendall(header_bytes)
-        if payload_size:
-            sock.sendall(binary)  # type: ignore[arg-type]
+    def _sendmsg_all(sock: socket.socket, buffers: list) -> None:
+        views = [memoryview(b) for b in buffers if len(b)]
+        if not hasattr(sock, "sendmsg"):
+            # No vectored I/O (Windows); fall back to a single joined write
+            sock.sendall(b"".join(views))
+            return
+        while views:
+            sent = sock.sendmsg(views)
+            while sent and views:
+                if sent >= len(views[0]):
+                    sent -= len(views[0])
+                    views.pop(0)
+                else:
+                    views[0] = views[0][sent:]
+                    sent = 0
+
+    @staticmethod
+    def send(
+        sock: socket.socket,
+        header: dict,
+        binary: Optional[bytes] = None,
+        file_path: Optional[str] = None,
+        version: int = 1,
+    ) -> None:
+        """Send one message; ``file_path`` streams the payload from disk via sendfile."""
+        payload_size = os.path.getsize(file_path) if file_path else (len(binary) if binary else 0)
+        if PROTOCOL_TRACE:
+            _safe_log(f"TX {header.get('type')} bin={payload_size} v{version}")
+        if version >= 2:
+            mtype = str(header.get("type", ""))
+            code = _MESSAGE_CODES.get(mtype, 0)
+            fields = {k: v for k, v in header.items() if k not in ("type", "bin_size")}
+            if not code:
+                fields["type"] = mtype
+            meta = json.dumps(fields, separators=(",", ":")).encode("utf-8") if fields else b""
+            buffers = [_V2_HEADER.pack(_V2_MAGIC, 2, code, len(meta), payload_size), meta]
+        else:
+            header = dict(header)
+            header["bin_size"] = payload_size
+            header_bytes = json.dumps(header).encode("utf-8")
+            buffers = [struct.pack("!I", len(header_bytes)), header_bytes]
+        if binary is not None and payload_size and not file_path:
+            buffers.append(binary)
+        MessageProtocol._sendmsg_all(sock, buffers)
+        if file_path and payload_size:
+            with open(file_path, "rb") as f:
+                sock.sendfile(f)
 
     @staticmethod
-    def recv(sock: socket.socket) -> Optional[Tuple[dict, Optional[bytes]]]:
-        def recvn(n: int) -> Optional[bytes]:
-            data = b""
-            while len(data) < n:
-                chunk = sock.recv(n - len(data))
-                if not chunk:
+    def recv(
+        sock: socket.socket,
+        sink: Optional[Callable[[dict], Optional[str]]] = None,
+    ) -> Optional[Tuple[dict, Optional[bytearray]]]:
+        """Receive one message.
+
+        If ``sink`` returns a file path for the decoded header, the payload is
+        streamed to that file instead of being returned, and the path is
+        reported back as ``header["bin_path"]``.
+        """
+        def recvn(n: int) -> Optional[bytearray]:
+            data = bytearray(n)
+            view = memoryview(data)
+            got = 0
+            while got < n:
+                count = sock.recv_into(view[got:], n - got)
+                if not count:
                     return None
-                data += chunk
+                got += count
             return data
 
-        size_bytes = recvn(4)
-        if not size_bytes:
-            return None
-        (header_len,) = struct.unpack("!I", size_bytes)
-        header_bytes = recvn(header_len)
-        if not header_bytes:
+        def recv_to_file(n: int, path: str) -> bool:
+            buf = bytearray(min(n, RECV_CHUNK_SIZE))
+            view = memoryview(buf)
+            remaining = n
+            with open(path, "wb") as f:
+                while remaining:
+                    count = sock.recv_into(view, min(remaining, len(buf)))
+                    if not count:
+                        return False
+                    f.write(view[:count])
+                    remaining -= count
+            return True
+
+        prefix = recvn(4)
+        if not prefix:
             return None
-        header = json.loads(header_bytes.decode("utf-8"))
-        bin_size = int(header.get("bin_size", 0))
-        try:
-            peer = "unknown"
-            try:
-                host, port = sock.getpeername()
-                peer = f"{host}:{port}"
-            except Exception:
-                pass
-            _safe_log(f"RX from {peer}: {header.get('type')} bin={bin_size}")
-        except Exception:
-            pass
+        if prefix[:2] == _V2_MAGIC and prefix[2] == 2:
+            # A version 1 length this large (over 1 GB of JSON) cannot occur
+            rest = recvn(_V2_HEADER.size - 4)
+            if rest is None:
+                return None
+            _, _, code, meta_len, bin_size = _V2_HEADER.unpack(bytes(prefix + rest))
+            meta = recvn(meta_len) if meta_len else None
+            if meta_len and meta is None:
+                return None
+            header = json.loads(meta) if meta else {}
+            if code:
+                header["type"] = _MESSAGE_NAMES.get(code, header.get("type"))
+            header["bin_size"] = bin_size
+        else:
+            (header_len,) = struct.unpack("!I", prefix)
+            header_bytes = recvn(header_len)
+            if not header_bytes:
+                return None
+            header = json.loads(header_bytes.decode("utf-8"))
+            bin_size = int(header.get("bin_size", 0))
+        if PROTOCOL_TRACE:
+            _safe_log(f"RX {header.get('type')} bin={bin_size}")
         binary = None
         if bin_size:
-            binary = recvn(bin_size)
-            if binary is None:
-                return None
+            path = sink(header) if sink else None
+            if path:
+                if not recv_to_file(bin_size, path):
+                    return None
+                header["bin_path"] = path
+            else:
+                binary = recvn(bin_size)
+                if binary is None:
+                    return None
         return header, binary
 
 
@@ -108,9 +312,31 @@ class SlaveState:
             "name": socket.gethostname(),
         }
         self.job_active = False
+        self.job_id: Optional[str] = None
+        self.pending_job: Optional[dict] = None
         self.temp_blend_path: Optional[str] = None
         self.render_format: str = "PNG"
+        self.job_type = "animation"
+        self.tiles: list[dict] = []
+        self.still_frame = 1
         self.frame_padding = 5
+        self.worker: Optional["RenderWorker"] = None
+        self.worker_max_frames = WORKER_MAX_FRAMES
+        # Pipelining: assigned frames wait in render_queue, rendered frames
+        # wait in upload_queue so rendering continues while results upload.
+        self.send_lock = threading.Lock()
+        self.protocol = 1
+        self.render_queue: queue.Queue[tuple[Optional[str], int]] = queue.Queue()
+        self.upload_queue: queue.Queue[Optional[dict]] = queue.Queue()
+        self.current_frame: Optional[int] = None
+        self.uploading_frame: Optional[int] = None
+        # Frames the master withdrew (e.g. a speculative duplicate finished elsewhere)
+        self.cancelled_frames: set[int] = set()
+        self.capabilities: Optional[dict] = None
+        # Network storage mounted at the same paths as on the master; when the
+        # job's output is there, frames are written to it instead of uploaded
+        self.shared_roots: list[str] = []
+        self.shared_output_dir: Optional[str] = None
 
 
 SLAVE_STATE = SlaveState()
@@ -173,12 +399,500 @@ class DiscoveryListener(threading.Thread):
                 continue
 
 
+class BlendPeerServer(threading.Thread):
+    """Serves blends from the local cache to other slaves, so a new job's blend fans out as a tree."""
+
+    def __init__(self) -> None:
+        super().__init__(daemon=True)
+        self.stop_event = threading.Event()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # Any free port; it is reported to the master in hello
+        self.sock.bind(("", 0))
+        self.sock.listen(8)
+        self.sock.settimeout(1.0)
+        self.port = self.sock.getsockname()[1]
+
+    def run(self) -> None:
+        while not self.stop_event.is_set():
+            try:
+                conn, _ = self.sock.accept()
+            except socket.timeout:
+                continue
+            except Exception:
+                break
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+
+    def _serve(self, conn: socket.socket) -> None:
+        try:
+            conn.settimeout(PEER_TIMEOUT)
+            msg = MessageProtocol.recv(conn)
+            header = msg[0] if msg else {}
+            blend_hash = str(header.get("blend_hash") or "")
+            path = _cache_lookup(blend_hash) if header.get("type") == "blend_request" and blend_hash else None
+            if path is None:
+                MessageProtocol.send(conn, {"type": "log", "text": f"blend {blend_hash[:12]} not cached"})
+                return
+            _safe_log(f"Serving blend {blend_hash[:12]} to a peer")
+            MessageProtocol.send(conn, {"type": "job_blend", "blend_hash": blend_hash}, file_path=path)
+        except Exception as exc:
+            _safe_log(f"Serving a blend to a peer failed: {exc}")
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+def _total_ram() -> int:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        pass
+    try:
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong),
+                ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong),
+                ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong),
+                ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong),
+                ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))  # type: ignore[attr-defined]
+        return int(status.ullTotalPhys)
+    except Exception:
+        return 0
+
+
+def _capabilities() -> dict:
+    """Hardware summary for the master's scheduler, measured once per session."""
+    with SLAVE_STATE.lock:
+        if SLAVE_STATE.capabilities is not None:
+            return SLAVE_STATE.capabilities
+    cores = os.cpu_count() or 1
+    data = bytes(CALIBRATION_BYTES)
+    t0 = time.perf_counter()
+    hashlib.sha256(data).digest()
+    dt = max(time.perf_counter() - t0, 1e-6)
+    # Single-core throughput in MB/s scaled by core count; only the ratio between slaves matters
+    caps = {
+        "cores": cores,
+        "ram": _total_ram(),
+        "blender": bpy.app.version_string,
+        "score": round(cores * CALIBRATION_BYTES / (1024 * 1024) / dt, 1),
+    }
+    with SLAVE_STATE.lock:
+        SLAVE_STATE.capabilities = caps
+    return caps
+
+
+def _shared_roots() -> list[dict]:
+    """Shared storage roots for hello, with the access this machine actually has."""
+    with SLAVE_STATE.lock:
+        roots = list(SLAVE_STATE.shared_roots)
+    return [
+        {"path": root, "read": os.access(root, os.R_OK), "write": os.access(root, os.W_OK)}
+        for root in roots
+        if os.path.isdir(root)
+    ]
+
+
+def _send(sock: socket.socket, header: dict, binary: Optional[bytes] = None, file_path: Optional[str] = None) -> None:
+    # The control reader, render and upload threads share one socket
+    with SLAVE_STATE.send_lock:
+        MessageProtocol.send(sock, header, binary, file_path, SLAVE_STATE.protocol)
+
+
+def _drain(q: queue.Queue) -> None:
+    while True:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            return
+
+
 def _ensure_temp_dir() -> str:
     d = os.path.join(tempfile.gettempdir(), "ar_slave")
     os.makedirs(d, exist_ok=True)
     return d
 
 
+def _cache_dir() -> str:
+    d = os.path.join(_ensure_temp_dir(), "cache")
+    os.makedirs(d, exist_ok=True)
+    return d
+
+
+def _cached_blend_path(blend_hash: str) -> str:
+    return os.path.join(_cache_dir(), f"{blend_hash}.blend")
+
+
+def _cache_lookup(blend_hash: str) -> Optional[str]:
+    path = _cached_blend_path(blend_hash)
+    if not os.path.exists(path):
+        return None
+    try:
+        os.utime(path, None)
+    except Exception:
+        pass
+    return path
+
+
+def _cache_store(blend_hash: str, binary: bytes) -> Optional[str]:
+    tmp_path = f"{_cached_blend_path(blend_hash)}.{uuid.uuid4().hex}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(binary)
+    return _cache_commit(blend_hash, tmp_path)
+
+
+def _cache_commit(blend_hash: str, part_path: str) -> Optional[str]:
+    """Verify a fully received blend and move it into the cache."""
+    path = _cached_blend_path(blend_hash)
+    if _file_sha256(part_path) != blend_hash:
+        _safe_log(f"Blend hash mismatch for {blend_hash[:12]}; discarding")
+        try:
+            os.remove(part_path)
+        except Exception:
+            pass
+        return None
+    os.replace(part_path, path)
+    _cache_evict(keep=path)
+    return path
+
+
+def _payload_sink(header: dict) -> Optional[str]:
+    """Stream blend payloads straight into a partial cache file."""
+    blend_hash = str(header.get("blend_hash") or "")
+    if header.get("type") not in ("job_init", "job_blend") or not blend_hash:
+        return None
+    return f"{_cached_blend_path(blend_hash)}.{uuid.uuid4().hex}.part"
+
+
+def _cache_evict(keep: Optional[str] = None) -> None:
+    """Drop least recently used blends until the cache fits its entry and byte bounds."""
+    d = _cache_dir()
+    entries = []
+    for name in os.listdir(d):
+        path = os.path.join(d, name)
+        if name.endswith(".part"):
+            continue
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    with SLAVE_STATE.lock:
+        in_use = SLAVE_STATE.temp_blend_path
+    while entries and (len(entries) > BLEND_CACHE_MAX_ENTRIES or total > BLEND_CACHE_MAX_BYTES):
+        _, size, path = entries.pop(0)
+        if path in (keep, in_use):
+            continue
+        try:
+            os.remove(path)
+            total -= size
+            _safe_log(f"Evicted cached blend {os.path.basename(path)}")
+        except Exception:
+            pass
+
+
+# Blender's background status lines, e.g. Cycles
+#   Fra:1 Mem:... | Time:00:03.81 | Remaining:00:12.34 | ... | Scene, ViewLayer | Sample 32/128
+# older tiled Cycles "Rendered 3/16 Tiles, Sample 64/128" and EEVEE "Rendering 12 / 64 samples"
+_SAMPLE_RE = re.compile(r"Sample (\d+)/(\d+)|Rendering (\d+) / (\d+) samples")
+_TILES_RE = re.compile(r"Rendered (\d+)/(\d+) Tiles")
+_REMAINING_RE = re.compile(r"Remaining:(?:(\d+):)?(\d+):(\d+(?:\.\d+)?)")
+
+
+def _parse_progress(line: str) -> Optional[Tuple[float, Optional[float]]]:
+    """Percent done and Blender's own remaining-time estimate from a status line."""
+    if not line.startswith("Fra:"):
+        return None
+    sample = _SAMPLE_RE.search(line)
+    if not sample:
+        return None
+    done, total = (int(g) for g in sample.groups() if g is not None)
+    if total <= 0:
+        return None
+    fraction = min(done, total) / total
+    tiles = _TILES_RE.search(line)
+    if tiles and int(tiles.group(2)) > 0:
+        # Samples count within the current tile
+        fraction = min(1.0, (int(tiles.group(1)) + fraction) / int(tiles.group(2)))
+    remaining = None
+    match = _REMAINING_RE.search(line)
+    if match:
+        hours, minutes, seconds = match.groups()
+        remaining = int(hours or 0) * 3600 + int(minutes) * 60 + float(seconds)
+    return fraction * 100.0, remaining
+
+
+class RenderAborted(RuntimeError):
+    """The render worker was killed mid-frame because the frame or its job was cancelled."""
+
+
+class RenderWorker:
+    """Background Blender process that keeps one job's blend loaded between frames."""
+
+    def __init__(self, blend_path: str, job_id: Optional[str]) -> None:
+        self.blend_path = blend_path
+        self.job_id = job_id
+        self.frames_rendered = 0
+        self.proc: Optional[subprocess.Popen] = None
+        self.replies: queue.Queue[Optional[dict]] = queue.Queue()
+        self.reader_thread: Optional[threading.Thread] = None
+        # Set while loading or rendering; stopping a busy worker kills it outright
+        self.busy = False
+        self.aborted = False
+        # (percent, seconds remaining) of the frame being rendered, if Blender reported any
+        self.progress: Optional[Tuple[float, Optional[float]]] = None
+        self.render_started = 0.0
+
+    def is_alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self) -> None:
+        cmd = [
+            bpy.app.binary_path,
+            "-b",
+            self.blend_path,
+            "--python-expr",
+            _WORKER_SCRIPT,
+        ]
+        t0 = time.time()
+        self.proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+            bufsize=1,
+        )
+        self.reader_thread = threading.Thread(target=self._read_stdout, daemon=True)
+        self.reader_thread.start()
+        self.busy = True
+        try:
+            reply = self._wait_reply(WORKER_START_TIMEOUT)
+        finally:
+            self.busy = False
+        if self.aborted:
+            raise RenderAborted("Render worker start aborted")
+        if not reply or reply.get("event") != "loaded":
+            self.stop()
+            raise RuntimeError("Render worker failed to load blend")
+        _safe_log(f"Render worker loaded {os.path.basename(self.blend_path)} in {time.time() - t0:0.1f}s")
+
+    def _read_stdout(self) -> None:
+        proc = self.proc
+        try:
+            for line in proc.stdout:  # type: ignore[union-attr]
+                if line.startswith(WORKER_MARKER):
+                    try:
+                        self.replies.put(json.loads(line[len(WORKER_MARKER):]))
+                    except ValueError:
+                        pass
+                elif self.busy:
+                    self._note_progress(line)
+        except Exception:
+            pass
+        finally:
+            # Wake up anyone waiting on a reply from a dead worker
+            self.replies.put(None)
+
+    def _note_progress(self, line: str) -> None:
+        parsed = _parse_progress(line)
+        if parsed is None:
+            return
+        percent, remaining = parsed
+        if remaining is None and percent > 0.0:
+            # EEVEE prints no estimate; extrapolate from the samples so far
+            remaining = (time.time() - self.render_started) * (100.0 - percent) / percent
+        self.progress = (percent, remaining)
+
+    def _wait_reply(self, timeout: Optional[float] = None) -> Optional[dict]:
+        try:
+            return self.replies.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def render(self, frame: int, out_pattern: str, fmt: str) -> str:
+        return self._request({"op": "render", "frame": frame, "output": out_pattern, "format": fmt})
+
+    def render_tile(self, frame: int, border: list[float], out_pattern: str, tile_path: str) -> str:
+        return self._request({
+            "op": "render_tile",
+            "frame": frame,
+            "border": border,
+            "output": out_pattern,
+            "tile_path": tile_path,
+        })
+
+    def _request(self, cmd: dict) -> str:
+        if self.aborted:
+            raise RenderAborted("Render aborted")
+        proc = self.proc
+        if proc is None or proc.poll() is not None:
+            raise RuntimeError("Render worker is not running")
+        self.progress = None
+        self.render_started = time.time()
+        self.busy = True
+        try:
+            proc.stdin.write(json.dumps(cmd) + "\n")  # type: ignore[union-attr]
+            proc.stdin.flush()  # type: ignore[union-attr]
+            reply = self._wait_reply()
+        except (OSError, ValueError):
+            # Pipe closed under us by abort()
+            reply = None
+        finally:
+            self.busy = False
+            self.progress = None
+        if reply is None and self.aborted:
+            raise RenderAborted("Render aborted")
+        if reply is None:
+            raise RuntimeError("Render worker exited during render")
+        if reply.get("event") != "done":
+            raise RuntimeError(str(reply.get("error", "unknown worker error")))
+        self.frames_rendered += 1
+        return str(reply.get("path"))
+
+    def stop(self) -> None:
+        if self.busy:
+            # It would only read the quit request after the current frame
+            self.abort()
+            return
+        proc = self.proc
+        if proc is None:
+            return
+        try:
+            if proc.poll() is None:
+                proc.stdin.write(json.dumps({"op": "quit"}) + "\n")  # type: ignore[union-attr]
+                proc.stdin.flush()  # type: ignore[union-attr]
+                proc.wait(timeout=5.0)
+        except Exception:
+            pass
+        if proc.poll() is None:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        self.proc = None
+
+    def abort(self) -> None:
+        """Kill the process now, even mid-frame; the pending request raises RenderAborted."""
+        self.aborted = True
+        proc = self.proc
+        self.proc = None
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            proc.terminate()
+            proc.wait(timeout=1.0)
+        except Exception:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+
+
+# Serialises starting workers; SLAVE_STATE.worker is set before the blend
+# loads so a cancel can abort a worker that is still starting
+_worker_lock = threading.Lock()
+
+
+def _stop_worker() -> None:
+    with SLAVE_STATE.lock:
+        worker = SLAVE_STATE.worker
+        SLAVE_STATE.worker = None
+    if worker:
+        worker.stop()
+
+
+def _abort_worker(frame: Optional[int] = None) -> None:
+    """Kill the render worker at once so a cancel frees the slave within a second.
+
+    With ``frame`` given, only while that frame is still the one rendering.
+    """
+    with SLAVE_STATE.lock:
+        if frame is not None and SLAVE_STATE.current_frame != frame:
+            return
+        worker = SLAVE_STATE.worker
+        SLAVE_STATE.worker = None
+        if worker:
+            # Marked under the lock: a render that has not reached the worker yet
+            # fails fast, and the next frame gets a fresh worker
+            worker.aborted = True
+    if worker:
+        _safe_log(f"Aborting render of frame {frame}" if frame is not None else "Aborting render worker")
+        worker.abort()
+
+
+def _get_worker(blend_path: str, job_id: Optional[str]) -> RenderWorker:
+    """Return a live worker for the job, recycling it on job change or after too many frames."""
+    with _worker_lock:
+        with SLAVE_STATE.lock:
+            worker = SLAVE_STATE.worker
+            max_frames = max(1, int(SLAVE_STATE.worker_max_frames))
+        if worker is not None:
+            stale = worker.job_id != job_id or worker.blend_path != blend_path
+            worn_out = worker.frames_rendered >= max_frames and not worker.busy
+            if stale or not worker.is_alive() or worn_out:
+                _safe_log(f"Recycling render worker after {worker.frames_rendered} frames")
+                _stop_worker()
+                worker = None
+        if worker is None:
+            worker = RenderWorker(blend_path, job_id)
+            with SLAVE_STATE.lock:
+                SLAVE_STATE.worker = worker
+            try:
+                worker.start()
+            except Exception:
+                with SLAVE_STATE.lock:
+                    if SLAVE_STATE.worker is worker:
+                        SLAVE_STATE.worker = None
+                raise
+    return worker
+
+
+def _drain_uploads() -> None:
+    """Drop rendered frames waiting for upload, files included."""
+    while True:
+        try:
+            item = SLAVE_STATE.upload_queue.get_nowait()
+        except queue.Empty:
+            return
+        if item:
+            try:
+                os.remove(item["path"])
+            except OSError:
+                pass
+
+
+def _remove_partial_outputs(out_dir: str, frame: int, tiled: bool) -> None:
+    """Delete whatever a killed render left behind for a frame or tile."""
+    prefixes = (f"tile_{frame:04d}_", f"tile_{frame:04d}.") if tiled else (f"frame_{frame:05d}.",)
+    for name in os.listdir(out_dir):
+        if name.startswith(prefixes):
+            try:
+                os.remove(os.path.join(out_dir, name))
+            except OSError:
+                pass
+
+
 def _client_loop(master_ip: str) -> None:
     _safe_log(f"Connecting to master at {master_ip}:{TCP_CONTROL_PORT}")
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -189,8 +903,17 @@ def _client_loop(master_ip: str) -> None:
         _safe_log(f"Connect failed: {exc}")
         return
     sock.settimeout(2.0)
+    session_stop: Optional[threading.Event] = None
     try:
-        MessageProtocol.send(sock, {"type": "hello", **SLAVE_STATE.identity})
+        SLAVE_STATE.protocol = 1
+        MessageProtocol.send(sock, {
+            "type": "hello",
+            "protocols": list(SUPPORTED_PROTOCOLS),
+            **SLAVE_STATE.identity,
+            **_capabilities(),
+            "shared_roots": _shared_roots(),
+            "peer_port": _blend_server.port if _blend_server is not None and _blend_server.is_alive() else 0,
+        })
         hello = None
         while not SLAVE_STATE.stop_event.is_set():
             try:
@@ -202,13 +925,26 @@ def _client_loop(master_ip: str) -> None:
         if not hello:
             _safe_log("No hello ack from master")
             return
-        _safe_log("Connected to master")
+        # Masters that predate version negotiation omit the field
+        SLAVE_STATE.protocol = int(hello[0].get("protocol", 1))
+        _safe_log(f"Connected to master (protocol v{SLAVE_STATE.protocol})")
         with SLAVE_STATE.lock:
             SLAVE_STATE.connected = True
+        _drain(SLAVE_STATE.render_queue)
+        _drain_uploads()
+        session_stop = threading.Event()
+        renderer = threading.Thread(target=_render_loop, args=(sock, session_stop), daemon=True)
+        uploader = threading.Thread(target=_upload_loop, args=(sock, session_stop), daemon=True)
+        heartbeat = threading.Thread(target=_heartbeat_loop, args=(sock, session_stop), daemon=True)
+        progress = threading.Thread(target=_progress_loop, args=(sock, session_stop), daemon=True)
+        renderer.start()
+        uploader.start()
+        heartbeat.start()
+        progress.start()
 
         while not SLAVE_STATE.stop_event.is_set():
             try:
-                msg = MessageProtocol.recv(sock)
+                msg = MessageProtocol.recv(sock, _payload_sink)
             except (socket.timeout, TimeoutError):
                 continue
             if msg is None:
@@ -217,105 +953,415 @@ def _client_loop(master_ip: str) -> None:
             mtype = header.get("type")
             if mtype == "job_init":
                 _handle_job_init(header, binary, sock)
+            elif mtype == "job_blend":
+                _handle_job_blend(header, binary, sock)
+            elif mtype == "blend_peer":
+                # Off the control thread; the transfer can take minutes
+                threading.Thread(target=_fetch_from_peer, args=(header, sock), daemon=True).start()
             elif mtype == "assign":
-                frame = int(header.get("frame"))
-                _render_frame_and_send(sock, frame)
+                frames = [int(f) for f in header.get("frames") or [header.get("frame")]]
+                with SLAVE_STATE.lock:
+                    job_id = header.get("job_id") or SLAVE_STATE.job_id
+                for frame in frames:
+                    SLAVE_STATE.render_queue.put((job_id, frame))
+            elif mtype == "cancel" and header.get("frames"):
+                frames = {int(f) for f in header["frames"]}
+                _safe_log(f"Master withdrew frames {sorted(frames)}")
+                with SLAVE_STATE.lock:
+                    same_job = not header.get("job_id") or header.get("job_id") == SLAVE_STATE.job_id
+                    if same_job:
+                        SLAVE_STATE.cancelled_frames.update(frames)
+                    rendering = SLAVE_STATE.current_frame if same_job else None
+                if rendering in frames:
+                    _abort_worker(rendering)
             elif mtype == "cancel":
+                with SLAVE_STATE.lock:
+                    other_job = header.get("job_id") and header.get("job_id") != SLAVE_STATE.job_id
+                if other_job:
+                    # Already moved on to another job
+                    continue
                 _safe_log("Job cancelled by master")
+                # The blend stays in the cache for the next job that uses it
                 with SLAVE_STATE.lock:
                     SLAVE_STATE.job_active = False
-                    if SLAVE_STATE.temp_blend_path and os.path.exists(SLAVE_STATE.temp_blend_path):
-                        try:
-                            os.remove(SLAVE_STATE.temp_blend_path)
-                        except Exception:
-                            pass
+                    SLAVE_STATE.cancelled_frames.clear()
+                    SLAVE_STATE.job_id = None
+                    SLAVE_STATE.pending_job = None
                     SLAVE_STATE.temp_blend_path = None
+                    SLAVE_STATE.shared_output_dir = None
+                _drain(SLAVE_STATE.render_queue)
+                _drain_uploads()
+                # Kill the frame in progress instead of letting it finish for nobody
+                _abort_worker()
             else:
                 pass
     except Exception as exc:
         _safe_log(f"Client error: {exc}")
         traceback.print_exc()
     finally:
+        if session_stop is not None:
+            session_stop.set()
+            SLAVE_STATE.upload_queue.put(None)
         try:
             sock.close()
         except Exception:
             pass
+        _stop_worker()
         with SLAVE_STATE.lock:
             SLAVE_STATE.connected = False
 
 
+def _render_loop(sock: socket.socket, stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            job_id, frame = SLAVE_STATE.render_queue.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        with SLAVE_STATE.lock:
+            current_job = SLAVE_STATE.job_id
+            withdrawn = frame in SLAVE_STATE.cancelled_frames
+            SLAVE_STATE.cancelled_frames.discard(frame)
+        if job_id != current_job or withdrawn:
+            continue
+        try:
+            _render_frame(sock, job_id, frame)
+            if SLAVE_STATE.render_queue.empty():
+                _send(sock, {"type": "ready", "job_id": job_id})
+        except Exception as exc:
+            _safe_log(f"Render loop error: {exc}")
+
+
+def _outstanding_frames(job_id: Optional[str]) -> list[int]:
+    """Frames of the job this slave still has queued, rendering or uploading."""
+    with SLAVE_STATE.render_queue.mutex:
+        frames = {frame for jid, frame in SLAVE_STATE.render_queue.queue if jid == job_id}
+    with SLAVE_STATE.upload_queue.mutex:
+        frames.update(item["frame"] for item in SLAVE_STATE.upload_queue.queue if item and item.get("job_id") == job_id)
+    with SLAVE_STATE.lock:
+        frames.update(f for f in (SLAVE_STATE.current_frame, SLAVE_STATE.uploading_frame) if f is not None)
+    return sorted(frames)
+
+
+def _heartbeat_loop(sock: socket.socket, stop: threading.Event) -> None:
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        with SLAVE_STATE.lock:
+            job_id = SLAVE_STATE.job_id
+            frame = SLAVE_STATE.current_frame
+        try:
+            # The master lets leases on frames missing here run out and requeues them
+            _send(sock, {"type": "heartbeat", "job_id": job_id, "frame": frame, "frames": _outstanding_frames(job_id)})
+        except Exception:
+            return
+
+
+def _progress_loop(sock: socket.socket, stop: threading.Event) -> None:
+    """Tell the master how far the current frame is, so it can tell slow from hung."""
+    last: Optional[tuple] = None
+    while not stop.wait(PROGRESS_INTERVAL):
+        with SLAVE_STATE.lock:
+            job_id = SLAVE_STATE.job_id
+            frame = SLAVE_STATE.current_frame
+            worker = SLAVE_STATE.worker
+        progress = worker.progress if worker is not None and frame is not None else None
+        if progress is None:
+            continue
+        percent, remaining = progress
+        report = (job_id, frame, round(percent, 1))
+        if report == last:
+            continue
+        last = report
+        try:
+            _send(sock, {
+                "type": "progress",
+                "job_id": job_id,
+                "frame": frame,
+                "percent": round(percent, 1),
+                "eta": round(remaining, 1) if remaining is not None else None,
+            })
+        except Exception:
+            return
+
+
+def _upload_loop(sock: socket.socket, stop: threading.Event) -> None:
+    while not stop.is_set():
+        item = SLAVE_STATE.upload_queue.get()
+        if item is None:
+            continue
+        fpath = item.pop("path")
+        with SLAVE_STATE.lock:
+            current_job = SLAVE_STATE.job_id
+            shared_dir = SLAVE_STATE.shared_output_dir
+            SLAVE_STATE.uploading_frame = item["frame"]
+        try:
+            if item.get("job_id") == current_job:
+                saved = bool(shared_dir) and _save_shared_frame(sock, item, fpath, shared_dir)  # type: ignore[arg-type]
+                if not saved:
+                    _safe_log(f"Sending frame {item['frame']} ({os.path.getsize(fpath)} bytes)")
+                    # Lets the master verify the file before moving it into place
+                    item["sha256"] = _file_sha256(fpath)
+                    _send(sock, {"type": "frame_result", **item}, file_path=fpath)
+        except Exception as exc:
+            _safe_log(f"Failed sending frame {item['frame']}: {exc}")
+            # Heartbeats would otherwise keep the frame's lease alive forever
+            try:
+                _send(sock, {"type": "frame_failed", "job_id": item.get("job_id"), "frame": item["frame"], "error": str(exc)})
+            except Exception:
+                pass
+        finally:
+            with SLAVE_STATE.lock:
+                SLAVE_STATE.uploading_frame = None
+            try:
+                os.remove(fpath)
+            except Exception:
+                pass
+
+
+def _save_shared_frame(sock: socket.socket, item: dict, fpath: str, output_dir: str) -> bool:
+    """Copy a frame into the shared output directory and tell the master; False to upload instead."""
+    part_path = os.path.join(output_dir, f".frame_{item['frame']:04d}.{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    try:
+        with open(fpath, "rb") as src, open(part_path, "wb") as dst:
+            for chunk in iter(lambda: src.read(RECV_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                dst.write(chunk)
+            dst.flush()
+            os.fsync(dst.fileno())
+        size = os.path.getsize(part_path)
+    except OSError as exc:
+        _safe_log(f"Could not write frame {item['frame']} to shared storage, uploading it: {exc}")
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        return False
+    _safe_log(f"Saved frame {item['frame']} to shared storage ({size} bytes)")
+    # The master renames the file into place once it accepts the frame
+    _send(sock, {
+        "type": "frame_done",
+        **item,
+        "name": os.path.basename(part_path),
+        "size": size,
+        "sha256": digest.hexdigest(),
+    })
+    return True
+
+
 def _handle_job_init(header: dict, binary: Optional[bytes], sock: socket.socket) -> None:
-    if not binary:
+    blend_hash = str(header.get("blend_hash") or "")
+    if header.get("bin_path"):
+        blend_path = _cache_commit(blend_hash, header["bin_path"])
+    elif binary:
+        # Master sent the payload inline (no hash negotiation)
+        blend_hash = blend_hash or hashlib.sha256(binary).hexdigest()
+        blend_path = _cache_store(blend_hash, binary)
+    elif blend_hash:
+        blend_path = _cache_lookup(blend_hash)
+    else:
+        return
+    shared_blend = str((header.get("shared") or {}).get("blend_path") or "")
+    if not blend_path and shared_blend and os.path.isfile(shared_blend):
+        # A local copy beats the network, so the cache is checked first
+        _safe_log(f"Reading blend {blend_hash[:12]} from shared storage")
+        _send(sock, {"type": "have_blend", "job_id": header.get("job_id"), "blend_hash": blend_hash, "shared": True})
+        _activate_job(header, shared_blend, sock)
+        return
+    if not blend_path:
+        with SLAVE_STATE.lock:
+            SLAVE_STATE.pending_job = header
+        _safe_log(f"Blend {blend_hash[:12]} not cached; requesting transfer")
+        _send(sock, {"type": "need_blend", "job_id": header.get("job_id"), "blend_hash": blend_hash})
+        return
+    _safe_log(f"Using cached blend {blend_hash[:12]}")
+    _send(sock, {"type": "have_blend", "job_id": header.get("job_id"), "blend_hash": blend_hash})
+    _activate_job(header, blend_path, sock)
+
+
+def _handle_job_blend(header: dict, binary: Optional[bytes], sock: socket.socket) -> None:
+    with SLAVE_STATE.lock:
+        job = SLAVE_STATE.pending_job
+    blend_hash = str(header.get("blend_hash") or "")
+    part_path = header.get("bin_path")
+    if not job or job.get("blend_hash") != blend_hash or not (part_path or binary):
+        if part_path:
+            try:
+                os.remove(part_path)
+            except Exception:
+                pass
         return
-    temp_dir = _ensure_temp_dir()
-    fname = header.get("blend_name") or f"job_{uuid.uuid4().hex}.blend"
-    blend_path = os.path.join(temp_dir, str(fname))
     try:
-        with open(blend_path, "wb") as f:
-            f.write(binary)
+        if part_path:
+            blend_path = _cache_commit(blend_hash, part_path)
+        else:
+            blend_path = _cache_store(blend_hash, binary)  # type: ignore[arg-type]
     except Exception as exc:
         _safe_log(f"Failed to write blend: {exc}")
         return
+    if not blend_path:
+        _send(sock, {"type": "log", "text": f"Received corrupt blend {blend_hash[:12]}"})
+        return
+    _activate_job(job, blend_path, sock)
+
+
+def _fetch_from_peer(header: dict, sock: socket.socket) -> None:
+    """Pull the pending job's blend from the slave the master named, falling back to the master."""
+    blend_hash = str(header.get("blend_hash") or "")
+    host, port = str(header.get("host")), int(header.get("port") or 0)
+    t0 = time.time()
+    try:
+        with socket.create_connection((host, port), timeout=10.0) as peer:
+            peer.settimeout(PEER_TIMEOUT)
+            MessageProtocol.send(peer, {"type": "blend_request", "blend_hash": blend_hash})
+            msg = MessageProtocol.recv(peer, _payload_sink)
+        reply = msg[0] if msg else {}
+        if reply.get("type") != "job_blend" or not reply.get("bin_path"):
+            raise RuntimeError(str(reply.get("text") or "no blend in reply"))
+        blend_path = _cache_commit(blend_hash, reply["bin_path"])
+        if not blend_path:
+            raise RuntimeError("corrupt blend")
+    except Exception as exc:
+        _safe_log(f"Fetching blend {blend_hash[:12]} from {host}:{port} failed: {exc}")
+        _send(sock, {"type": "need_blend", "job_id": header.get("job_id"), "blend_hash": blend_hash, "peer_failed": True})
+        return
+    _safe_log(f"Fetched blend {blend_hash[:12]} from peer {host} in {time.time() - t0:0.1f}s")
+    with SLAVE_STATE.lock:
+        job = SLAVE_STATE.pending_job
+    if job and job.get("blend_hash") == blend_hash:
+        _activate_job(job, blend_path, sock)
+
+
+def _activate_job(header: dict, blend_path: str, sock: socket.socket) -> None:
+    job_id = header.get("job_id")
     with SLAVE_STATE.lock:
+        SLAVE_STATE.pending_job = None
+        SLAVE_STATE.cancelled_frames.clear()
         SLAVE_STATE.temp_blend_path = blend_path
+        SLAVE_STATE.job_id = str(job_id) if job_id else None
         SLAVE_STATE.job_active = True
         SLAVE_STATE.render_format = str(header.get("format", "PNG"))
+        SLAVE_STATE.job_type = str(header.get("job_type", "animation"))
+        SLAVE_STATE.tiles = list(header.get("tiles") or [])
+        SLAVE_STATE.still_frame = int(header.get("still_frame", 1))
+        shared_dir = str((header.get("shared") or {}).get("output_dir") or "")
+        SLAVE_STATE.shared_output_dir = shared_dir if shared_dir and os.access(shared_dir, os.W_OK) else None
     _safe_log(f"Job init received: frames {header.get('frame_start')}..{header.get('frame_end')} step {header.get('frame_step')} format {SLAVE_STATE.render_format}")
-    MessageProtocol.send(sock, {"type": "ready"})
+    with SLAVE_STATE.lock:
+        worker = SLAVE_STATE.worker
+    if worker is not None and worker.job_id != SLAVE_STATE.job_id:
+        # Whatever it is rendering belongs to the previous job
+        _abort_worker()
+    # Load the blend off the control thread so cancels are still read meanwhile
+    threading.Thread(target=_prewarm_worker, args=(blend_path, SLAVE_STATE.job_id, sock), daemon=True).start()
+    _send(sock, {"type": "ready", "job_id": SLAVE_STATE.job_id})
+
+
+def _prewarm_worker(blend_path: str, job_id: Optional[str], sock: socket.socket) -> None:
+    try:
+        _get_worker(blend_path, job_id)
+    except RenderAborted:
+        pass
+    except Exception as exc:
+        # Rendering retries the worker start per frame; report and carry on
+        _send(sock, {"type": "log", "text": f"Render worker start failed: {exc}"})
 
 
-def _render_frame_and_send(sock: socket.socket, frame: int) -> None:
+def _render_frame(sock: socket.socket, job_id: Optional[str], frame: int) -> None:
+    """Render one frame and queue the result for the upload thread."""
     with SLAVE_STATE.lock:
         if not SLAVE_STATE.temp_blend_path:
-            MessageProtocol.send(sock, {"type": "log", "text": "No blend loaded"})
+            _send(sock, {"type": "frame_failed", "job_id": job_id, "frame": frame, "error": "No blend loaded"})
+            _send(sock, {"type": "log", "text": "No blend loaded"})
             return
         blend_path = SLAVE_STATE.temp_blend_path
         fmt = SLAVE_STATE.render_format
-    blender_bin = bpy.app.binary_path
+        tiled = SLAVE_STATE.job_type == "tiled_still"
+        tiles = SLAVE_STATE.tiles
+        still_frame = SLAVE_STATE.still_frame
     out_dir = _ensure_temp_dir()
     out_pattern = os.path.join(out_dir, "frame_#####")
-    _safe_log(f"Rendering frame {frame} using {fmt} ...")
-    cmd = [
-        blender_bin,
-        "-b",
-        blend_path,
-        "-o",
-        out_pattern,
-        "-F",
-        fmt,
-        "-f",
-        str(frame),
-    ]
+    _safe_log(f"Rendering {'tile' if tiled else 'frame'} {frame} using {fmt} ...")
+    with SLAVE_STATE.lock:
+        SLAVE_STATE.current_frame = frame
     try:
+        worker = _get_worker(blend_path, job_id)
         t0 = time.time()
-        proc = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if tiled:
+            # Work units are tile indices; every tile renders the same frame
+            tile_out = os.path.join(out_dir, f"tile_{frame:04d}_#####")
+            tile_path = os.path.join(out_dir, f"tile_{frame:04d}.npy")
+            fpath = worker.render_tile(still_frame, tiles[frame]["border"], tile_out, tile_path)
+        else:
+            fpath = worker.render(frame, out_pattern, fmt)
         dt = time.time() - t0
-        _safe_log(f"Rendered frame {frame} in {dt:0.1f}s, stdout {len(proc.stdout)}B")
+        _safe_log(f"Rendered frame {frame} in {dt:0.1f}s")
+    except RenderAborted:
+        _safe_log(f"Render of {'tile' if tiled else 'frame'} {frame} aborted")
+        _remove_partial_outputs(out_dir, frame, tiled)
+        with SLAVE_STATE.lock:
+            withdrawn = frame in SLAVE_STATE.cancelled_frames
+            SLAVE_STATE.cancelled_frames.discard(frame)
+        if not withdrawn:
+            # The master still holds a lease on it; hand it back without blaming this slave
+            _send(sock, {"type": "frame_aborted", "job_id": job_id, "frame": frame})
+        return
     except Exception as exc:
-        MessageProtocol.send(sock, {"type": "log", "text": f"Render failed for frame {frame}: {exc}"})
+        _stop_worker()
+        _send(sock, {"type": "frame_failed", "job_id": job_id, "frame": frame, "error": str(exc)})
+        _send(sock, {"type": "log", "text": f"Render failed for frame {frame}: {exc}"})
         return
+    finally:
+        with SLAVE_STATE.lock:
+            SLAVE_STATE.current_frame = None
 
-    ext = fmt.lower()
+    with SLAVE_STATE.lock:
+        withdrawn = frame in SLAVE_STATE.cancelled_frames
+        SLAVE_STATE.cancelled_frames.discard(frame)
+    if withdrawn:
+        _safe_log(f"Dropping withdrawn frame {frame}")
+        try:
+            os.remove(fpath)
+        except Exception:
+            pass
+        return
+    ext = os.path.splitext(fpath)[1].lstrip(".").lower() or fmt.lower()
     if ext == "jpeg":
         ext = "jpg"
-    filename = f"frame_{frame:05d}.{ext}"
-    fpath = os.path.join(out_dir, filename)
-    if not os.path.exists(fpath):
-        filename = f"frame_{frame:04d}.{ext}"
-        fpath = os.path.join(out_dir, filename)
-    try:
-        with open(fpath, "rb") as f:
-            data = f.read()
-        _safe_log(f"Sending frame {frame} ({len(data)} bytes)")
-        MessageProtocol.send(sock, {"type": "frame_result", "frame": frame, "ext": ext}, data)
-        MessageProtocol.send(sock, {"type": "ready"})
-    except Exception as exc:
-        MessageProtocol.send(sock, {"type": "log", "text": f"Failed sending frame {frame}: {exc}"})
+    SLAVE_STATE.upload_queue.put({
+        "job_id": job_id,
+        "frame": frame,
+        "ext": ext,
+        "render_time": dt,
+        "path": fpath,
+    })
+
+
+def _update_worker_max_frames(self, context) -> None:
+    with SLAVE_STATE.lock:
+        SLAVE_STATE.worker_max_frames = int(self.worker_max_frames)
+
+
+def _update_shared_roots(self, context) -> None:
+    roots = [os.path.abspath(bpy.path.abspath(p.strip())) for p in self.shared_roots.split(";") if p.strip()]
+    with SLAVE_STATE.lock:
+        SLAVE_STATE.shared_roots = roots
 
 
 class AR_SlaveProps(bpy.types.PropertyGroup):
     connected: BoolProperty(name="Connected", default=False)
     master_name: StringProperty(name="Master", default="")
+    worker_max_frames: IntProperty(
+        name="Recycle Worker After",
+        description="Restart the background render worker after this many frames to cap memory growth",
+        default=WORKER_MAX_FRAMES,
+        min=1,
+        update=_update_worker_max_frames,
+    )
+    shared_roots: StringProperty(
+        name="Shared Storage",
+        description="Network storage mounted at the same paths as on the master, separated by ';'. Reported on the next connection",
+        default="",
+        update=_update_shared_roots,
+    )
 
 
 class AR_PT_SlavePanel(bpy.types.Panel):
@@ -336,15 +1382,33 @@ class AR_PT_SlavePanel(bpy.types.Panel):
         status = "Connected" if connected else "Searching..."
         layout.label(text=f"Status: {status}")
         layout.label(text=f"Master: {master_name or '-'}")
+        layout.prop(context.scene.ar_slave, "worker_max_frames")
+        layout.prop(context.scene.ar_slave, "shared_roots")
 
 
 _threads_started = False
 _disc_broadcaster: Optional[DiscoveryBroadcaster] = None
 _disc_listener: Optional[DiscoveryListener] = None
+_blend_server: Optional[BlendPeerServer] = None
 _client_thread: Optional[threading.Thread] = None
 
 
+def _apply_scene_props() -> None:
+    """Mirror the scene's slave settings into SLAVE_STATE.
+
+    The update callbacks only fire on edits, not when the values come from a
+    saved file after a restart or file load.
+    """
+    props = getattr(getattr(bpy.context, "scene", None), "ar_slave", None)
+    if props is None:
+        return
+    _update_worker_max_frames(props, bpy.context)
+    _update_shared_roots(props, bpy.context)
+
+
 def _maintain_connection_timer() -> float:
+    # Before connecting, so hello reports what the scene says
+    _apply_scene_props()
     with SLAVE_STATE.lock:
         master_ip = SLAVE_STATE.master_addr
         connected = SLAVE_STATE.connected
@@ -366,7 +1430,7 @@ classes = (
 
 
 def register():
-    global _threads_started, _disc_broadcaster, _disc_listener
+    global _threads_started, _disc_broadcaster, _disc_listener, _blend_server
     for cls in classes:
         bpy.utils.register_class(cls)
     if not hasattr(bpy.types.Scene, "ar_slave"):
@@ -377,21 +1441,32 @@ def register():
         _disc_listener = DiscoveryListener()
         _disc_broadcaster.start()
         _disc_listener.start()
+        try:
+            _blend_server = BlendPeerServer()
+            _blend_server.start()
+        except OSError as exc:
+            # Still works, just always from the master
+            _safe_log(f"Blend peer server unavailable: {exc}")
+            _blend_server = None
         _threads_started = True
     bpy.app.timers.register(_maintain_connection_timer, persistent=True)
 
 
 def unregister():
-    global _threads_started, _disc_broadcaster, _disc_listener
+    global _threads_started, _disc_broadcaster, _disc_listener, _blend_server
     try:
         bpy.app.timers.unregister(_maintain_connection_timer)
     except Exception:
         pass
+    _stop_worker()
     if _threads_started:
         if _disc_broadcaster:
             _disc_broadcaster.stop_event.set()
         if _disc_listener:
             _disc_listener.stop_event.set()
+        if _blend_server:
+            _blend_server.stop_event.set()
+            _blend_server = None
         _threads_started = False
     for cls in reversed(classes):
         try:
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# ar_master is bpy-free; slave.py and master.py need Blender's Python
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
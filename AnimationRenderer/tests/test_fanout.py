@@ -0,0 +1,63 @@
+from ar_master.core import BlendFanout
+
+MASTER = BlendFanout.MASTER
+
+
+def always(slave_id):
+    return True
+
+
+def test_master_serves_first_receivers_then_queues():
+    fanout = BlendFanout(2)
+    assert fanout.request("a", always) == MASTER
+    assert fanout.request("b", always) == MASTER
+    assert fanout.request("c", always) is None
+    assert fanout.take_waiting() == ["c"]
+    assert fanout.take_waiting() == []
+
+
+def test_holders_serve_before_master():
+    fanout = BlendFanout(1)
+    assert fanout.request("a", always) == MASTER
+    assert fanout.finished("a", can_serve=True)
+    assert fanout.request("b", always) == "a"
+    # a is at its fan-out limit, so the master takes the next one
+    assert fanout.request("c", always) == MASTER
+    assert fanout.request("d", always) is None
+
+
+def test_least_loaded_holder_wins():
+    fanout = BlendFanout(2)
+    fanout.holders.update({"a", "b"})
+    fanout.sources["x"] = "a"
+    assert fanout.request("y", always) == "b"
+
+
+def test_unservable_and_failed_peers_are_skipped():
+    fanout = BlendFanout(2)
+    fanout.holders.add("a")
+    assert fanout.request("b", lambda sid: sid != "a") == MASTER
+    assert fanout.request("c", always) == "a"
+    fanout.peer_failed("c")
+    assert fanout.request("c", always) == MASTER
+    assert fanout.finished("c", can_serve=False)
+    assert "c" not in fanout.holders
+    assert fanout.failed == {}
+
+
+def test_receivers_without_peer_access_always_get_master():
+    fanout = BlendFanout(1)
+    fanout.request("a", always)
+    assert fanout.request("b", always, from_peers=False) == MASTER
+
+
+def test_forget_drops_holder_and_waiting_entry():
+    fanout = BlendFanout(1)
+    fanout.request("a", always)
+    assert fanout.request("b", always) is None
+    fanout.finished("a", can_serve=True)
+    fanout.forget("a")
+    fanout.forget("b")
+    assert fanout.holders == set()
+    assert fanout.take_waiting() == []
+    assert fanout.request("c", always) == MASTER
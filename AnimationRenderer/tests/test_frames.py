@@ -0,0 +1,62 @@
+import queue
+
+import pytest
+
+from ar_master import core
+from ar_master.__main__ import parse_frames
+
+
+def test_parse_frames_ranges_lists_and_step():
+    assert parse_frames("1-5") == [1, 2, 3, 4, 5]
+    assert parse_frames("1,5,10-12") == [1, 5, 10, 11, 12]
+    assert parse_frames("1-10", step=3) == [1, 4, 7, 10]
+    assert parse_frames("3, 1,3,,2") == [1, 2, 3]
+
+
+def test_interleave_frames_is_coarse_to_fine_permutation():
+    frames = list(range(1, 41))
+    order = core.interleave_frames(frames, stride=16)
+    assert sorted(order) == frames
+    # Every 16th frame and the last come first, then the gaps halve
+    assert order[:4] == [1, 17, 33, 40]
+    assert order[4:6] == [9, 25]
+    assert core.interleave_frames([]) == []
+    assert core.interleave_frames([7]) == [7]
+
+
+@pytest.mark.parametrize("res_x, res_y, tiles_x, tiles_y", [(100, 50, 4, 2), (7, 5, 3, 3), (1920, 1080, 5, 3)])
+def test_split_tiles_cover_image_exactly_once(res_x, res_y, tiles_x, tiles_y):
+    tiles = core.split_tiles(res_x, res_y, tiles_x, tiles_y)
+    covered = [[0] * res_x for _ in range(res_y)]
+    for tile in tiles:
+        x0, y0, x1, y1 = tile["rect"]
+        for y in range(y0, y1):
+            for x in range(x0, x1):
+                covered[y][x] += 1
+        # Blender truncates border * resolution back to the rect
+        bx0, by0, bx1, by1 = tile["border"]
+        assert (int(bx0 * res_x), int(by0 * res_y)) == (x0, y0)
+        assert (min(res_x, int(bx1 * res_x)), min(res_y, int(by1 * res_y))) == (x1, y1)
+    assert all(count == 1 for row in covered for count in row)
+
+
+def test_frame_queue_runs_stop_at_gaps():
+    q = core.FrameQueue()
+    for frame in (1, 2, 3, 5, 6):
+        q.put(frame)
+    assert q.take_run(10, 1) == [1, 2, 3]
+    assert q.take_run(1, 1) == [5]
+    q.requeue([2, 3])
+    assert q.take_run(10, None) == [2, 3, 6]
+    assert q.empty()
+    with pytest.raises(queue.Empty):
+        q.get_nowait()
+
+
+def test_frame_queue_remove():
+    q = core.FrameQueue()
+    for frame in (1, 2, 3):
+        q.put(frame)
+    assert q.remove(2)
+    assert not q.remove(2)
+    assert q.take_run(10, None) == [1, 3]
@@ -0,0 +1,127 @@
+import pytest
+
+from ar_master import core
+
+
+@pytest.fixture(autouse=True)
+def farm_metrics(monkeypatch):
+    monkeypatch.setattr(core, "FARM_METRICS", core.FarmMetrics())
+
+
+def make_job(frames=range(1, 11), **kwargs):
+    return core.Job(core.MasterState(), "job", "Test", core.JOB_PRIORITY, core.JOB_ANIMATION,
+                    list(frames), 1, "/tmp", "PNG", **kwargs)
+
+
+def lease(job, slave_id, count):
+    frames = job.take_frames(count)
+    job.lease_frames(slave_id, frames)
+    return frames
+
+
+def expire(job, slave_id, frames):
+    for frame in frames:
+        job.leases[(slave_id, frame)] = 0.0
+    return job.expire_leases()
+
+
+def test_expired_lease_requeues_frame_at_front():
+    job = make_job()
+    assert lease(job, "a", 3) == [1, 2, 3]
+    assert expire(job, "a", [2]) == [("a", 2)]
+    assert not job.holds_lease("a", 2)
+    assert job.frames_in_progress["a"] == {1, 3}
+    assert job.take_frames(2) == [2]
+
+
+def test_renewing_listed_frames_lets_lost_frames_expire():
+    job = make_job()
+    lease(job, "a", 3)
+    for key in list(job.leases):
+        job.leases[key] = 0.0
+    # The slave's heartbeat no longer mentions frame 2
+    job.renew_leases("a", [1, 3, 99])
+    assert sorted(job.expire_leases()) == [("a", 2)]
+    assert ("a", 99) not in job.leases
+
+
+def test_renewing_without_frames_extends_every_lease():
+    job = make_job()
+    lease(job, "a", 3)
+    for key in list(job.leases):
+        job.leases[key] = 0.0
+    job.renew_leases("a")
+    assert job.expire_leases() == []
+
+
+def test_progress_renews_only_that_frame():
+    job = make_job()
+    lease(job, "a", 2)
+    for key in list(job.leases):
+        job.leases[key] = 0.0
+    assert job.record_progress("a", 1, 40.0, 12.0)
+    assert not job.record_progress("b", 1, 40.0, 12.0)
+    frame, percent, left = job.progress_for("a")
+    assert (frame, percent) == (1, 40.0)
+    assert 0.0 <= left <= 12.0
+    assert job.expire_leases() == [("a", 2)]
+
+
+def test_unlease_does_not_count_an_attempt():
+    job = make_job()
+    lease(job, "a", 2)
+    job.unlease_frames("a", [1, 2])
+    assert job.frame_attempts == {1: 0, 2: 0}
+    assert job.leases == {}
+    assert job.take_frames(10) == list(range(1, 11))
+
+
+def test_complete_frame_drops_lease_and_ignores_duplicates():
+    job = make_job(frames=[1, 2])
+    lease(job, "a", 1)
+    expire(job, "a", [1])
+    # A late upload for an expired lease still counts and leaves the queue
+    assert job.complete_frame("a", 1)
+    assert not job.complete_frame("b", 1)
+    assert job.take_frames(10) == [2]
+
+
+def test_frame_given_up_after_max_attempts():
+    job = make_job(frames=[7])
+    for attempt in range(core.MAX_FRAME_ATTEMPTS):
+        assert lease(job, f"s{attempt}", 1) == [7]
+        job.fail_frame(f"s{attempt}", 7)
+    assert job.frames_failed == {7}
+    assert job.frame_queue.empty()
+    assert job.finished()
+
+
+def test_repeated_failures_blacklist_slave():
+    job = make_job()
+    job.state.submit(job)
+    for _ in range(core.MAX_FRAME_FAILURES_PER_SLAVE):
+        lease(job, "a", 1)
+        job.fail_frame("a", 1)
+    assert "a" in job.blacklist
+    assert job.state.pick_job("a", None) is None
+    assert job.state.pick_job("b", None) is job
+
+
+def test_release_slave_returns_frames_in_order():
+    job = make_job()
+    lease(job, "a", 3)
+    assert job.release_slave("a") == [1, 2, 3]
+    assert job.take_frames(4) == [1, 2, 3, 4]
+
+
+def test_speculative_copy_keeps_frame_out_of_queue():
+    job = make_job(frames=[1])
+    lease(job, "a", 1)
+    assert job.pick_speculative("b") == 1
+    job.lease_frames("b", [1], speculative=True)
+    assert job.frame_attempts[1] == 1
+    # The original holder's lease running out leaves the copy going
+    expire(job, "a", [1])
+    assert job.frame_queue.empty()
+    assert job.complete_frame("b", 1)
+    assert job.finished()
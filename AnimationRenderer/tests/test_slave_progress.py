@@ -0,0 +1,25 @@
+import pytest
+
+# slave.py is a standalone add-on and imports bpy at the top; run under Blender's Python
+pytest.importorskip("bpy")
+import slave  # noqa: E402
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("Fra:1 Mem:210.45M | Time:00:03.12 | Remaining:00:12.34 | Mem:180M | Scene, ViewLayer | Sample 32/128",
+     (25.0, 12.34)),
+    ("Fra:1 Mem:210M | Time:00:10.00 | Remaining:01:02:03.50 | Mem:180M | Scene | Rendered 3/16 Tiles, Sample 64/128",
+     (21.875, 3723.5)),
+    ("Fra:4 Mem:96.2M (Peak 101M) | Time:00:01.20 | Rendering 12 / 64 samples", (18.75, None)),
+])
+def test_parse_progress(line, expected):
+    assert slave._parse_progress(line) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("line", [
+    "Fra:1 Mem:12M | Time:00:00.20 | Syncing Cube",
+    "Saved: '/tmp/frame_0001.png'",
+    "Fra:1 Sample 0/0",
+])
+def test_parse_progress_ignores_other_lines(line):
+    assert slave._parse_progress(line) is None